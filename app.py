@@ -10,10 +10,13 @@ from logic import (
     add_part_without_vin, delete_client, delete_vin,
     delete_part, update_client_and_vins, update_part,
     add_supplier_to_part, safe_add_part_to_vin, get_suppliers_for_part, update_vin, move_part_to_vin,
-    update_supplier, delete_supplier
+    update_supplier, delete_supplier, get_clients_page_after, get_client_summaries, find_clients_by_prefix,
+    load_client_aggregate, add_parts_bulk, UNASSIGNED_VIN_VALUES, undelete_part, undelete_vin,
 )
 from security import validate_phone, validate_vin, validate_numeric
-from services.pdf import generate_pdf
+from services.search import search
+from services.vin_decoder import decode_vin
+from services.trash import list_trash, maybe_purge_trash
 from ui.navigation import (
     main_navigation,
     global_search,
@@ -24,6 +27,10 @@ from ui.navigation import (
 )
 from views.activity_logs import render_activity_logs_view
 from views.user_management import render_user_management_view
+from views.data_import import render_data_import_view
+from views.quotes import render_generate_pdf_view, render_text_quote_view
+from views.documents import render_documents_view
+from views.supplier_analytics import render_supplier_analytics_view
 import random
 import base64
 import io
@@ -154,6 +161,8 @@ st.session_state.last_activity = datetime.now()
 # Main application content
 st.title("Brent J. Marketing, car parts database")
 df_clients, df_vins, df_parts, df_part_suppliers = load_data()
+# Permanently remove trash older than the retention period (background, at most every few hours)
+maybe_purge_trash()
 
 # --- DATABASE MAINTENANCE (Admin only, runs on Mondays) ---
 if st.session_state.authenticated and st.session_state.user_role == 'admin':
@@ -219,7 +228,7 @@ def set_view(view_name):
 
 # --- Sidebar and Global Tools ---
 main_navigation()
-global_search(df_clients, df_vins, df_parts)
+global_search()
 export_data()
 backup_database()
 confirm_action_interface()
@@ -251,44 +260,68 @@ elif st.session_state.view == 'user_management':
     render_user_management_view()
     st.stop()
 
+elif st.session_state.view == 'data_import':
+    render_data_import_view()
+    st.stop()
+
+elif st.session_state.view == 'generate_pdf_flow':
+    render_generate_pdf_view()
+    st.stop()
+
+elif st.session_state.view == 'generate_text_quote_flow':
+    render_text_quote_view()
+    st.stop()
+
+elif st.session_state.view == 'documents':
+    render_documents_view()
+    st.stop()
+
+elif st.session_state.view == 'supplier_analytics':
+    render_supplier_analytics_view()
+    st.stop()
+
 # --- Clients List View ---
 elif st.session_state.view == 'client_list':
     st.header("Clients")
-    if "client_list_page" not in st.session_state:
-        st.session_state.client_list_page = 0
+    # Keyset cursors for the pages visited so far; the last entry is the current page
+    if "client_list_cursors" not in st.session_state:
+        st.session_state.client_list_cursors = [None]
 
     if st.button("Back to Main"):
         st.session_state.view = 'main'
         st.session_state.need_rerun = True
-        st.session_state.client_list_page = 0
+        st.session_state.client_list_cursors = [None]
+
+    sort_labels = {'updated': "Recently updated", 'activity': "Latest activity", 'value': "Quoted value"}
+    sort = st.selectbox("Sort by", options=list(sort_labels), format_func=sort_labels.get, key="client_list_sort")
+    if st.session_state.get('client_list_sort_used') != sort:
+        # Cursors belong to one ordering; start over from the first page
+        st.session_state.client_list_sort_used = sort
+        st.session_state.client_list_cursors = [None]
 
-    clients_df = df_clients.copy()
+    page_size = 20
+    cursors = st.session_state.client_list_cursors
+    page_clients, next_cursor = get_clients_page_after(cursors[-1], page_size, sort=sort)
+    summaries = get_client_summaries([row[0] for row in page_clients])
 
-    if clients_df.empty:
+    if not page_clients and len(cursors) == 1:
         st.info("No clients found.")
     else:
-        page_size = 20
-        total_clients = len(clients_df)
-        total_pages = max((total_clients - 1) // page_size + 1, 1)
-        current_page = st.session_state.get('client_list_page', 0)
-        current_page = max(0, min(current_page, total_pages - 1))
-        st.session_state.client_list_page = current_page
-        start_idx = current_page * page_size
-        end_idx = start_idx + page_size
-        page_clients = clients_df.iloc[start_idx:end_idx]
-
         st.markdown("---")
         st.subheader("Open Client Details")
-        # Option A: quick select
-        phones = [''] + clients_df['phone'].astype(str).dropna().unique().tolist()
-        selected_phone = st.selectbox("Select phone", options=phones, key="open_client_phone")
-        if selected_phone:
-            row = clients_df[clients_df['phone'].astype(str) == selected_phone].iloc[0]
-            st.session_state.current_client_phone = row['phone']
-            st.session_state.current_client_name = row['client_name']
-            st.session_state.edit_mode = False
-            st.session_state.view = 'client_details'
-            st.session_state.need_rerun = True
+        # Option A: type-ahead lookup by phone or name prefix
+        lookup = st.text_input("Find client by phone or name", key="open_client_lookup")
+        matches = find_clients_by_prefix(lookup) if lookup else []
+        if lookup and not matches:
+            st.caption("No matching clients.")
+        if matches:
+            labels = {f"{m_phone} - {m_name or ''}": (m_phone, m_name) for m_phone, m_name in matches}
+            selected_label = st.selectbox("Select client", options=[''] + list(labels), key="open_client_phone")
+            if selected_label:
+                st.session_state.current_client_phone, st.session_state.current_client_name = labels[selected_label]
+                st.session_state.edit_mode = False
+                st.session_state.view = 'client_details'
+                st.session_state.need_rerun = True
 
         st.markdown("---")
         st.subheader("Clients (View Details)")
@@ -297,18 +330,22 @@ elif st.session_state.view == 'client_list':
             '<style>hr.client-sep{margin:0.25rem 0!important;border:0;border-top:1px solid rgba(0,0,0,.2);}</style>',
             unsafe_allow_html=True,
         )
-        for idx, (_, row) in enumerate(page_clients.iterrows()):
+        for idx, (row_phone, row_name, _) in enumerate(page_clients):
             if idx > 0:
                 st.markdown("<hr class=\"client-sep\">", unsafe_allow_html=True)
-            c1, c2, c3 = st.columns([0.4, 0.4, 0.2])
+            c1, c2, c3, c4 = st.columns([0.3, 0.25, 0.3, 0.15])
             with c1:
-                st.write(str(row['client_name']))
+                st.write(str(row_name))
             with c2:
-                st.write(str(row['phone']))
+                st.write(str(row_phone))
             with c3:
-                if st.button("View", key=f"view_client_{row['phone']}"):
-                    st.session_state.current_client_phone = row['phone']
-                    st.session_state.current_client_name = row['client_name']
+                summary = summaries.get(str(row_phone))
+                if summary:
+                    st.caption(f"{summary['vin_count']} VINs · {summary['part_count']} parts · ${summary['quoted_total']:,.2f}")
+            with c4:
+                if st.button("View", key=f"view_client_{row_phone}"):
+                    st.session_state.current_client_phone = row_phone
+                    st.session_state.current_client_name = row_name
                     st.session_state.edit_mode = False
                     st.session_state.view = 'client_details'
                     st.session_state.need_rerun = True
@@ -316,14 +353,14 @@ elif st.session_state.view == 'client_list':
         st.markdown("---")
         nav_cols = st.columns([0.2, 0.6, 0.2])
         with nav_cols[0]:
-            if st.button("Previous Page", disabled=current_page == 0):
-                st.session_state.client_list_page = max(current_page - 1, 0)
+            if st.button("Previous Page", disabled=len(cursors) == 1):
+                cursors.pop()
                 st.session_state.need_rerun = True
         with nav_cols[1]:
-            st.write(f"Page {current_page + 1} of {total_pages}")
+            st.write(f"Page {len(cursors)}")
         with nav_cols[2]:
-            if st.button("Next Page", disabled=current_page >= total_pages - 1):
-                st.session_state.client_list_page = min(current_page + 1, total_pages - 1)
+            if st.button("Next Page", disabled=next_cursor is None):
+                cursors.append(next_cursor)
                 st.session_state.need_rerun = True
 
 # --- Client Details View ---
@@ -340,102 +377,27 @@ elif st.session_state.view == 'client_details':
     else:
         st.subheader(f"{name} ({phone})")
 
-        # Undo bar for last deletion (VIN or Part)
+        # Undo bar for last deletion (VIN or Part); deleted rows stay in the trash, so undo is a flag flip
         last_del = st.session_state.get('last_delete')
         if last_del:
             colu1, colu2, colu3 = st.columns([0.6, 0.2, 0.2])
             with colu1:
                 if last_del.get('type') == 'vin':
-                    st.info(f"A VIN was deleted: {last_del.get('vin_data',{}).get('vin_number','')} — You can undo.")
+                    st.info(f"A VIN was deleted: {last_del.get('label', '')} — You can undo.")
                 elif last_del.get('type') == 'part':
-                    st.info(f"A Part was deleted: {last_del.get('part',{}).get('part_name','')} — You can undo.")
+                    st.info(f"A Part was deleted: {last_del.get('label', '')} — You can undo.")
                 else:
                     st.info("An item was deleted — You can undo.")
             with colu2:
                 if st.button("Undo", key="undo_last_delete"):
                     try:
-                        if last_del.get('type') == 'part':
-                            pdata = last_del.get('part', {})
-                            suppliers = last_del.get('suppliers', [])
-                            vin_num = str(pdata.get('vin_number') or '').strip()
-                            if vin_num and vin_num not in ('None', 'No VIN provided'):
-                                new_part_id = add_part_to_vin(
-                                    vin_num,
-                                    str(pdata.get('client_phone') or ''),
-                                    pdata.get('part_name'),
-                                    pdata.get('part_number'),
-                                    int(pdata.get('quantity') or 1),
-                                    pdata.get('notes') or '',
-                                    [],
-                                    st.session_state.username,
-                                )
-                            else:
-                                new_part_id = add_part_without_vin(
-                                    pdata.get('part_name'),
-                                    pdata.get('part_number'),
-                                    int(pdata.get('quantity') or 1),
-                                    pdata.get('notes') or '',
-                                    str(pdata.get('client_phone') or ''),
-                                    [],
-                                    st.session_state.username,
-                                )
-                            # Restore suppliers
-                            for s in suppliers:
-                                try:
-                                    add_supplier_to_part(
-                                        int(new_part_id),
-                                        s.get('supplier_name'),
-                                        float(s.get('buying_price') or 0.0),
-                                        float(s.get('selling_price') or 0.0),
-                                        s.get('delivery_time') or '',
-                                        st.session_state.username,
-                                    )
-                                except Exception:
-                                    pass
-                            st.success("Part restored.")
-                        elif last_del.get('type') == 'vin':
-                            v = last_del.get('vin_data', {})
-                            cphone = str(last_del.get('client_phone') or '')
-                            add_vin_to_client(
-                                cphone,
-                                v.get('vin_number'),
-                                v.get('model'),
-                                v.get('prod_yr'),
-                                v.get('body'),
-                                v.get('engine'),
-                                v.get('code'),
-                                v.get('transmission'),
-                                st.session_state.username,
-                            )
-                            # Restore parts for VIN
-                            for entry in last_del.get('parts', []):
-                                part = entry.get('part') or {}
-                                suppliers = entry.get('suppliers') or []
-                                new_pid = add_part_to_vin(
-                                    v.get('vin_number'),
-                                    cphone,
-                                    part.get('part_name'),
-                                    part.get('part_number'),
-                                    int(part.get('quantity') or 1),
-                                    part.get('notes') or '',
-                                    [],
-                                    st.session_state.username,
-                                )
-                                for s in suppliers:
-                                    try:
-                                        add_supplier_to_part(
-                                            int(new_pid),
-                                            s.get('supplier_name'),
-                                            float(s.get('buying_price') or 0.0),
-                                            float(s.get('selling_price') or 0.0),
-                                            s.get('delivery_time') or '',
-                                            st.session_state.username,
-                                        )
-                                    except Exception:
-                                        pass
+                        if last_del.get('type') == 'vin':
+                            undelete_vin(last_del['key'], st.session_state.username, str(phone))
                             st.success("VIN and associated parts restored.")
+                        else:
+                            undelete_part(int(last_del['key']), st.session_state.username)
+                            st.success("Part restored.")
                         st.session_state.last_delete = None
-                        st.cache_data.clear()
                         st.session_state.need_rerun = True
                         st.rerun()
                     except Exception as e:
@@ -464,12 +426,11 @@ elif st.session_state.view == 'client_details':
                     st.warning("Invalid phone format.")
                 else:
                     try:
-                        update_client_and_vins(str(phone), str(new_phone), new_name)
+                        update_client_and_vins(str(phone), str(new_phone), new_name, st.session_state.username)
                         st.success("Client updated successfully.")
                         st.session_state.current_client_phone = str(new_phone)
                         st.session_state.current_client_name = new_name
                         st.session_state.edit_mode = False
-                        st.cache_data.clear()
                         st.session_state.need_rerun = True
                         st.rerun()
                     except Exception as e:
@@ -481,17 +442,21 @@ elif st.session_state.view == 'client_details':
 
         # Details (VINs and Parts)
         st.markdown("### VINs")
-        client_vins = df_vins[df_vins['client_phone'].astype(str) == str(phone)]
+        aggregate = load_client_aggregate(str(phone))
+        if aggregate.summary:
+            summary = aggregate.summary
+            st.caption(
+                f"{summary['vin_count']} VINs · {summary['part_count']} parts · "
+                f"quoted ${summary['quoted_total']:,.2f} · last activity {summary['last_activity']}"
+            )
+        client_vins = aggregate.vins
         if client_vins.empty:
             st.info("No VINs registered for this client.")
         else:
             for _, vin_row in client_vins.iterrows():
                 vin_no = str(vin_row['vin_number'])
-                parts_for_vin = df_parts[
-                    (df_parts['client_phone'].astype(str) == str(phone))
-                    & (df_parts['vin_number'].astype(str) == vin_no)
-                ]
-                part_count = len(parts_for_vin)
+                parts_for_vin = aggregate.parts_for_vin(vin_no)
+                part_count = aggregate.vin_part_counts.get(vin_no, len(parts_for_vin))
                 with st.expander(f"VIN {vin_no} ({part_count} parts)"):
                     top1, top2 = st.columns([0.7, 0.3])
                     with top1:
@@ -513,43 +478,10 @@ elif st.session_state.view == 'client_details':
                                 st.session_state.need_rerun = True
                         with btn2:
                             if st.button("Delete VIN", key=f"delete_vin_{vin_no}"):
-                                # Backup VIN and associated parts + suppliers before deletion
-                                vin_backup = {
-                                    'vin_number': vin_no,
-                                    'model': vin_row.get('model', ''),
-                                    'prod_yr': vin_row.get('prod_yr', ''),
-                                    'body': vin_row.get('body', ''),
-                                    'engine': vin_row.get('engine', ''),
-                                    'code': vin_row.get('code', ''),
-                                    'transmission': vin_row.get('transmission', ''),
-                                }
-                                parts_for_vin = df_parts[(df_parts['vin_number'].astype(str) == vin_no)]
-                                parts_backup = []
-                                for _, p in parts_for_vin.iterrows():
-                                    p_dict = {
-                                        'id': int(p['id']),
-                                        'vin_number': p.get('vin_number'),
-                                        'client_phone': p.get('client_phone'),
-                                        'part_name': p.get('part_name'),
-                                        'part_number': p.get('part_number'),
-                                        'quantity': int(p.get('quantity') or 1),
-                                        'notes': p.get('notes') or '',
-                                    }
-                                    suppliers = df_part_suppliers[df_part_suppliers['part_id'] == p['id']]
-                                    parts_backup.append({
-                                        'part': p_dict,
-                                        'suppliers': suppliers.to_dict(orient='records') if not suppliers.empty else []
-                                    })
                                 try:
                                     delete_vin(vin_no, st.session_state.username, str(phone))
-                                    st.session_state.last_delete = {
-                                        'type': 'vin',
-                                        'client_phone': str(phone),
-                                        'vin_data': vin_backup,
-                                        'parts': parts_backup,
-                                    }
+                                    st.session_state.last_delete = {'type': 'vin', 'key': vin_no, 'label': vin_no}
                                     st.success("VIN deleted. You can undo this action.")
-                                    st.cache_data.clear()
                                     st.session_state.need_rerun = True
                                     st.rerun()
                                 except Exception as e:
@@ -577,25 +509,12 @@ elif st.session_state.view == 'client_details':
                                     st.session_state.need_rerun = True
                             with del_col:
                                 if st.button("Delete", key=f"delete_part_{part_row['id']}"):
-                                    # Backup part and suppliers then delete
-                                    suppliers = df_part_suppliers[df_part_suppliers['part_id'] == part_row['id']]
-                                    st.session_state.last_delete = {
-                                        'type': 'part',
-                                        'part': {
-                                            'id': int(part_row['id']),
-                                            'vin_number': part_row.get('vin_number'),
-                                            'client_phone': part_row.get('client_phone'),
-                                            'part_name': part_row.get('part_name'),
-                                            'part_number': part_row.get('part_number'),
-                                            'quantity': int(part_row.get('quantity') or 1),
-                                            'notes': part_row.get('notes') or '',
-                                        },
-                                        'suppliers': suppliers.to_dict(orient='records') if not suppliers.empty else []
-                                    }
                                     try:
                                         delete_part(int(part_row['id']), st.session_state.username)
+                                        st.session_state.last_delete = {
+                                            'type': 'part', 'key': int(part_row['id']), 'label': part_row.get('part_name') or '',
+                                        }
                                         st.success("Part deleted. You can undo this action.")
-                                        st.cache_data.clear()
                                         st.session_state.need_rerun = True
                                         st.rerun()
                                     except Exception as e:
@@ -604,14 +523,7 @@ elif st.session_state.view == 'client_details':
         # Parts are shown within each VIN expander above
 
         # Show parts without a VIN assignment
-        no_vin_mask = (
-            (df_parts['client_phone'].astype(str) == str(phone))
-            & (
-                df_parts['vin_number'].isna()
-                | (df_parts['vin_number'].astype(str).str.strip().isin(['', 'None', 'No VIN provided']))
-            )
-        )
-        parts_without_vin = df_parts[no_vin_mask]
+        parts_without_vin = aggregate.unassigned_parts
         if not parts_without_vin.empty:
             st.subheader("Parts Without VIN")
             for _, part_row in parts_without_vin.iterrows():
@@ -625,29 +537,38 @@ elif st.session_state.view == 'client_details':
                         st.session_state.need_rerun = True
                 with del_col:
                     if st.button("Delete", key=f"delete_part_novin_{part_row['id']}"):
-                        suppliers = df_part_suppliers[df_part_suppliers['part_id'] == part_row['id']]
-                        st.session_state.last_delete = {
-                            'type': 'part',
-                            'part': {
-                                'id': int(part_row['id']),
-                                'vin_number': part_row.get('vin_number'),
-                                'client_phone': part_row.get('client_phone'),
-                                'part_name': part_row.get('part_name'),
-                                'part_number': part_row.get('part_number'),
-                                'quantity': int(part_row.get('quantity') or 1),
-                                'notes': part_row.get('notes') or '',
-                            },
-                            'suppliers': suppliers.to_dict(orient='records') if not suppliers.empty else []
-                        }
                         try:
                             delete_part(int(part_row['id']), st.session_state.username)
+                            st.session_state.last_delete = {
+                                'type': 'part', 'key': int(part_row['id']), 'label': part_row.get('part_name') or '',
+                            }
                             st.success("Part deleted. You can undo this action.")
-                            st.cache_data.clear()
                             st.session_state.need_rerun = True
                             st.rerun()
                         except Exception as e:
                             st.error(f"Delete part failed: {e}")
 
+        # Trash: everything deleted for this client, restorable from any session until purged
+        trash = list_trash(str(phone))
+        if not trash.empty:
+            with st.expander(f"Recently Deleted ({len(trash)})"):
+                for item in trash.itertuples(index=False):
+                    info_col, restore_col = st.columns([0.8, 0.2])
+                    with info_col:
+                        st.write(f"{'VIN' if item.kind == 'vin' else 'Part'}: {item.label} — deleted {item.deleted_at[:16]} by {item.deleted_by or 'unknown'}")
+                    with restore_col:
+                        if st.button("Restore", key=f"restore_{item.kind}_{item.key}_{item.deleted_at}"):
+                            try:
+                                if item.kind == 'vin':
+                                    undelete_vin(item.vin_number, st.session_state.username, item.client_phone)
+                                else:
+                                    undelete_part(int(item.key), st.session_state.username)
+                                st.session_state.last_delete = None
+                                st.session_state.need_rerun = True
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Restore failed: {e}")
+
         st.markdown("---")
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -660,7 +581,7 @@ elif st.session_state.view == 'client_details':
                 st.session_state.view = 'add_part_without_vin_for_client'
                 st.session_state.need_rerun = True
         with col3:
-            vins_for_client = df_vins[df_vins['client_phone'].astype(str) == str(phone)]['vin_number'].dropna().astype(str).unique().tolist()
+            vins_for_client = aggregate.vin_numbers
             target_vin = st.selectbox("Select VIN", options=[''] + vins_for_client, key="select_vin_for_new_part")
             if st.button("Add Part to VIN"):
                 if not target_vin:
@@ -703,7 +624,6 @@ elif st.session_state.view == 'edit_vin':
             update_vin(vin_no, new_vin, model, prod_yr, body, engine, code, transmission, st.session_state.username)
             st.success("VIN updated successfully.")
             st.session_state.edit_vin_number = new_vin
-            st.cache_data.clear()
             st.session_state.view = 'client_details'
             st.session_state.need_rerun = True
             st.rerun()
@@ -753,7 +673,6 @@ elif st.session_state.view == 'edit_part':
                 })
             update_part(int(part_id), p_name, p_number, int(p_qty), p_notes, suppliers_data, st.session_state.username)
             st.success("Part updated successfully.")
-            st.cache_data.clear()
             st.session_state.view = 'client_details'
             st.session_state.need_rerun = True
             st.rerun()
@@ -790,7 +709,6 @@ elif st.session_state.view == 'edit_part':
                 try:
                     update_supplier(sid, s_name, s_buy, s_sell, s_del, st.session_state.username)
                     st.success("Supplier updated.")
-                    st.cache_data.clear()
                     st.session_state.need_rerun = True
                     st.rerun()
                 except Exception as e:
@@ -799,7 +717,6 @@ elif st.session_state.view == 'edit_part':
                 try:
                     delete_supplier(sid, st.session_state.username)
                     st.success("Supplier deleted.")
-                    st.cache_data.clear()
                     st.session_state.need_rerun = True
                     st.rerun()
                 except Exception as e:
@@ -825,7 +742,6 @@ elif st.session_state.view == 'edit_part':
             try:
                 add_supplier_to_part(int(part_id), ns_name, float(ns_buy or 0.0), float(ns_sell or 0.0), ns_del or '', st.session_state.username)
                 st.success("Supplier added.")
-                st.cache_data.clear()
                 st.session_state.need_rerun = True
                 st.rerun()
             except Exception as e:
@@ -848,7 +764,6 @@ elif st.session_state.view == 'edit_part':
             try:
                 move_part_to_vin(int(part_id), target_vin_move, st.session_state.username)
                 st.success("Part moved successfully.")
-                st.cache_data.clear()
                 st.session_state.view = 'client_details'
                 st.session_state.need_rerun = True
                 st.rerun()
@@ -863,17 +778,32 @@ elif st.session_state.view == 'view_parts_inventory':
         st.session_state.need_rerun = True
 
     q = st.text_input("Search part name/number", key="parts_search")
-    parts_df = df_parts.copy()
     if q:
-        qq = str(q).strip()
-        parts_df = parts_df[
-            parts_df['part_name'].astype(str).str.contains(qq, case=False, na=False)
-            | parts_df['part_number'].astype(str).str.contains(qq, case=False, na=False)
-        ]
+        page_size = 50
+        if st.session_state.get('parts_search_term') != q:
+            st.session_state.parts_search_term = q
+            st.session_state.parts_page = 0
+        parts_df = search(q, kinds=('parts',), limit=page_size + 1, offset=st.session_state.parts_page * page_size)['parts']
+        has_next = len(parts_df) > page_size
+        parts_df = parts_df.head(page_size)
+    else:
+        parts_df = df_parts
     if parts_df.empty:
         st.info("No parts found.")
     else:
         st.dataframe(parts_df[['part_name','part_number','quantity','client_phone','vin_number']], width='stretch', hide_index=True)
+    if q:
+        pcol1, pcol2, pcol3 = st.columns([0.2, 0.6, 0.2])
+        with pcol1:
+            if st.button("Previous", key="parts_prev", disabled=st.session_state.parts_page == 0):
+                st.session_state.parts_page -= 1
+                st.session_state.need_rerun = True
+        with pcol2:
+            st.write(f"Page {st.session_state.parts_page + 1}")
+        with pcol3:
+            if st.button("Next", key="parts_next", disabled=not has_next):
+                st.session_state.parts_page += 1
+                st.session_state.need_rerun = True
 
 def reset_part_management():
     """Reset part management state"""
@@ -1001,58 +931,31 @@ def render_part_forms():
 
                 if all_valid:
                     saved_ids = []
+                    vin_number = None
+                    client_phone = None
+                    if st.session_state.view in ['add_part_to_existing_vin', 'add_part_for_client']:
+                        vin_number = st.session_state.selected_vin_to_add_part
+                        if str(vin_number or '').strip() in UNASSIGNED_VIN_VALUES:
+                            vin_number = None
+                            client_phone = st.session_state.get('current_client_phone')
+                    elif st.session_state.view == 'add_part_without_vin_for_client':
+                        client_phone = st.session_state.current_client_phone
                     with st.spinner("Saving parts..."):
-                        for part in parts_data:
-                            try:
-                                if st.session_state.view in ['add_part_to_existing_vin', 'add_part_for_client']:
-                                    vin_match = df_vins[df_vins['vin_number'] == st.session_state.selected_vin_to_add_part]
-                                    if vin_match.empty:
-                                        st.error(f"VIN {st.session_state.selected_vin_to_add_part} not found in database")
-                                        continue
-                                    client_phone = vin_match['client_phone'].iloc[0]
-                                    part_id = safe_add_part_to_vin(
-                                        st.session_state.selected_vin_to_add_part,
-                                        client_phone,
-                                        part,
-                                        [],
-                                        st.session_state.username
-                                    )
-                                elif st.session_state.view == 'add_part_without_vin_flow':
-                                    part_id = add_part_without_vin(
-                                        part["name"],
-                                        part["number"],
-                                        part["quantity"],
-                                        part["notes"],
-                                        client_phone=None,
-                                        suppliers=[],
-                                        username=st.session_state.username
-                                    )
-                                elif st.session_state.view == 'add_part_without_vin_for_client':
-                                    part_id = add_part_without_vin(
-                                        part["name"],
-                                        part["number"],
-                                        part["quantity"],
-                                        part["notes"],
-                                        client_phone=st.session_state.current_client_phone,
-                                        suppliers=[],
-                                        username=st.session_state.username
-                                    )
-                                else:
-                                    part_id = None
-
-                                if part_id:
-                                    saved_ids.append(part_id)
-                            except Exception as e:
-                                st.error(f"Error saving part: {str(e)}")
+                        try:
+                            saved_ids, part_errors = add_parts_bulk(
+                                parts_data,
+                                st.session_state.username,
+                                vin_number=vin_number,
+                                client_phone=client_phone,
+                            )
+                            for idx, err in part_errors:
+                                st.error(f"Part {idx+1}: {err}")
+                        except Exception as e:
+                            st.error(f"Error saving parts: {str(e)}")
 
                     if saved_ids:
                         current_mgmt['saved_part_ids'] = saved_ids
                         st.success(f"Saved {len(saved_ids)} part(s). Now you can add suppliers below.")
-                        # Clear cached data so new parts appear immediately after rerun
-                        try:
-                            st.cache_data.clear()
-                        except Exception:
-                            pass
                         st.session_state.need_rerun = True
                         st.rerun()
                 else:
@@ -1088,7 +991,6 @@ def render_part_forms():
                         try:
                             add_supplier_to_part(part_id, supplier_name, buying_price, selling_price, delivery_time, st.session_state.username)
                             st.success("Supplier added successfully!")
-                            st.cache_data.clear()
                             st.session_state.need_rerun = True
                         except Exception as e:
                             st.error(f"Error adding supplier: {str(e)}")
@@ -1148,8 +1050,12 @@ elif st.session_state.view == 'add_vin_to_existing_client':
         with st.form("add_vin_details_form", clear_on_submit=True):
             st.write(f"Add details for VIN **{st.session_state.current_vin_no}** for client **{st.session_state.current_client_name}** (Phone: {st.session_state.current_client_phone})")
             
-            model = st.text_input("Model")
-            prod_yr = st.text_input("Prod. Yr")
+            decoded = decode_vin(st.session_state.current_vin_no)
+            if decoded.check_digit_valid is False:
+                st.warning("The VIN check digit does not match. Please double-check the VIN.")
+            prefill = decoded.prefill()
+            model = st.text_input("Model", value=prefill.get('model', ''))
+            prod_yr = st.text_input("Prod. Yr", value=prefill.get('prod_yr', ''))
             body = st.text_input("Body")
             engine = st.text_input("Engine")
             code = st.text_input("Code")
@@ -1191,7 +1097,6 @@ elif st.session_state.view == 'add_vin_to_existing_client':
                     
                     st.session_state.vin_added = False
                     st.session_state.current_vin_no = None
-                    st.cache_data.clear()
                     st.session_state.need_rerun = True
                     
                 except ValueError as e:
@@ -1223,7 +1128,6 @@ elif st.session_state.view == 'add_client':
                             st.session_state.client_added = True
                             st.session_state.current_client_phone = str(phone)
                             st.session_state.current_client_name = client_name
-                            st.cache_data.clear()
                             st.session_state.need_rerun = True
                         except ValueError as e:
                             st.error(str(e))
@@ -1258,8 +1162,12 @@ elif st.session_state.view == 'add_client':
         with st.form("add_vin_details_form", clear_on_submit=True):
             st.write(f"Add details for VIN **{st.session_state.current_vin_no}** for client **{st.session_state.current_client_name}** (Phone: {st.session_state.current_client_phone})")
             
-            model = st.text_input("Model")
-            prod_yr = st.text_input("Prod. Yr")
+            decoded = decode_vin(st.session_state.current_vin_no)
+            if decoded.check_digit_valid is False:
+                st.warning("The VIN check digit does not match. Please double-check the VIN.")
+            prefill = decoded.prefill()
+            model = st.text_input("Model", value=prefill.get('model', ''))
+            prod_yr = st.text_input("Prod. Yr", value=prefill.get('prod_yr', ''))
             body = st.text_input("Body")
             engine = st.text_input("Engine")
             code = st.text_input("Code")
@@ -1312,7 +1220,6 @@ elif st.session_state.view == 'add_client':
                     
                     st.session_state.vin_added = False
                     st.session_state.current_vin_no = None
-                    st.cache_data.clear()
                     st.session_state.need_rerun = True
                     
                 except ValueError as e:
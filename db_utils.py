@@ -4,10 +4,17 @@ import pandas as pd
 import streamlit as st
 import os
 import io
+import csv
+import tempfile
 import zipfile
 from datetime import datetime
 import json
 import hashlib
+import re
+import threading
+import queue
+import time
+import atexit
 try:
     import bcrypt  # Optional; fallback to SHA-256 if unavailable
 except Exception:  # pragma: no cover
@@ -18,29 +25,211 @@ DB_NAME = 'brent_j_marketing.db'
 
 from contextlib import contextmanager
 
+# Connection pool settings
+POOL_MAX_SIZE = 8                 # open connections per database file
+POOL_ACQUIRE_TIMEOUT = 10.0       # seconds to wait for a free connection
+POOL_HEALTH_CHECK_AFTER = 30.0    # idle seconds after which a connection is pinged before reuse
+SQLITE_CACHE_SIZE_KB = 16384      # page cache per connection (PRAGMA cache_size, in KiB)
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024
+
+def _open_connection(db_name, cache_size_kb=SQLITE_CACHE_SIZE_KB, mmap_size=SQLITE_MMAP_SIZE):
+    """Open a connection and apply the per-connection pragmas once."""
+    conn = sqlite3.connect(db_name, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{int(cache_size_kb)}")
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    return conn
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections for one database file.
+
+    Idle connections are kept per thread so a thread gets back the connection it used last;
+    when its own list is empty it may take an idle connection released by another thread
+    (connections are opened with check_same_thread=False). Connections idle for longer than
+    POOL_HEALTH_CHECK_AFTER are pinged before reuse and replaced if they fail.
+    """
+
+    def __init__(self, db_name, max_size=POOL_MAX_SIZE, cache_size_kb=SQLITE_CACHE_SIZE_KB, mmap_size=SQLITE_MMAP_SIZE):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._idle: dict[int, list] = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _take_idle(self, ident):
+        own = self._idle.get(ident)
+        if not own:
+            own = next((lst for lst in self._idle.values() if lst), None)
+        return own.pop() if own else None
+
+    def _open(self):
+        return _open_connection(self.db_name, self.cache_size_kb, self.mmap_size)
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self, timeout=POOL_ACQUIRE_TIMEOUT):
+        """Borrow a connection, opening a new one while under max_size."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ConnectionError("Connection pool is closed")
+                entry = self._take_idle(threading.get_ident())
+                if entry is not None:
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConnectionError("Timed out waiting for a database connection")
+                self._cond.wait(remaining)
+
+        try:
+            if entry is None:
+                return self._open()
+            conn, released_at = entry
+            if time.monotonic() - released_at > POOL_HEALTH_CHECK_AFTER and not self._is_healthy(conn):
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                return self._open()
+            return conn
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        """Return a borrowed connection; uncommitted work is rolled back."""
+        reusable = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            reusable = False
+        with self._cond:
+            if reusable and not self._closed:
+                self._idle.setdefault(threading.get_ident(), []).append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._cond.notify()
+
+    @contextmanager
+    def acquire_ctx(self):
+        """Borrow a connection for the duration of a with-block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; connections still borrowed are closed when released."""
+        with self._cond:
+            self._closed = True
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    self._size -= 1
+                    try:
+                        conn.close()
+                    except sqlite3.Error:
+                        pass
+            self._idle.clear()
+            self._cond.notify_all()
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_name=None) -> ConnectionPool:
+    """Return the connection pool for db_name (default: the current DB_NAME)."""
+    db_name = db_name or DB_NAME
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name)
+        return pool
+
+def close_pools():
+    """Close every pooled connection (used at shutdown and by tests)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_pools)
+
 def get_db_connection():
-    """Get database connection (Legacy - prefer using get_db_connection_ctx)"""
+    """Get a new, unpooled database connection (Legacy - prefer using get_db_connection_ctx)"""
     try:
-        conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        return _open_connection(DB_NAME)
     except Exception as e:
         print(f"Failed to connect to the database: {e}")
         return None
 
 @contextmanager
 def get_db_connection_ctx():
-    """Context manager for database connections"""
-    conn = None
+    """Context manager that borrows a pooled connection and returns it to the pool"""
+    pool = get_pool()
     try:
-        conn = get_db_connection()
-        if conn:
-            yield conn
-        else:
-            raise ConnectionError("Failed to acquire database connection")
+        conn = pool.acquire()
+    except Exception as e:
+        print(f"Failed to connect to the database: {e}")
+        raise ConnectionError("Failed to acquire database connection") from e
+    try:
+        yield conn
     finally:
-        if conn:
-            conn.close()
+        pool.release(conn)
+
+# Tables mirrored in memory by load_data(); every write to them is recorded in data_changes
+TRACKED_TABLES = ('clients', 'vins', 'parts', 'part_suppliers')
+
+# Number of change-log rows kept once the log is pruned
+CHANGE_LOG_RETAIN = 5000
+
+def _create_change_triggers(cursor):
+    """Create the triggers that record inserted/updated/deleted rowids in data_changes.
+
+    A NULL row_id means "reload the whole table" (used after VACUUM, which may renumber rowids).
+    """
+    for table in TRACKED_TABLES:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_ins AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO data_changes (table_name, row_id) VALUES ('{table}', NEW.rowid);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_upd AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO data_changes (table_name, row_id) VALUES ('{table}', OLD.rowid);
+                INSERT INTO data_changes (table_name, row_id) SELECT '{table}', NEW.rowid WHERE NEW.rowid != OLD.rowid;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_del AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO data_changes (table_name, row_id) VALUES ('{table}', OLD.rowid);
+            END
+        ''')
 
 def create_tables():
     """Create database tables if they don't exist"""
@@ -88,7 +277,7 @@ def create_tables():
                     last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
                     created_by TEXT,
                     last_updated_by TEXT,
-                    FOREIGN KEY(client_phone) REFERENCES clients(phone) ON DELETE CASCADE
+                    FOREIGN KEY(client_phone) REFERENCES clients(phone) ON DELETE CASCADE ON UPDATE CASCADE
                 )
             ''')
             
@@ -107,8 +296,8 @@ def create_tables():
                     last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
                     created_by TEXT,
                     last_updated_by TEXT,
-                    FOREIGN KEY(vin_number) REFERENCES vins(vin_number) ON DELETE CASCADE,
-                    FOREIGN KEY(client_phone) REFERENCES clients(phone) ON DELETE CASCADE
+                    FOREIGN KEY(vin_number) REFERENCES vins(vin_number) ON DELETE CASCADE ON UPDATE CASCADE,
+                    FOREIGN KEY(client_phone) REFERENCES clients(phone) ON DELETE CASCADE ON UPDATE CASCADE
                 )
             ''')
             
@@ -144,6 +333,16 @@ def create_tables():
                 )
             ''')
             
+            # Create data_changes table (row-level change log read by load_data)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER
+                )
+            ''')
+            _create_change_triggers(cursor)
+
             # Create default admin user
             if bcrypt:
                 admin_password_hash = bcrypt.hashpw("admin".encode(), bcrypt.gensalt()).decode()
@@ -179,26 +378,630 @@ def migrate_schema():
             if 'is_active' not in user_cols:
                 cursor.execute("ALTER TABLE users ADD COLUMN is_active INTEGER DEFAULT 1")
 
-            conn.commit()
+            # Versioned migrations, tracked in PRAGMA user_version
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            try:
+                for target_version, migration in SCHEMA_MIGRATIONS:
+                    if version < target_version:
+                        migration(cursor)
+                        cursor.execute(f"PRAGMA user_version = {int(target_version)}")
+                        version = target_version
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
     except sqlite3.Error as e:
+        # Running on a half-migrated schema is worse than not starting
         print(f"Migration error: {e}")
+        raise
 
-@st.cache_data(ttl=300)
-def load_data():
-    """Load all data from database"""
+# Secondary indexes for the hot lookup, pagination and foreign-key cascade paths
+SECONDARY_INDEXES = {
+    'idx_vins_client_phone': "vins(client_phone)",
+    'idx_vins_vin_number_lower': "vins(LOWER(TRIM(vin_number)))",
+    'idx_parts_vin_number': "parts(vin_number)",
+    'idx_parts_client_phone_vin': "parts(client_phone, vin_number)",
+    'idx_parts_last_updated': "parts(last_updated)",
+    'idx_part_suppliers_part_id': "part_suppliers(part_id)",
+    'idx_clients_last_updated': "clients(last_updated, phone)",
+    'idx_activity_log_timestamp': "activity_log(timestamp)",
+    'idx_activity_log_username_timestamp': "activity_log(username, timestamp)",
+}
+
+def _migration_001_secondary_indexes(cursor):
+    for name, definition in SECONDARY_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    cursor.execute("ANALYZE")
+
+def _migration_002_client_lookup_indexes(cursor):
+    # Case-insensitive name prefix lookups for the client type-ahead
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clients_name_nocase ON clients(client_name COLLATE NOCASE)")
+
+# External-content FTS5 indexes: name -> (source table, source rowid column, indexed columns, tokenizer)
+SEARCH_INDEXES = {
+    'clients_fts': ('clients', 'rowid', ('phone', 'client_name'), 'unicode61'),
+    'vins_fts': ('vins', 'rowid', ('vin_number', 'model'), 'unicode61'),
+    'vins_trgm': ('vins', 'rowid', ('vin_number',), 'trigram'),
+    'parts_fts': ('parts', 'id', ('part_name', 'part_number', 'notes'), 'unicode61'),
+    'parts_trgm': ('parts', 'id', ('part_number',), 'trigram'),
+}
+
+def fts5_available(conn) -> bool:
+    """Return True if this SQLite build was compiled with FTS5."""
+    options = {row[0] for row in conn.execute("PRAGMA compile_options").fetchall()}
+    return 'ENABLE_FTS5' in options
+
+def _create_search_triggers(cursor):
+    """Keep the FTS5 indexes in step with their source tables."""
+    for name, (table, rowid_col, columns, _) in SEARCH_INDEXES.items():
+        cols = ', '.join(columns)
+        new_vals = ', '.join(f"NEW.{c}" for c in columns)
+        old_vals = ', '.join(f"OLD.{c}" for c in columns)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_ins AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {name} (rowid, {cols}) VALUES (NEW.{rowid_col}, {new_vals});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_del AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {name} ({name}, rowid, {cols}) VALUES ('delete', OLD.{rowid_col}, {old_vals});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_upd AFTER UPDATE OF {cols} ON {table}
+            BEGIN
+                INSERT INTO {name} ({name}, rowid, {cols}) VALUES ('delete', OLD.{rowid_col}, {old_vals});
+                INSERT INTO {name} (rowid, {cols}) VALUES (NEW.{rowid_col}, {new_vals});
+            END
+        ''')
+
+def rebuild_search_indexes(conn):
+    """Repopulate the FTS5 indexes from their source tables (after VACUUM or bulk repairs)."""
+    for name in SEARCH_INDEXES:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone():
+            conn.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+
+def _migration_003_full_text_search(cursor):
+    if not fts5_available(cursor.connection):
+        print("FTS5 is not available in this SQLite build; search falls back to LIKE queries")
+        return
+    for name, (table, rowid_col, columns, tokenizer) in SEARCH_INDEXES.items():
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+            f"{', '.join(columns)}, content='{table}', content_rowid='{rowid_col}', "
+            f"tokenize='{tokenizer}'" + (", prefix='2 3'" if tokenizer == 'unicode61' else "") + ")"
+        )
+    _create_search_triggers(cursor)
+    rebuild_search_indexes(cursor.connection)
+
+def _migration_004_activity_log_archive(cursor):
+    # Live-table lookups by action and table for the admin history view
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_log_action_timestamp ON activity_log(action, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_log_table_timestamp ON activity_log(table_name, timestamp)")
+    # Catalog of the monthly archive partitions written by services.activity_archive
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log_archives (
+            month TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            first_timestamp TEXT,
+            last_timestamp TEXT,
+            raw_bytes INTEGER NOT NULL DEFAULT 0,
+            stored_bytes INTEGER NOT NULL DEFAULT 0,
+            archived_at TEXT
+        )
+    ''')
+
+def _migration_005_documents(cursor):
+    # Generated quotes/invoices (services.documents); each document keeps its own PDF
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_sequences (
+            document_type TEXT PRIMARY KEY,
+            last_number INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            document_type TEXT NOT NULL,
+            document_number TEXT NOT NULL UNIQUE,
+            client_phone TEXT,
+            client_name TEXT,
+            vin_number TEXT,
+            status TEXT NOT NULL DEFAULT 'issued',
+            total REAL,
+            deposit REAL,
+            input_hash TEXT NOT NULL,
+            pdf BLOB NOT NULL,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT,
+            last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_updated_by TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_client_created ON documents(client_phone, created_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_status_created ON documents(status, created_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_input_hash ON documents(input_hash)")
+
+# Tables whose rows are tombstoned (deleted_at set) on delete and purged later by services.trash
+SOFT_DELETE_TABLES = ('vins', 'parts')
+
+# Partial indexes: live-row lookups skip tombstones, trash lookups only cover tombstones
+SOFT_DELETE_INDEXES = {
+    'idx_vins_client_live': "vins(client_phone) WHERE deleted_at IS NULL",
+    'idx_parts_vin_live': "parts(vin_number) WHERE deleted_at IS NULL",
+    'idx_parts_client_vin_live': "parts(client_phone, vin_number) WHERE deleted_at IS NULL",
+    'idx_vins_trash_client': "vins(client_phone, deleted_at) WHERE deleted_at IS NOT NULL",
+    'idx_vins_trash_deleted_at': "vins(deleted_at) WHERE deleted_at IS NOT NULL",
+    'idx_parts_trash_client': "parts(client_phone, deleted_at) WHERE deleted_at IS NOT NULL",
+    'idx_parts_trash_deleted_at': "parts(deleted_at) WHERE deleted_at IS NOT NULL",
+}
+
+def _migration_006_soft_delete(cursor):
+    for table in SOFT_DELETE_TABLES:
+        columns = {col[1] for col in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+        for column in ('deleted_at', 'deleted_by'):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+    for name, definition in SOFT_DELETE_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    # The cached frames were read without the new columns
+    cursor.executemany(
+        "INSERT INTO data_changes (table_name, row_id) VALUES (?, NULL)",
+        [(table,) for table in SOFT_DELETE_TABLES],
+    )
+
+# Tables whose foreign keys to phone / VIN numbers follow key renames (ON UPDATE CASCADE), parents first
+CASCADING_KEY_TABLES = ('vins', 'parts')
+
+def _cascading_key_sql(create_sql):
+    """CREATE TABLE text with ON UPDATE CASCADE added to every ON DELETE CASCADE foreign key."""
+    return re.sub(r"ON DELETE CASCADE(?!\s+ON UPDATE)", "ON DELETE CASCADE ON UPDATE CASCADE", create_sql)
+
+def rebuild_table(conn, table, create_sql):
+    """Recreate a table from new CREATE TABLE text, keeping its rows, rowids, indexes and triggers.
+
+    SQLite cannot alter a foreign key in place, so the table is copied into a new one that
+    replaces it. Must run inside a transaction with PRAGMA foreign_keys off, otherwise dropping
+    the old table would cascade into its children.
+    """
+    columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,),
+    ).fetchall()]
+    primary_key = [c for c in columns if c[5]]
+    # An INTEGER PRIMARY KEY is the rowid; other tables copy their implicit rowid (the FTS indexes key on it)
+    has_rowid_alias = len(primary_key) == 1 and primary_key[0][2].upper() == 'INTEGER'
+    cols = ', '.join(([] if has_rowid_alias else ['rowid']) + [c[1] for c in columns])
+
+    temp = f"{table}__rebuild"
+    conn.execute(re.sub(rf"^CREATE TABLE\s+\"?{table}\"?", f"CREATE TABLE {temp}", create_sql, count=1))
+    conn.execute(f"INSERT INTO {temp} ({cols}) SELECT {cols} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {temp} RENAME TO {table}")
+    for sql in dependents:
+        conn.execute(sql)
+
+def _migration_007_cascading_keys(cursor):
+    # Phone and VIN renames become one-row updates that the database cascades to vins and parts
+    conn = cursor.connection
+    pending = []
+    for table in CASCADING_KEY_TABLES:
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if row and _cascading_key_sql(row[0]) != row[0]:
+            pending.append((table, _cascading_key_sql(row[0])))
+    if not pending:
+        return
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, create_sql in pending:
+                rebuild_table(conn, table, create_sql)
+            violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                raise sqlite3.IntegrityError(f"Foreign key violations after rebuilding tables: {violations[:5]}")
+            conn.executemany(
+                "INSERT INTO data_changes (table_name, row_id) VALUES (?, NULL)",
+                [(table,) for table, _ in pending],
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+# Per-client and per-VIN aggregates kept current by triggers (see _create_summary_triggers).
+# part_summary is the per-part ledger the other two are adjusted from: a part's quoted value is
+# its quantity times its cheapest selling price, and counts and values only include live rows.
+SUMMARY_TABLES = {
+    'client_summary': '''
+        CREATE TABLE IF NOT EXISTS client_summary (
+            client_phone TEXT PRIMARY KEY,
+            vin_count INTEGER NOT NULL DEFAULT 0,
+            part_count INTEGER NOT NULL DEFAULT 0,
+            quoted_total REAL NOT NULL DEFAULT 0,
+            last_activity TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'vin_summary': '''
+        CREATE TABLE IF NOT EXISTS vin_summary (
+            vin_number TEXT PRIMARY KEY,
+            client_phone TEXT,
+            part_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''',
+    'part_summary': '''
+        CREATE TABLE IF NOT EXISTS part_summary (
+            part_id INTEGER PRIMARY KEY,
+            client_phone TEXT,
+            vin_number TEXT,
+            live INTEGER NOT NULL DEFAULT 1,
+            value REAL NOT NULL DEFAULT 0
+        )
+    ''',
+}
+
+SUMMARY_INDEXES = {
+    'idx_client_summary_activity': "client_summary(last_activity, client_phone)",
+    'idx_client_summary_value': "client_summary(quoted_total, client_phone)",
+    'idx_vin_summary_client': "vin_summary(client_phone)",
+    'idx_part_summary_client': "part_summary(client_phone)",
+}
+
+def _best_price(part_id):
+    return f"COALESCE((SELECT MIN(selling_price) FROM part_suppliers WHERE part_id = {part_id}), 0)"
+
+def _part_value(part_id):
+    return f"COALESCE((SELECT quantity FROM parts WHERE id = {part_id}), 0) * {_best_price(part_id)}"
+
+def _client_add(phone, vins='0', parts='0', value='0'):
+    # Upsert: the row may not exist yet while a phone rename cascades to vins and parts
+    return f'''
+        INSERT INTO client_summary (client_phone, vin_count, part_count, quoted_total)
+        SELECT {phone}, {vins}, {parts}, {value} WHERE {phone} IS NOT NULL
+        ON CONFLICT(client_phone) DO UPDATE SET
+            vin_count = vin_count + excluded.vin_count, part_count = part_count + excluded.part_count,
+            quoted_total = quoted_total + excluded.quoted_total, last_activity = CURRENT_TIMESTAMP;
+    '''
+
+# Removals alone (purges, cascaded deletes) do not count as client activity
+def _client_sub(phone, vins='0', parts='0', value='0'):
+    return f'''
+        UPDATE client_summary SET vin_count = vin_count - ({vins}), part_count = part_count - ({parts}),
+            quoted_total = quoted_total - ({value})
+        WHERE client_phone = {phone};
+    '''
+
+def _vin_add(vin, phone, parts):
+    return f'''
+        INSERT INTO vin_summary (vin_number, client_phone, part_count)
+        SELECT {vin}, {phone}, {parts} WHERE {vin} IS NOT NULL
+        ON CONFLICT(vin_number) DO UPDATE SET part_count = part_count + excluded.part_count;
+    '''
+
+def _vin_sub(vin, parts):
+    return f"UPDATE vin_summary SET part_count = part_count - ({parts}) WHERE vin_number = {vin};"
+
+def _create_summary_triggers(cursor):
+    """Create the triggers that keep client_summary, vin_summary and part_summary current.
+
+    Every change is applied as a delta: the old row's contribution is subtracted from its
+    client / VIN and the new row's contribution added, so key renames that cascade from
+    clients and vins move the counts along with the rows.
+    """
+    triggers = {
+        'clients_ins': ("AFTER INSERT ON clients", "INSERT OR IGNORE INTO client_summary (client_phone) VALUES (NEW.phone);"),
+        'clients_upd': ("AFTER UPDATE ON clients", '''
+            DELETE FROM client_summary WHERE client_phone = OLD.phone AND OLD.phone IS NOT NEW.phone;
+            INSERT INTO client_summary (client_phone) VALUES (NEW.phone)
+            ON CONFLICT(client_phone) DO UPDATE SET last_activity = CURRENT_TIMESTAMP;
+        '''),
+        'clients_del': ("AFTER DELETE ON clients", "DELETE FROM client_summary WHERE client_phone = OLD.phone;"),
+        'vins_ins': ("AFTER INSERT ON vins",
+                     _client_add('NEW.client_phone', vins='NEW.deleted_at IS NULL')
+                     + _vin_add('NEW.vin_number', 'NEW.client_phone', '0')),
+        'vins_upd': ("AFTER UPDATE OF vin_number, client_phone, deleted_at ON vins",
+                     _client_sub('OLD.client_phone', vins='OLD.deleted_at IS NULL')
+                     + _client_add('NEW.client_phone', vins='NEW.deleted_at IS NULL')
+                     + "DELETE FROM vin_summary WHERE vin_number = OLD.vin_number AND OLD.vin_number IS NOT NEW.vin_number;"
+                     + _vin_add('NEW.vin_number', 'NEW.client_phone', '0')
+                     + "UPDATE vin_summary SET client_phone = NEW.client_phone WHERE vin_number = NEW.vin_number;"),
+        'vins_del': ("AFTER DELETE ON vins",
+                     _client_sub('OLD.client_phone', vins='OLD.deleted_at IS NULL')
+                     + "DELETE FROM vin_summary WHERE vin_number = OLD.vin_number;"),
+        'parts_ins': ("AFTER INSERT ON parts", f'''
+            INSERT INTO part_summary (part_id, client_phone, vin_number, live, value)
+            VALUES (NEW.id, NEW.client_phone, NEW.vin_number, NEW.deleted_at IS NULL,
+                    COALESCE(NEW.quantity, 0) * {_best_price('NEW.id')});
+        '''),
+        'parts_upd': ("AFTER UPDATE OF client_phone, vin_number, quantity, deleted_at ON parts", f'''
+            UPDATE part_summary SET client_phone = NEW.client_phone, vin_number = NEW.vin_number,
+                live = NEW.deleted_at IS NULL, value = COALESCE(NEW.quantity, 0) * {_best_price('NEW.id')}
+            WHERE part_id = NEW.id;
+        '''),
+        'parts_del': ("AFTER DELETE ON parts", "DELETE FROM part_summary WHERE part_id = OLD.id;"),
+        'part_suppliers_ins': ("AFTER INSERT ON part_suppliers",
+                               f"UPDATE part_summary SET value = {_part_value('NEW.part_id')} WHERE part_id = NEW.part_id;"),
+        'part_suppliers_upd': ("AFTER UPDATE OF part_id, selling_price ON part_suppliers",
+                               f"UPDATE part_summary SET value = {_part_value('OLD.part_id')} WHERE part_id = OLD.part_id;"
+                               f"UPDATE part_summary SET value = {_part_value('NEW.part_id')} WHERE part_id = NEW.part_id;"),
+        'part_suppliers_del': ("AFTER DELETE ON part_suppliers",
+                               f"UPDATE part_summary SET value = {_part_value('OLD.part_id')} WHERE part_id = OLD.part_id;"),
+        'part_summary_ins': ("AFTER INSERT ON part_summary",
+                             _client_add('NEW.client_phone', parts='NEW.live', value='NEW.live * NEW.value')
+                             + _vin_add('NEW.vin_number', 'NEW.client_phone', 'NEW.live')),
+        'part_summary_upd': ("AFTER UPDATE ON part_summary",
+                             _client_sub('OLD.client_phone', parts='OLD.live', value='OLD.live * OLD.value')
+                             + _client_add('NEW.client_phone', parts='NEW.live', value='NEW.live * NEW.value')
+                             + _vin_sub('OLD.vin_number', 'OLD.live')
+                             + _vin_add('NEW.vin_number', 'NEW.client_phone', 'NEW.live')),
+        'part_summary_del': ("AFTER DELETE ON part_summary",
+                             _client_sub('OLD.client_phone', parts='OLD.live', value='OLD.live * OLD.value')
+                             + _vin_sub('OLD.vin_number', 'OLD.live')),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_summary_{name} {event} BEGIN {body} END")
+
+def rebuild_summaries(conn):
+    """Recompute the summary tables from the source tables (initial fill, or repair after manual edits)."""
+    conn.execute("DELETE FROM part_summary")
+    conn.execute(f'''
+        INSERT INTO part_summary (part_id, client_phone, vin_number, live, value)
+        SELECT id, client_phone, vin_number, deleted_at IS NULL, COALESCE(quantity, 0) * {_best_price('parts.id')}
+        FROM parts
+    ''')
+    # The part_summary triggers above adjusted the aggregates from whatever they held; start over
+    conn.execute("DELETE FROM vin_summary")
+    conn.execute("DELETE FROM client_summary")
+    conn.execute('''
+        INSERT INTO vin_summary (vin_number, client_phone, part_count)
+        SELECT v.vin_number, v.client_phone,
+               (SELECT COUNT(*) FROM parts p WHERE p.vin_number = v.vin_number AND p.deleted_at IS NULL)
+        FROM vins v WHERE v.vin_number IS NOT NULL
+    ''')
+    conn.execute('''
+        INSERT INTO client_summary (client_phone, vin_count, part_count, quoted_total, last_activity)
+        SELECT c.phone,
+               (SELECT COUNT(*) FROM vins v WHERE v.client_phone = c.phone AND v.deleted_at IS NULL),
+               (SELECT COUNT(*) FROM part_summary s WHERE s.client_phone = c.phone AND s.live),
+               (SELECT COALESCE(SUM(s.value), 0) FROM part_summary s WHERE s.client_phone = c.phone AND s.live),
+               MAX(COALESCE(c.last_updated, c.created_date, CURRENT_TIMESTAMP),
+                   COALESCE((SELECT MAX(v.last_updated) FROM vins v WHERE v.client_phone = c.phone), ''),
+                   COALESCE((SELECT MAX(p.last_updated) FROM parts p WHERE p.client_phone = c.phone), ''))
+        FROM clients c
+    ''')
+
+def _migration_008_summaries(cursor):
+    for create_sql in SUMMARY_TABLES.values():
+        cursor.execute(create_sql)
+    for name, definition in SUMMARY_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    _create_summary_triggers(cursor)
+    rebuild_summaries(cursor.connection)
+
+def _migration_009_part_number_key(cursor):
+    # Cross-client supplier comparison (services.supplier_analytics) groups live parts by normalized part number
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_parts_part_key_live ON parts(UPPER(TRIM(part_number))) WHERE deleted_at IS NULL"
+    )
+
+# (user_version, migration) pairs applied in order by migrate_schema
+SCHEMA_MIGRATIONS = [
+    (1, _migration_001_secondary_indexes),
+    (2, _migration_002_client_lookup_indexes),
+    (3, _migration_003_full_text_search),
+    (4, _migration_004_activity_log_archive),
+    (5, _migration_005_documents),
+    (6, _migration_006_soft_delete),
+    (7, _migration_007_cascading_keys),
+    (8, _migration_008_summaries),
+    (9, _migration_009_part_number_key),
+]
+
+# Hot queries checked by explain_hot_queries(), with sample parameters
+HOT_QUERIES = {
+    'get_parts_for_vin': ("SELECT * FROM parts WHERE vin_number = ? AND deleted_at IS NULL", ('VIN',)),
+    'get_parts_for_client_without_vin': (
+        "SELECT * FROM parts WHERE vin_number IS NULL AND client_phone = ? AND deleted_at IS NULL", ('0',),
+    ),
+    'get_vins_for_client': ("SELECT * FROM vins WHERE client_phone = ? AND deleted_at IS NULL", ('0',)),
+    'get_suppliers_for_part': ("SELECT * FROM part_suppliers WHERE part_id = ?", (0,)),
+    'get_clients_by_page': ("SELECT * FROM clients ORDER BY last_updated DESC LIMIT ? OFFSET ?", (20, 0)),
+    'get_clients_page_after': (
+        "SELECT phone, client_name, last_updated FROM clients WHERE (last_updated, phone) < (?, ?) ORDER BY last_updated DESC, phone DESC LIMIT ?",
+        ('9999', '', 21),
+    ),
+    'clients_by_activity': (
+        "SELECT c.phone, c.client_name, s.last_activity FROM client_summary s JOIN clients c ON c.phone = s.client_phone "
+        "WHERE (s.last_activity, s.client_phone) < (?, ?) ORDER BY s.last_activity DESC, s.client_phone DESC LIMIT ?",
+        ('9999', '', 21),
+    ),
+    'clients_by_value': (
+        "SELECT c.phone, c.client_name, s.quoted_total FROM client_summary s JOIN clients c ON c.phone = s.client_phone "
+        "ORDER BY s.quoted_total DESC, s.client_phone DESC LIMIT ?",
+        (21,),
+    ),
+    'vin_summary_by_client': ("SELECT vin_number, part_count FROM vin_summary WHERE client_phone = ?", ('0',)),
+    'find_clients_by_phone_prefix': ("SELECT phone, client_name FROM clients WHERE phone >= ? AND phone < ? ORDER BY phone LIMIT ?", ('1', '2', 10)),
+    'find_clients_by_name_prefix': (
+        "SELECT phone, client_name FROM clients WHERE client_name >= ? COLLATE NOCASE AND client_name < ? COLLATE NOCASE ORDER BY client_name COLLATE NOCASE LIMIT ?",
+        ('a', 'b', 10),
+    ),
+    'get_parts_by_page': ("SELECT * FROM parts WHERE deleted_at IS NULL ORDER BY last_updated DESC LIMIT ? OFFSET ?", (20, 0)),
+    'get_activity_logs': ("SELECT * FROM activity_log ORDER BY timestamp DESC LIMIT ?", (100,)),
+    'get_activity_logs_by_user': ("SELECT * FROM activity_log WHERE username = ? ORDER BY timestamp DESC LIMIT ?", ('admin', 100)),
+    'get_activity_logs_by_action': ("SELECT * FROM activity_log WHERE action = ? ORDER BY timestamp DESC LIMIT ?", ('login', 100)),
+    'get_activity_logs_by_table': ("SELECT * FROM activity_log WHERE table_name = ? ORDER BY timestamp DESC LIMIT ?", ('parts', 100)),
+    'activity_log_page_after': (
+        "SELECT * FROM activity_log WHERE timestamp >= ? AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?",
+        ('2000-01-01', '9999', 0, 51),
+    ),
+    'delete_vin_fallback': ("SELECT rowid FROM vins WHERE LOWER(TRIM(vin_number)) = LOWER(TRIM(?))", ('VIN',)),
+    'export_part_suppliers_by_client': (
+        "SELECT s.* FROM part_suppliers s JOIN parts p ON p.id = s.part_id WHERE p.deleted_at IS NULL AND p.client_phone = ?",
+        ('0',),
+    ),
+    'cascade_client_parts': ("SELECT id FROM parts WHERE client_phone = ?", ('0',)),
+    'trash_vins_by_client': ("SELECT * FROM vins WHERE client_phone = ? AND deleted_at IS NOT NULL", ('0',)),
+    'trash_parts_by_client': ("SELECT * FROM parts WHERE client_phone = ? AND deleted_at IS NOT NULL", ('0',)),
+    'undelete_vin_parts': ("SELECT id FROM parts WHERE vin_number = ? AND deleted_at = ?", ('VIN', '0')),
+    'purge_trash_parts': ("SELECT id FROM parts WHERE deleted_at < ?", ('0',)),
+    'purge_trash_vins': ("SELECT rowid FROM vins WHERE deleted_at < ?", ('0',)),
+    'supplier_offers_by_part_number': (
+        "SELECT s.* FROM parts p JOIN part_suppliers s ON s.part_id = p.id "
+        "WHERE p.deleted_at IS NULL AND UPPER(TRIM(p.part_number)) IN (SELECT value FROM json_each(?))",
+        ('["P1"]',),
+    ),
+    'find_document_by_inputs': ("SELECT * FROM documents WHERE input_hash = ? AND status != 'void'", ('0',)),
+    'documents_by_client': ("SELECT * FROM documents WHERE client_phone = ? ORDER BY created_date DESC LIMIT ?", ('0', 100)),
+    'documents_by_status': ("SELECT * FROM documents WHERE status = ? ORDER BY created_date DESC LIMIT ?", ('issued', 100)),
+}
+
+def explain_hot_queries() -> pd.DataFrame:
+    """Run EXPLAIN QUERY PLAN over HOT_QUERIES and report whether each avoids a full scan."""
+    rows = []
     try:
         with get_db_connection_ctx() as conn:
-            df_clients = pd.read_sql_query("SELECT * FROM clients", conn)
-            df_vins = pd.read_sql_query("SELECT * FROM vins", conn)
-            df_parts = pd.read_sql_query("SELECT * FROM parts", conn)
-            df_part_suppliers = pd.read_sql_query("SELECT * FROM part_suppliers", conn)
-            return df_clients, df_vins, df_parts, df_part_suppliers
+            for name, (query, params) in HOT_QUERIES.items():
+                plan = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+                full_scan = any(
+                    # Scanning a json_each() parameter list is not a table scan
+                    (step.startswith('SCAN ') and ' USING ' not in step and 'VIRTUAL TABLE' not in step)
+                    or 'TEMP B-TREE' in step
+                    for step in plan
+                )
+                rows.append({'query': name, 'uses_index': not full_scan, 'plan': ' | '.join(plan)})
+    except Exception as e:
+        print(f"Error explaining queries: {e}")
+    return pd.DataFrame(rows, columns=['query', 'uses_index', 'plan'])
+
+class TableCache:
+    """In-memory copy of the tracked tables, kept current from the data_changes log.
+
+    Frames are indexed by rowid. A refresh reads only the change-log rows newer than the
+    last seen sequence number and refetches just the affected rows; tables without changes
+    are returned as-is. Frames handed out are never mutated, so callers may hold them freely.
+    Tombstoned VINs and parts (and the suppliers of tombstoned parts) are left out of the
+    returned frames; the filtered frames are rebuilt only when a table version changes.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.frames: dict[str, pd.DataFrame] = {}
+        self.last_seq = 0
+        self.versions = {table: 0 for table in TRACKED_TABLES}
+        self._live = None
+        self._live_versions = None
+        self._lock = threading.Lock()
+
+    def _read_table(self, conn, table, row_ids=None):
+        query = f"SELECT rowid AS _rowid, * FROM {table}"
+        params = []
+        if row_ids is not None:
+            query += " WHERE rowid IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(sorted(row_ids)))
+        df = pd.read_sql_query(query, conn, params=params, index_col='_rowid')
+        df.index.name = None
+        return df
+
+    def _full_reload(self, conn, tables):
+        for table in tables:
+            self.frames[table] = self._read_table(conn, table)
+
+    def _patch(self, conn, table, row_ids):
+        fresh = self._read_table(conn, table, row_ids)
+        current = self.frames[table]
+        kept = current.drop(index=list(row_ids), errors='ignore')
+        if fresh.empty:
+            self.frames[table] = kept
+        elif kept.empty:
+            self.frames[table] = fresh
+        else:
+            self.frames[table] = pd.concat([kept, fresh])
+
+    def _live_frames(self):
+        frames = dict(self.frames)
+        for table in SOFT_DELETE_TABLES:
+            frame = frames[table]
+            if 'deleted_at' in frame.columns:
+                frames[table] = frame[frame['deleted_at'].isna()]
+        suppliers = frames['part_suppliers']
+        if len(frames['parts']) != len(self.frames['parts']) and 'part_id' in suppliers.columns:
+            frames['part_suppliers'] = suppliers[suppliers['part_id'].isin(frames['parts'].index)]
+        return tuple(frames[table] for table in TRACKED_TABLES)
+
+    def refresh(self):
+        """Bring the cached frames up to date and return them in TRACKED_TABLES order."""
+        with self._lock, get_db_connection_ctx() as conn:
+            min_seq, max_seq = conn.execute("SELECT MIN(seq), MAX(seq) FROM data_changes").fetchone()
+            max_seq = max_seq or 0
+            if not self.frames or (min_seq is not None and self.last_seq < min_seq - 1) or max_seq < self.last_seq:
+                # First load, or the log was pruned/reset past our position
+                self._full_reload(conn, TRACKED_TABLES)
+                self.versions = {table: max_seq for table in TRACKED_TABLES}
+                self._live = None
+            elif max_seq > self.last_seq:
+                changed: dict[str, set | None] = {}
+                rows = conn.execute(
+                    "SELECT seq, table_name, row_id FROM data_changes WHERE seq > ? AND seq <= ?",
+                    (self.last_seq, max_seq),
+                ).fetchall()
+                for seq, table, row_id in rows:
+                    if table not in self.frames:
+                        continue
+                    self.versions[table] = max(self.versions[table], seq)
+                    if row_id is None:
+                        changed[table] = None
+                    elif changed.get(table, set()) is not None:
+                        changed.setdefault(table, set()).add(row_id)
+                for table, row_ids in changed.items():
+                    if row_ids is None:
+                        self._full_reload(conn, [table])
+                    else:
+                        self._patch(conn, table, row_ids)
+            self.last_seq = max_seq
+            if min_seq is not None and max_seq - min_seq > CHANGE_LOG_RETAIN * 2:
+                prune_change_log(conn)
+            if self._live is None or self._live_versions != self.versions:
+                self._live = self._live_frames()
+                self._live_versions = dict(self.versions)
+            return self._live
+
+_table_caches: dict[str, TableCache] = {}
+
+def get_table_cache() -> TableCache:
+    """Return the process-wide TableCache for the current DB_NAME."""
+    cache = _table_caches.get(DB_NAME)
+    if cache is None:
+        cache = _table_caches.setdefault(DB_NAME, TableCache(DB_NAME))
+    return cache
+
+def prune_change_log(conn, retain: int = CHANGE_LOG_RETAIN):
+    """Drop old data_changes rows; caches that fall behind the pruned range do a full reload."""
+    conn.execute(
+        "DELETE FROM data_changes WHERE seq <= (SELECT MAX(seq) FROM data_changes) - ?",
+        (retain,),
+    )
+    conn.commit()
+
+def load_data():
+    """Load all data from database (incrementally, through the shared TableCache)"""
+    try:
+        return get_table_cache().refresh()
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
 def get_activity_logs(username=None, limit=100):
     """Get activity logs"""
+    flush_activity_log()
     try:
         with get_db_connection_ctx() as conn:
             query = "SELECT * FROM activity_log"
@@ -219,6 +1022,13 @@ def database_maintenance():
     try:
         with get_db_connection_ctx() as conn:
             conn.execute("VACUUM")
+            # VACUUM may renumber rowids of tables without an INTEGER PRIMARY KEY
+            conn.executemany(
+                "INSERT INTO data_changes (table_name, row_id) VALUES (?, NULL)",
+                [(table,) for table in TRACKED_TABLES],
+            )
+            rebuild_search_indexes(conn)
+            conn.commit()
             conn.execute("ANALYZE")
             result = conn.execute("PRAGMA integrity_check").fetchone()
             return result[0] == "ok"
@@ -226,28 +1036,122 @@ def database_maintenance():
         print(f"Database maintenance error: {e}")
         return False
 
-def log_activity(username, action, details, table_name=None, record_id=None, old_values=None, new_values=None):
-    """Log user activity to the database"""
+# Activity log batching: queued rows are written once this many are pending or after this many seconds
+ACTIVITY_LOG_BATCH_SIZE = 50
+ACTIVITY_LOG_FLUSH_INTERVAL = 1.0
+
+_ACTIVITY_LOG_INSERT = """
+    INSERT INTO activity_log (timestamp, username, action, details, table_name, record_id, old_values, new_values)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+class ActivityLogWriter:
+    """Background writer that inserts queued activity_log rows in batched transactions.
+
+    Rows are grouped per database file and written with executemany in one transaction
+    when ACTIVITY_LOG_BATCH_SIZE rows are pending or ACTIVITY_LOG_FLUSH_INTERVAL has passed.
+    flush() blocks until everything queued before it is written; close() drains and stops.
+    """
+
+    def __init__(self, batch_size=ACTIVITY_LOG_BATCH_SIZE, flush_interval=ACTIVITY_LOG_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, db_name, row):
+        self._ensure_started()
+        self._queue.put((db_name, row))
+
+    def flush(self, timeout=10.0):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(10.0)
+
+    @staticmethod
+    def _write(pending):
+        for db_name, rows in pending.items():
+            try:
+                with get_pool(db_name).acquire_ctx() as conn:
+                    conn.executemany(_ACTIVITY_LOG_INSERT, rows)
+                    conn.commit()
+            except (sqlite3.Error, ConnectionError) as e:
+                print(f"Error logging activity: {e}")
+        pending.clear()
+
+    def _run(self):
+        pending: dict[str, list] = {}
+        count = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if isinstance(item, tuple):
+                db_name, row = item
+                pending.setdefault(db_name, []).append(row)
+                count += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if count < self.batch_size:
+                    continue
+            # Batch full, interval elapsed, flush requested or shutdown
+            self._write(pending)
+            count = 0
+            deadline = None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+_activity_log_writer = ActivityLogWriter()
+
+def flush_activity_log(timeout=10.0):
+    """Block until all queued activity log rows are written."""
+    _activity_log_writer.flush(timeout)
+
+# Registered after close_pools so it runs first at exit (atexit is LIFO)
+atexit.register(_activity_log_writer.close)
+
+def log_activity(username, action, details, table_name=None, record_id=None, old_values=None, new_values=None, conn=None):
+    """Log user activity to the database.
+
+    By default the row is queued for the background writer. Pass the caller's connection as
+    conn to insert it in the caller's open transaction instead, so it commits (or rolls back)
+    together with the business change.
+    """
+    row = (
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        username,
+        action,
+        details,
+        table_name,
+        record_id,
+        json.dumps(old_values) if old_values else None,
+        json.dumps(new_values) if new_values else None
+    )
+    if conn is None:
+        _activity_log_writer.submit(DB_NAME, row)
+        return
     try:
-        with get_db_connection_ctx() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO activity_log (timestamp, username, action, details, table_name, record_id, old_values, new_values)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    username,
-                    action,
-                    details,
-                    table_name,
-                    record_id,
-                    json.dumps(old_values) if old_values else None,
-                    json.dumps(new_values) if new_values else None
-                )
-            )
-            conn.commit()
+        conn.execute(_ACTIVITY_LOG_INSERT, row)
     except sqlite3.Error as e:
         print(f"Error logging activity: {e}")
 
@@ -312,8 +1216,8 @@ def create_user(username: str, password: str, role: str, actor: str) -> tuple[bo
                     "INSERT INTO users (username, password_hash, role, created_date) VALUES (?, ?, ?, ?)",
                     (username, pwd_hash, role, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
                 )
+            log_activity(actor, "create_user", f"Created user '{username}' with role '{role}'", "users", username, conn=conn)
             conn.commit()
-            log_activity(actor, "create_user", f"Created user '{username}' with role '{role}'", "users", username)
             # If a new admin was created and a default 'admin' exists, consider deactivating 'admin'
             if role == 'admin' and username != 'admin' and _users_has_is_active(conn):
                 try:
@@ -336,8 +1240,8 @@ def update_user_password(username: str, new_password: str, actor: str) -> tuple[
             cur.execute("UPDATE users SET password_hash = ? WHERE username = ?", (pwd_hash, username))
             if cur.rowcount == 0:
                 return False, "User not found"
+            log_activity(actor, "update_password", f"Updated password for '{username}'", "users", username, conn=conn)
             conn.commit()
-            log_activity(actor, "update_password", f"Updated password for '{username}'", "users", username)
             return True, "Password updated"
     except sqlite3.Error as e:
         return False, f"DB error: {e}"
@@ -359,8 +1263,8 @@ def update_user_role(username: str, new_role: str, actor: str) -> tuple[bool, st
             cur.execute("UPDATE users SET role = ? WHERE username = ?", (new_role, username))
             if cur.rowcount == 0:
                 return False, "User not found"
+            log_activity(actor, "update_role", f"Changed role for '{username}' to '{new_role}'", "users", username, conn=conn)
             conn.commit()
-            log_activity(actor, "update_role", f"Changed role for '{username}' to '{new_role}'", "users", username)
             return True, "Role updated"
     except sqlite3.Error as e:
         return False, f"DB error: {e}"
@@ -383,43 +1287,125 @@ def set_user_active(username: str, active: bool, actor: str) -> tuple[bool, str]
             if active:
                 # Reactivate
                 conn.execute("UPDATE users SET is_active = 1 WHERE username = ?", (username,))
+                log_activity(actor, "activate_user", f"Reactivated user '{username}'", "users", username, conn=conn)
                 conn.commit()
-                log_activity(actor, "activate_user", f"Reactivated user '{username}'", "users", username)
                 return True, "User reactivated"
             else:
                 if role == 'admin' and count_admins() <= 1:
                     return False, "Cannot deactivate the last admin"
                 conn.execute("UPDATE users SET is_active = 0 WHERE username = ?", (username,))
+                log_activity(actor, "deactivate_user", f"Deactivated user '{username}'", "users", username, conn=conn)
                 conn.commit()
-                log_activity(actor, "deactivate_user", f"Deactivated user '{username}'", "users", username)
                 return True, "User deactivated"
     except sqlite3.Error as e:
         return False, f"DB error: {e}"
 
-def _apply_basic_filters(df: pd.DataFrame, table: str, filters: dict) -> pd.DataFrame:
-    """Apply simple filters to a DataFrame based on provided filter dict."""
-    if df is None or df.empty:
-        return df
-    if not filters:
-        return df
+# Rows fetched per round trip while exporting, and output size kept in memory before spilling to disk
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+EXPORT_TABLES = ('clients', 'vins', 'parts', 'part_suppliers')
 
-    df_f = df
+def _export_filter_clause(table: str, filters: dict, alias: str = '') -> tuple[str, list]:
+    """Build the WHERE clause for the export filters ('client_phone', 'vin_number') of a table."""
+    prefix = f"{alias}." if alias else ""
+    conditions, params = [], []
     client_phone = filters.get('client_phone')
     vin_number = filters.get('vin_number')
-
     if table == 'clients':
         if client_phone:
-            df_f = df_f[df_f['phone'].astype(str) == str(client_phone)]
+            conditions.append(f"{prefix}phone = ?")
+            params.append(str(client_phone))
     elif table in ('vins', 'parts'):
-        if client_phone and 'client_phone' in df_f.columns:
-            df_f = df_f[df_f['client_phone'].astype(str) == str(client_phone)]
-        if vin_number and 'vin_number' in df_f.columns:
-            df_f = df_f[df_f['vin_number'].astype(str) == str(vin_number)]
-    return df_f
+        conditions.append(f"{prefix}deleted_at IS NULL")
+        if client_phone:
+            conditions.append(f"{prefix}client_phone = ?")
+            params.append(str(client_phone))
+        if vin_number:
+            conditions.append(f"{prefix}vin_number = ?")
+            params.append(str(vin_number))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def _export_queries(filters: dict) -> dict[str, tuple[str, list]]:
+    """Return {table: (query, params)} for the tables selected in filters['include']."""
+    include = filters.get('include') or list(EXPORT_TABLES)
+    include = [t for t in EXPORT_TABLES if t in include]
+    queries = {}
+    for table in ('clients', 'vins', 'parts'):
+        if table in include:
+            where, params = _export_filter_clause(table, filters)
+            queries[table] = (f"SELECT * FROM {table}{where}", params)
+    if 'part_suppliers' in include:
+        if filters.get('client_phone') or filters.get('vin_number'):
+            # part_suppliers follows the parts filter (and skips tombstoned parts) through an indexed join
+            where, params = _export_filter_clause('parts', filters, alias='p')
+            queries['part_suppliers'] = (
+                f"SELECT s.* FROM part_suppliers s JOIN parts p ON p.id = s.part_id{where}",
+                params,
+            )
+        else:
+            # Unfiltered: read part_suppliers directly, leaving out only the suppliers of trashed parts
+            queries['part_suppliers'] = (
+                "SELECT * FROM part_suppliers WHERE part_id NOT IN "
+                "(SELECT id FROM parts WHERE deleted_at IS NOT NULL)",
+                [],
+            )
+    return queries
+
+def _iter_export_rows(conn, query, params):
+    """Yield the header row, then data rows fetched EXPORT_CHUNK_ROWS at a time."""
+    cur = conn.execute(query, params)
+    yield [d[0] for d in cur.description]
+    while True:
+        rows = cur.fetchmany(EXPORT_CHUNK_ROWS)
+        if not rows:
+            break
+        yield from rows
+
+def _write_csv_zip(conn, queries, fileobj):
+    with zipfile.ZipFile(fileobj, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, (query, params) in queries.items():
+            with zf.open(f"{name}.csv", mode='w') as entry:
+                text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+                csv.writer(text, lineterminator='\n').writerows(_iter_export_rows(conn, query, params))
+                text.flush()
+                text.detach()
+
+def _write_excel(conn, queries, fileobj):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, (query, params) in queries.items():
+        # Ensure sheet names are valid and unique
+        ws = wb.create_sheet(title=name[:31])
+        for row in _iter_export_rows(conn, query, params):
+            ws.append(row)
+    wb.save(fileobj)
+
+def stream_filtered_export(fileobj, filters=None, format_type: str = 'csv') -> str:
+    """Write the filtered export into a binary file object, one chunk of rows at a time.
+
+    Filters are applied in SQL and each table is written to the archive/workbook as it is
+    read, so memory use does not grow with the table sizes. Returns the MIME type.
+    """
+    with get_db_connection_ctx() as conn:
+        try:
+            queries = _export_queries(filters or {})
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError(f"Export query failed: {e}")
+        if format_type.lower() == 'excel':
+            _write_excel(conn, queries, fileobj)
+            return 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        # Default to CSV ZIP
+        _write_csv_zip(conn, queries, fileobj)
+        return 'application/zip'
 
 def export_filtered_data(filters=None, format_type: str = 'csv'):
     """Export selected tables with optional filters.
 
+    The export is built in a spooled temporary file that moves to disk past
+    EXPORT_SPOOL_MAX_BYTES; see stream_filtered_export to write to a file directly.
+
     Args:
         filters: dict with optional keys: 'include' list of table names, 'client_phone', 'vin_number'
         format_type: 'csv' (zip with CSVs) or 'excel'
@@ -428,65 +1414,9 @@ def export_filtered_data(filters=None, format_type: str = 'csv'):
         (bytes, mime_type)
     """
     try:
-        with get_db_connection_ctx() as conn:
-            include = (filters or {}).get('include') or [
-                'clients', 'vins', 'parts', 'part_suppliers'
-            ]
-            include = [t for t in include if t in ['clients', 'vins', 'parts', 'part_suppliers']]
-
-            # Load dataframes
-            dfs: dict[str, pd.DataFrame] = {}
-            try:
-                if 'clients' in include:
-                    dfs['clients'] = pd.read_sql_query("SELECT * FROM clients", conn)
-                    dfs['clients'] = _apply_basic_filters(dfs['clients'], 'clients', filters or {})
-                if 'vins' in include:
-                    dfs['vins'] = pd.read_sql_query("SELECT * FROM vins", conn)
-                    dfs['vins'] = _apply_basic_filters(dfs['vins'], 'vins', filters or {})
-                if 'parts' in include or 'part_suppliers' in include:
-                    df_parts = pd.read_sql_query("SELECT * FROM parts", conn)
-                    df_parts = _apply_basic_filters(df_parts, 'parts', filters or {})
-                    if 'parts' in include:
-                        dfs['parts'] = df_parts
-                    # part_suppliers depends on part ids
-                    if 'part_suppliers' in include:
-                        if not df_parts.empty:
-                            part_ids = df_parts['id'].dropna().astype(int).tolist()
-                            # build parameterized IN clause safely
-                            placeholders = ','.join(['?'] * len(part_ids))
-                            query = f"SELECT * FROM part_suppliers WHERE part_id IN ({placeholders})"
-                            dfs['part_suppliers'] = pd.read_sql_query(query, conn, params=part_ids)
-                        else:
-                            dfs['part_suppliers'] = pd.DataFrame(columns=[
-                                'id', 'part_id', 'supplier_name', 'buying_price', 'selling_price', 'delivery_time',
-                                'created_date', 'last_updated', 'created_by', 'last_updated_by'
-                            ])
-            except Exception as e:  # pragma: no cover
-                raise RuntimeError(f"Export query failed: {e}")
-
-            # Prepare output
-            if format_type.lower() == 'excel':
-                buffer = io.BytesIO()
-                try:
-                    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                        for name, df in dfs.items():
-                            # Ensure sheet names are valid and unique
-                            sheet_name = name[:31]
-                            df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    data = buffer.getvalue()
-                finally:
-                    buffer.close()
-                mime = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                return data, mime
-            else:
-                # Default to CSV ZIP
-                buffer = io.BytesIO()
-                with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-                    for name, df in dfs.items():
-                        csv_bytes = df.to_csv(index=False).encode('utf-8')
-                        zf.writestr(f"{name}.csv", csv_bytes)
-                data = buffer.getvalue()
-                buffer.close()
-                return data, 'application/zip'
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES) as spool:
+            mime = stream_filtered_export(spool, filters, format_type)
+            spool.seek(0)
+            return spool.read(), mime
     except Exception as e:
         raise RuntimeError(f"Export failed: {e}")
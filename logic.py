@@ -1,9 +1,13 @@
 # logic.py
 import sqlite3
+import json
+from dataclasses import dataclass, field
 from datetime import datetime
 import pandas as pd
 from security import validate_phone, validate_vin, sanitize_input, validate_numeric
 from db_utils import log_activity, get_db_connection, get_db_connection_ctx
+from services.search import search
+from services.cache import memoize, invalidate, table_key, entity_key, client_key
 
 def _execute_query(query, params=(), fetch=None):
     """A helper function to execute database queries with a cached connection."""
@@ -28,6 +32,79 @@ def _execute_query(query, params=(), fetch=None):
         conn.rollback()
         raise
 
+def _publish(tables=(), entities=(), phones=()):
+    """Evict cached reads for exactly the tables, rows and clients a mutation touched."""
+    keys = [table_key(t) for t in tables]
+    keys += [entity_key(t, row_id) for t, row_id in entities if row_id is not None]
+    keys += [client_key(p) for p in phones if p]
+    invalidate(*keys)
+
+def _client_of_part(part_id):
+    row = _execute_query("SELECT client_phone FROM parts WHERE id = ?", (part_id,), fetch='one')
+    return row[0] if row else None
+
+class UnitOfWork:
+    """Run a multi-step mutation on one pooled connection in one transaction.
+
+    The transaction starts with BEGIN IMMEDIATE on enter and is committed once on a clean
+    exit, or rolled back if the block raises. Activity rows written through log() commit
+    with it, and the cache keys collected by touch() are published only after the commit.
+
+        with UnitOfWork(username) as uow:
+            uow.execute("UPDATE parts SET ... WHERE id = ?", (...))
+            uow.executemany("INSERT INTO part_suppliers ...", rows)
+            uow.log("update_part", "...", "parts", part_id)
+            uow.touch(tables=('parts',), phones=[phone])
+    """
+
+    def __init__(self, username=None):
+        self.username = username
+        self.conn = None
+        self.cursor = None
+        self._ctx = None
+        self._tables, self._entities, self._phones = set(), set(), set()
+
+    def __enter__(self):
+        self._ctx = get_db_connection_ctx()
+        self.conn = self._ctx.__enter__()
+        try:
+            self.cursor = self.conn.cursor()
+            self.cursor.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            self._ctx.__exit__(type(e), e, e.__traceback__)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self._ctx.__exit__(None, None, None)
+        if exc_type is None:
+            _publish(tables=self._tables, entities=self._entities, phones=self._phones)
+        return False
+
+    def execute(self, query, params=()):
+        return self.cursor.execute(query, params)
+
+    def executemany(self, query, seq_of_params):
+        return self.cursor.executemany(query, seq_of_params)
+
+    def fetchone(self, query, params=()):
+        return self.cursor.execute(query, params).fetchone()
+
+    def log(self, action, details, table_name=None, record_id=None, old_values=None, new_values=None):
+        log_activity(self.username, action, details, table_name, record_id, old_values, new_values, conn=self.conn)
+
+    def touch(self, tables=(), entities=(), phones=()):
+        """Cache keys to evict once the transaction has committed."""
+        self._tables.update(tables)
+        self._entities.update((t, str(row_id)) for t, row_id in entities if row_id is not None)
+        self._phones.update(str(p) for p in phones if p)
+
 def add_new_client(phone, client_name, username):
     """Add a new client to the database with validation"""
     if not phone:
@@ -55,6 +132,7 @@ def add_new_client(phone, client_name, username):
     
     log_activity(username, "add_client", f"Added client: {phone} - {client_name}", 
                 "clients", phone, None, {"phone": phone, "client_name": client_name})
+    _publish(tables=('clients',), entities=[('clients', phone)], phones=[phone])
     return result
 
 def add_vin_to_client(client_phone, vin_no, model, prod_yr, body, engine, code, transmission, username):
@@ -81,22 +159,44 @@ def add_vin_to_client(client_phone, vin_no, model, prod_yr, body, engine, code,
     code = sanitize_input(code)
     transmission = sanitize_input(transmission)
     
-    client_exists = _execute_query(
-        "SELECT phone FROM clients WHERE phone = ?", 
-        (client_phone,), 
-        fetch='one'
-    )
-    
-    if not client_exists:
-        raise ValueError(f"Client with phone {client_phone} does not exist")
-    
-    result = _execute_query(
-        "INSERT OR IGNORE INTO vins (vin_number, client_phone, model, prod_yr, body, engine, code, transmission, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (clean_vin, client_phone, model, prod_yr, body, engine, code, transmission, username, username)
-    )
-    
-    log_activity(username, "add_vin", f"Added VIN: {clean_vin} for client: {client_phone}", 
+    with UnitOfWork(username) as uow:
+        if not uow.fetchone("SELECT phone FROM clients WHERE phone = ?", (client_phone,)):
+            raise ValueError(f"Client with phone {client_phone} does not exist")
+
+        details = (model, prod_yr, body, engine, code, transmission)
+        trashed = uow.fetchone(
+            "SELECT rowid, client_phone, deleted_at FROM vins WHERE vin_number = ? AND deleted_at IS NOT NULL", (clean_vin,)
+        ) if clean_vin else None
+        if trashed and trashed[1] != client_phone:
+            raise ValueError(f"VIN {clean_vin} is in another client's trash; restore or purge it there first")
+
+        if trashed:
+            # Registering a trashed VIN again restores it, and the parts deleted with it, with the new details
+            result, _, deleted_at = trashed
+            uow.execute(
+                "UPDATE vins SET model = ?, prod_yr = ?, body = ?, engine = ?, code = ?, transmission = ?, "
+                "deleted_at = NULL, deleted_by = NULL, last_updated_by = ? WHERE rowid = ?",
+                details + (username, result),
+            )
+            uow.execute(
+                "UPDATE parts SET deleted_at = NULL, deleted_by = NULL, last_updated_by = ? WHERE vin_number = ? AND deleted_at = ?",
+                (username, clean_vin, deleted_at),
+            )
+            uow.log("add_vin", f"Restored VIN from the trash: {clean_vin} for client: {client_phone}",
+                    "vins", clean_vin, None, {"vin_number": clean_vin, "client_phone": client_phone})
+            uow.touch(tables=('vins', 'parts', 'part_suppliers'), entities=[('vins', clean_vin)], phones=[client_phone])
+            return result
+
+        try:
+            result = uow.execute(
+                "INSERT INTO vins (vin_number, client_phone, model, prod_yr, body, engine, code, transmission, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (clean_vin, client_phone) + details + (username, username)
+            ).lastrowid
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"VIN {clean_vin} is already registered") from e
+        uow.log("add_vin", f"Added VIN: {clean_vin} for client: {client_phone}",
                 "vins", clean_vin, None, {"vin_number": clean_vin, "client_phone": client_phone})
+        uow.touch(tables=('vins',), entities=[('vins', clean_vin)], phones=[client_phone])
     return result
 
 def add_supplier_to_part(part_id, supplier_name, buying_price, selling_price, delivery_time, username):
@@ -126,6 +226,7 @@ def add_supplier_to_part(part_id, supplier_name, buying_price, selling_price, de
     
     log_activity(username, "add_supplier", f"Added supplier: {supplier_name} for part: {part_id}", 
                 "part_suppliers", part_id, None, {"part_id": part_id, "supplier_name": supplier_name})
+    _publish(tables=('part_suppliers',), entities=[('parts', part_id)], phones=[_client_of_part(part_id)])
     return result
 
 def add_part_to_vin(vin_number, client_phone, part_name, part_number, quantity, notes, suppliers, username):
@@ -149,10 +250,10 @@ def add_part_to_vin(vin_number, client_phone, part_name, part_number, quantity,
                     "INSERT INTO part_suppliers (part_id, supplier_name, buying_price, selling_price, delivery_time, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
                     (part_id, supplier['name'], supplier['buying_price'], supplier['selling_price'], supplier['delivery_time'], username, username)
                 )
-            conn.commit()
-            
             log_activity(username, "add_part", f"Added part: {part_name} ({part_number}) to VIN: {vin_number}", 
-                        "parts", part_id, None, {"part_name": part_name, "part_number": part_number})
+                        "parts", part_id, None, {"part_name": part_name, "part_number": part_number}, conn=conn)
+            conn.commit()
+            _publish(tables=('parts', 'part_suppliers'), entities=[('parts', part_id), ('vins', vin_number)], phones=[client_phone])
             return part_id
     except sqlite3.Error as e:
         print(f"Database error during part/supplier addition: {e}")
@@ -214,123 +315,296 @@ def add_part_without_vin(part_name, part_number, quantity, notes, client_phone,
                     "INSERT INTO part_suppliers (part_id, supplier_name, buying_price, selling_price, delivery_time, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
                     (part_id, supplier['name'], supplier['buying_price'], supplier['selling_price'], supplier['delivery_time'], username, username)
                 )
-            conn.commit()
-            
             log_activity(username, "add_part", f"Added part without VIN: {part_name} ({part_number}) for client: {client_phone}", 
-                        "parts", part_id, None, {"part_name": part_name, "part_number": part_number})
+                        "parts", part_id, None, {"part_name": part_name, "part_number": part_number}, conn=conn)
+            conn.commit()
+            _publish(tables=('parts', 'part_suppliers'), entities=[('parts', part_id)], phones=[client_phone])
             return part_id
     except sqlite3.Error as e:
         print(f"Database error during part/supplier addition: {e}")
         raise
 
+def _validate_bulk_part(part):
+    """Return an error message for one bulk part row, or None if it can be inserted."""
+    if not part.get('name') and not part.get('number'):
+        return "Part name or part number is required"
+    if not validate_numeric(part.get('quantity', 0), min_val=1):
+        return "Quantity must be at least 1"
+    if not float(part['quantity']).is_integer():
+        return "Quantity must be a whole number"
+    for supplier in part.get('suppliers') or []:
+        if not supplier.get('name'):
+            return "Supplier name is required"
+        if not validate_numeric(supplier.get('buying_price') or 0, min_val=0) or not validate_numeric(supplier.get('selling_price') or 0, min_val=0):
+            return f"Invalid prices for supplier {supplier.get('name')}"
+    return None
+
+def add_parts_bulk(parts, username, vin_number=None, client_phone=None):
+    """Insert a batch of parts (and their suppliers) in one transaction.
+
+    Args:
+        parts: list of dicts with 'name', 'number', 'quantity', 'notes' and optional 'suppliers'
+            (dicts with 'name', 'buying_price', 'selling_price', 'delivery_time')
+        vin_number: VIN the parts belong to; its owner is used as client_phone
+        client_phone: owner for parts without a VIN (ignored when vin_number is given)
+
+    Returns:
+        (new part ids in input order for the rows that were inserted, list of (row index, error))
+    """
+    errors = []
+    valid = []
+    for idx, part in enumerate(parts):
+        error = _validate_bulk_part(part)
+        if error:
+            errors.append((idx, error))
+        else:
+            valid.append(part)
+    if not valid:
+        return [], errors
+
+    date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with get_db_connection_ctx() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                if vin_number:
+                    owner = cur.execute("SELECT client_phone FROM vins WHERE vin_number = ? AND deleted_at IS NULL", (vin_number,)).fetchone()
+                    if not owner:
+                        raise ValueError(f"VIN {vin_number} not found in database")
+                    client_phone = owner[0]
+                # Ids are assigned up front so parts and suppliers can both go through executemany
+                first_id = cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM parts").fetchone()[0]
+                part_ids = list(range(first_id, first_id + len(valid)))
+                cur.executemany(
+                    "INSERT INTO parts (id, vin_number, client_phone, part_name, part_number, quantity, notes, date_added, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (part_id, vin_number or None, client_phone, sanitize_input(part.get('name')), sanitize_input(part.get('number')),
+                         int(float(part['quantity'])), sanitize_input(part.get('notes')) or '', date_added, username, username)
+                        for part_id, part in zip(part_ids, valid)
+                    ],
+                )
+                cur.executemany(
+                    "INSERT INTO part_suppliers (part_id, supplier_name, buying_price, selling_price, delivery_time, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (part_id, sanitize_input(s['name']), float(s.get('buying_price') or 0), float(s.get('selling_price') or 0),
+                         s.get('delivery_time') or '', username, username)
+                        for part_id, part in zip(part_ids, valid) for s in part.get('suppliers') or []
+                    ],
+                )
+                log_activity(
+                    username,
+                    "add_parts_bulk",
+                    f"Added {len(part_ids)} parts to {'VIN: ' + vin_number if vin_number else 'client: ' + str(client_phone)}",
+                    "parts",
+                    ','.join(str(pid) for pid in part_ids),
+                    None,
+                    {"part_ids": part_ids, "vin_number": vin_number, "client_phone": client_phone},
+                    conn=conn,
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except sqlite3.Error as e:
+        print(f"Database error during bulk part addition: {e}")
+        raise
+
+    _publish(
+        tables=('parts', 'part_suppliers'),
+        entities=[('parts', pid) for pid in part_ids] + [('vins', vin_number)],
+        phones=[client_phone],
+    )
+    return part_ids, errors
+
 def delete_client(phone, username):
     """Delete a client and all associated data"""
     if not phone:
         raise ValueError("Phone number is required")
-    
-    client_name = _execute_query(
-        "SELECT client_name FROM clients WHERE phone = ?", 
-        (phone,), 
-        fetch='one'
-    )
-    
-    result = _execute_query("DELETE FROM clients WHERE phone = ?", (phone,))
-    
-    if client_name:
-        log_activity(username, "delete_client", f"Deleted client: {phone} - {client_name[0]}", 
+
+    with UnitOfWork(username) as uow:
+        client_name = uow.fetchone("SELECT client_name FROM clients WHERE phone = ?", (phone,))
+        result = uow.execute("DELETE FROM clients WHERE phone = ?", (phone,)).rowcount
+        if client_name:
+            uow.log("delete_client", f"Deleted client: {phone} - {client_name[0]}",
                     "clients", phone, {"phone": phone, "client_name": client_name[0]}, None)
-    else:
-        log_activity(username, "delete_client", f"Deleted client: {phone}", "clients", phone, None, None)
-    
+        else:
+            uow.log("delete_client", f"Deleted client: {phone}", "clients", phone, None, None)
+        uow.touch(tables=('clients', 'vins', 'parts', 'part_suppliers'), entities=[('clients', phone)], phones=[phone])
     return result
 
+# How VIN-less vehicles show up: a NULL vin_number or one of these placeholder strings
+_PLACEHOLDER_VIN_SQL = "(vin_number IS NULL OR TRIM(vin_number) IN ('', 'None', 'none', 'No VIN provided'))"
+
+def _is_placeholder_vin(vin):
+    return vin is None or str(vin).strip().lower() in {"", "none", "no vin provided"}
+
+def _tombstone():
+    """Deletion timestamp; unique enough that a VIN and the parts deleted with it share one value."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
 def delete_vin(vin_number, username, client_phone: str | None = None):
-    """Delete a VIN and all associated parts.
+    """Move a VIN and its parts to the trash (see undelete_vin / services.trash).
 
     Handles special cases where VIN may be stored as NULL/blank by scoping to client_phone when provided.
-    Returns number of rows deleted.
+    The VIN and the parts deleted with it share one deleted_at value. Returns number of VINs deleted.
     """
     if vin_number is None or str(vin_number).strip() == "":
         vin = None
     else:
         vin = str(vin_number).strip()
 
-    try:
-        with get_db_connection_ctx() as conn:
-            conn.execute("PRAGMA foreign_keys = ON")
-            cur = conn.cursor()
+    deleted_at = _tombstone()
+    tombstone = "UPDATE vins SET deleted_at = ?, deleted_by = ? WHERE deleted_at IS NULL AND "
+    with UnitOfWork(username) as uow:
+        # Owners of the VINs about to be deleted, so their cached views can be evicted
+        if client_phone:
+            owners = {str(client_phone)}
+        elif vin is not None:
+            owners = {r[0] for r in uow.execute(
+                "SELECT client_phone FROM vins WHERE LOWER(TRIM(vin_number)) = LOWER(TRIM(?))", (vin,)
+            ).fetchall()}
+        else:
+            owners = set()
 
-            deleted = 0
-            if vin is None or vin.lower() in {"none", "no vin provided"}:
-                # Delete the placeholder/NULL VIN for this specific client only
-                if client_phone:
-                    cur.execute(
-                        "DELETE FROM vins WHERE client_phone = ? AND (vin_number IS NULL OR TRIM(vin_number) IN ('', 'None', 'none', 'No VIN provided'))",
-                        (str(client_phone),),
-                    )
-                else:
-                    # As a safeguard, do not mass-delete all NULL vins without scope
-                    return 0
-                deleted = cur.rowcount
+        deleted = 0
+        if _is_placeholder_vin(vin):
+            # Delete the placeholder/NULL VIN for this specific client only
+            if not client_phone:
+                # As a safeguard, do not mass-delete all NULL vins without scope
+                return 0
+            deleted = uow.execute(
+                tombstone + "client_phone = ? AND " + _PLACEHOLDER_VIN_SQL,
+                (deleted_at, username, str(client_phone)),
+            ).rowcount
+        else:
+            # Exact match first (optionally scoped by client)
+            if client_phone:
+                deleted = uow.execute(tombstone + "client_phone = ? AND vin_number = ?",
+                                      (deleted_at, username, str(client_phone), vin)).rowcount
             else:
-                # Exact match first (optionally scoped by client)
+                deleted = uow.execute(tombstone + "vin_number = ?", (deleted_at, username, vin)).rowcount
+
+            # Fallback: trim/case-insensitive match
+            if deleted == 0:
                 if client_phone:
-                    cur.execute(
-                        "DELETE FROM vins WHERE client_phone = ? AND vin_number = ?",
-                        (str(client_phone), vin),
-                    )
+                    deleted = uow.execute(tombstone + "client_phone = ? AND LOWER(TRIM(vin_number)) = LOWER(TRIM(?))",
+                                          (deleted_at, username, str(client_phone), vin)).rowcount
                 else:
-                    cur.execute("DELETE FROM vins WHERE vin_number = ?", (vin,))
-                deleted = cur.rowcount
-
-                # Fallback: trim/case-insensitive match
-                if deleted == 0:
-                    if client_phone:
-                        cur.execute(
-                            "DELETE FROM vins WHERE client_phone = ? AND LOWER(TRIM(vin_number)) = LOWER(TRIM(?))",
-                            (str(client_phone), vin),
-                        )
-                    else:
-                        cur.execute(
-                            "DELETE FROM vins WHERE LOWER(TRIM(vin_number)) = LOWER(TRIM(?))",
-                            (vin,),
-                        )
-                    deleted = cur.rowcount
-
-            conn.commit()
+                    deleted = uow.execute(tombstone + "LOWER(TRIM(vin_number)) = LOWER(TRIM(?))",
+                                          (deleted_at, username, vin)).rowcount
 
-            action_detail = f"Deleted VIN: {vin if vin is not None else '[NULL/blank]'}"
-            if deleted:
-                log_activity(username, "delete_vin", action_detail, "vins", vin or "", None, None)
-            else:
-                log_activity(username, "delete_vin", f"Delete VIN attempted (no row matched): {vin}", "vins", vin or "", None, None)
-            return deleted
-    except sqlite3.Error:
-        raise
+        if deleted:
+            uow.execute(
+                "UPDATE parts SET deleted_at = ?, deleted_by = ? WHERE deleted_at IS NULL "
+                "AND vin_number IN (SELECT vin_number FROM vins WHERE deleted_at = ?)",
+                (deleted_at, username, deleted_at),
+            )
+            uow.log("delete_vin", f"Deleted VIN: {vin if vin is not None else '[NULL/blank]'}", "vins", vin or "",
+                    None, {"deleted_at": deleted_at})
+            uow.touch(tables=('vins', 'parts', 'part_suppliers'), entities=[('vins', vin)], phones=owners)
+        else:
+            uow.log("delete_vin", f"Delete VIN attempted (no row matched): {vin}", "vins", vin or "", None, None)
+    return deleted
 
 def delete_part(part_id, username):
-    """Delete a part and all associated suppliers"""
+    """Move a part (with its suppliers) to the trash; undelete_part restores it."""
     if not part_id:
         raise ValueError("Part ID is required")
-    
-    part_info = _execute_query(
-        "SELECT part_name, part_number FROM parts WHERE id = ?", 
-        (part_id,), 
-        fetch='one'
-    )
-    
-    result = _execute_query("DELETE FROM parts WHERE id = ?", (part_id,))
-    
-    if part_info:
-        log_activity(username, "delete_part", f"Deleted part: {part_info[0]} ({part_info[1]}) - ID: {part_id}", 
+
+    with UnitOfWork(username) as uow:
+        part_info = uow.fetchone(
+            "SELECT part_name, part_number, client_phone, vin_number FROM parts WHERE id = ? AND deleted_at IS NULL",
+            (part_id,),
+        )
+        result = uow.execute(
+            "UPDATE parts SET deleted_at = ?, deleted_by = ? WHERE id = ? AND deleted_at IS NULL",
+            (_tombstone(), username, part_id),
+        ).rowcount
+        if part_info:
+            uow.log("delete_part", f"Deleted part: {part_info[0]} ({part_info[1]}) - ID: {part_id}",
                     "parts", part_id, {"part_name": part_info[0], "part_number": part_info[1]}, None)
-    else:
-        log_activity(username, "delete_part", f"Deleted part ID: {part_id}", "parts", part_id, None, None)
-    
+        else:
+            uow.log("delete_part", f"Deleted part ID: {part_id}", "parts", part_id, None, None)
+        uow.touch(
+            tables=('parts', 'part_suppliers'),
+            entities=[('parts', part_id), ('vins', part_info[3] if part_info else None)],
+            phones=[part_info[2] if part_info else None],
+        )
     return result
 
+def undelete_part(part_id, username):
+    """Restore a part from the trash with its original id and suppliers.
+
+    Raises ValueError if the part is not in the trash or its VIN is still deleted.
+    """
+    with UnitOfWork(username) as uow:
+        part = uow.fetchone(
+            "SELECT part_name, part_number, client_phone, vin_number FROM parts WHERE id = ? AND deleted_at IS NOT NULL",
+            (part_id,),
+        )
+        if not part:
+            raise ValueError("Part is not in the trash")
+        vin = uow.fetchone("SELECT deleted_at FROM vins WHERE vin_number = ?", (part[3],)) if part[3] else None
+        if vin and vin[0] is not None:
+            raise ValueError(f"Restore VIN {part[3]} first")
+        uow.execute("UPDATE parts SET deleted_at = NULL, deleted_by = NULL, last_updated_by = ? WHERE id = ?",
+                    (username, part_id))
+        uow.log("restore_part", f"Restored part: {part[0]} ({part[1]}) - ID: {part_id}", "parts", part_id)
+        uow.touch(tables=('parts', 'part_suppliers'), entities=[('parts', part_id), ('vins', part[3])], phones=[part[2]])
+    return True
+
+def undelete_vin(vin_number, username, client_phone: str | None = None):
+    """Restore a VIN from the trash together with the parts that were deleted with it.
+
+    A NULL/placeholder VIN (see delete_vin) is matched by client_phone, which is then required;
+    the client's most recently deleted one is restored.
+
+    Returns:
+        ids of the restored parts
+    """
+    if _is_placeholder_vin(vin_number):
+        if not client_phone:
+            raise ValueError("Client phone is required to restore a VIN-less record")
+        match, params = "client_phone = ? AND " + _PLACEHOLDER_VIN_SQL, (str(client_phone),)
+    else:
+        match, params = "vin_number = ?", (str(vin_number).strip(),)
+
+    with UnitOfWork(username) as uow:
+        vin = uow.fetchone(
+            f"SELECT client_phone, deleted_at FROM vins WHERE deleted_at IS NOT NULL AND {match} "
+            "ORDER BY deleted_at DESC LIMIT 1",
+            params,
+        )
+        if not vin:
+            raise ValueError("VIN is not in the trash")
+        client_phone, deleted_at = vin
+        vin_numbers = [r[0] for r in uow.execute(
+            f"SELECT vin_number FROM vins WHERE deleted_at = ? AND {match}", (deleted_at,) + params
+        ).fetchall()]
+        part_ids = [r[0] for r in uow.execute(
+            "SELECT id FROM parts WHERE deleted_at = ? AND vin_number IN (SELECT value FROM json_each(?))",
+            (deleted_at, json.dumps([v for v in vin_numbers if v is not None])),
+        ).fetchall()]
+        uow.execute(f"UPDATE vins SET deleted_at = NULL, deleted_by = NULL, last_updated_by = ? WHERE deleted_at = ? AND {match}",
+                    (username, deleted_at) + params)
+        uow.execute(
+            "UPDATE parts SET deleted_at = NULL, deleted_by = NULL, last_updated_by = ? "
+            "WHERE id IN (SELECT value FROM json_each(?))",
+            (username, json.dumps(part_ids)),
+        )
+        vin = vin_numbers[0]
+        uow.log("restore_vin", f"Restored VIN: {vin if vin is not None else '[NULL/blank]'} with {len(part_ids)} parts",
+                "vins", vin or "")
+        uow.touch(
+            tables=('vins', 'parts', 'part_suppliers'),
+            entities=[('vins', v) for v in vin_numbers] + [('parts', pid) for pid in part_ids],
+            phones=[client_phone],
+        )
+    return part_ids
+
 def update_client_and_vins(old_phone, new_phone, new_name, username):
-    """Update client information and all associated references using a cached connection."""
+    """Update client information; a phone change cascades to the client's VINs and parts in the database."""
     if not old_phone:
         raise ValueError("Old phone number is required")
     
@@ -338,27 +612,30 @@ def update_client_and_vins(old_phone, new_phone, new_name, username):
         raise ValueError("New phone number is required")
     
     try:
-        with get_db_connection_ctx() as conn:
-            # Get old values for logging
-            old_client = _execute_query("SELECT * FROM clients WHERE phone = ?", (old_phone,), fetch='one')
-            
-            cursor = conn.cursor()
-            cursor.execute("UPDATE clients SET phone = ?, client_name = ?, last_updated_by = ? WHERE phone = ?", 
+        with UnitOfWork(username) as uow:
+            # vins.client_phone and parts.client_phone follow through ON UPDATE CASCADE
+            uow.execute("UPDATE clients SET phone = ?, client_name = ?, last_updated_by = ? WHERE phone = ?",
                         (new_phone, new_name, username, old_phone))
-            cursor.execute("UPDATE vins SET client_phone = ?, last_updated_by = ? WHERE client_phone = ?", 
-                        (new_phone, username, old_phone))
-            cursor.execute("UPDATE parts SET client_phone = ?, last_updated_by = ? WHERE client_phone = ?", 
-                        (new_phone, username, old_phone))
-            conn.commit()
-            
-            log_activity(username, "update_client", f"Updated client: {old_phone} -> {new_phone}, name: {new_name}", 
-                        "clients", new_phone, {"phone": old_phone}, {"phone": new_phone, "client_name": new_name})
+            phone_changed = new_phone != old_phone
+            if phone_changed:
+                # The cascade does not touch the audit columns of the rows it moves
+                uow.execute("UPDATE vins SET last_updated_by = ?, last_updated = CURRENT_TIMESTAMP WHERE client_phone = ?",
+                            (username, new_phone))
+                uow.execute("UPDATE parts SET last_updated_by = ?, last_updated = CURRENT_TIMESTAMP WHERE client_phone = ?",
+                            (username, new_phone))
+            uow.log("update_client", f"Updated client: {old_phone} -> {new_phone}, name: {new_name}",
+                    "clients", new_phone, {"phone": old_phone}, {"phone": new_phone, "client_name": new_name})
+            uow.touch(
+                tables=('clients', 'vins', 'parts') if phone_changed else ('clients',),
+                entities=[('clients', old_phone), ('clients', new_phone)],
+                phones=[old_phone, new_phone],
+            )
     except sqlite3.Error as e:
         print(f"Database error during client update: {e}")
         raise
 
 def update_part(part_id, part_name, part_number, quantity, notes, suppliers_data, username):
-    """Update part information and suppliers with a cached connection."""
+    """Update part information and replace its suppliers in one transaction."""
     if not part_id:
         raise ValueError("Part ID is required")
     
@@ -366,29 +643,31 @@ def update_part(part_id, part_name, part_number, quantity, notes, suppliers_data
         raise ValueError("Part name or part number is required")
     
     try:
-        with get_db_connection_ctx() as conn:
-            # Get old values for logging
-            old_part = _execute_query("SELECT * FROM parts WHERE id = ?", (part_id,), fetch='one')
-            old_suppliers = _execute_query("SELECT * FROM part_suppliers WHERE part_id = ?", (part_id,), fetch='all')
-            
-            cursor = conn.cursor()
-            cursor.execute(
+        with UnitOfWork(username) as uow:
+            # Old values for logging, read inside the same transaction
+            old_part = uow.fetchone("SELECT * FROM parts WHERE id = ?", (part_id,))
+            uow.execute(
                 "UPDATE parts SET part_name = ?, part_number = ?, quantity = ?, notes = ?, last_updated_by = ? WHERE id = ?",
                 (part_name, part_number, quantity, notes, username, part_id)
             )
-            cursor.execute("DELETE FROM part_suppliers WHERE part_id = ?", (part_id, ))
-            for supplier in suppliers_data:
-                cursor.execute(
-                    "INSERT INTO part_suppliers (part_id, supplier_name, buying_price, selling_price, delivery_time, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            uow.execute("DELETE FROM part_suppliers WHERE part_id = ?", (part_id, ))
+            uow.executemany(
+                "INSERT INTO part_suppliers (part_id, supplier_name, buying_price, selling_price, delivery_time, created_by, last_updated_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
                     (part_id, supplier['name'], supplier['buying_price'], supplier['selling_price'], supplier['delivery_time'], username, username)
-                )
-            conn.commit()
-            
-            log_activity(username, "update_part", f"Updated part: {part_name} ({part_number}) - ID: {part_id}", 
-                        "parts", part_id, 
-                        {"part_name": old_part[3], "part_number": old_part[4], "quantity": old_part[5]},
-                        {"part_name": part_name, "part_number": part_number, "quantity": quantity})
-            return part_id
+                    for supplier in suppliers_data
+                ],
+            )
+            uow.log("update_part", f"Updated part: {part_name} ({part_number}) - ID: {part_id}",
+                    "parts", part_id,
+                    {"part_name": old_part[3], "part_number": old_part[4], "quantity": old_part[5]} if old_part else None,
+                    {"part_name": part_name, "part_number": part_number, "quantity": quantity})
+            uow.touch(
+                tables=('parts', 'part_suppliers'),
+                entities=[('parts', part_id), ('vins', old_part[1] if old_part else None)],
+                phones=[old_part[2] if old_part else None],
+            )
+        return part_id
     except sqlite3.Error as e:
         print(f"Database error during part update: {e}")
         raise
@@ -400,10 +679,88 @@ def get_clients_by_page(page, page_size=20):
     results = _execute_query(query, (page_size, offset), fetch='all')
     return results
 
+# Client list orderings: key -> (table alias.column sorted on, FROM clause)
+CLIENT_SORTS = {
+    'updated': ("c.last_updated", "clients c"),
+    'activity': ("s.last_activity", "client_summary s JOIN clients c ON c.phone = s.client_phone"),
+    'value': ("s.quoted_total", "client_summary s JOIN clients c ON c.phone = s.client_phone"),
+}
+
+def get_clients_page_after(cursor=None, page_size=20, sort='updated'):
+    """Fetch one page of clients, highest sort key first, using keyset pagination.
+
+    Args:
+        cursor: (sort key, phone) of the last row on the previous page, or None for the first page
+        page_size: number of clients per page
+        sort: 'updated' (client last update), 'activity' (latest change to the client, its VINs,
+            parts or suppliers) or 'value' (total quoted value); the last two are read from
+            client_summary through its indexes
+
+    Returns:
+        (rows, next_cursor) where rows are (phone, client_name, sort key) tuples and
+        next_cursor is None on the last page.
+    """
+    if sort not in CLIENT_SORTS:
+        raise ValueError(f"Unknown client sort: {sort}")
+    column, source = CLIENT_SORTS[sort]
+    phone = "c.phone" if sort == 'updated' else "s.client_phone"
+    query = f"SELECT c.phone, c.client_name, {column} FROM {source}"
+    if cursor is None:
+        params = (page_size + 1,)
+    else:
+        query += f" WHERE ({column}, {phone}) < (?, ?)"
+        params = (cursor[0], cursor[1], page_size + 1)
+    rows = _execute_query(f"{query} ORDER BY {column} DESC, {phone} DESC LIMIT ?", params, fetch='all')
+    rows = rows or []
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, (rows[-1][2], rows[-1][0])
+    return rows, None
+
+def get_client_summaries(phones):
+    """{phone: {'vin_count', 'part_count', 'quoted_total', 'last_activity'}} from client_summary."""
+    phones = [str(p) for p in phones]
+    if not phones:
+        return {}
+    with get_db_connection_ctx() as conn:
+        rows = _rows_as_dicts(
+            conn.cursor(),
+            "SELECT * FROM client_summary WHERE client_phone IN (SELECT value FROM json_each(?))",
+            (json.dumps(phones),),
+        )
+    return {row.pop('client_phone'): row for row in rows}
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+@memoize(lambda prefix, limit=10: [table_key('clients')])
+def find_clients_by_prefix(prefix, limit=10):
+    """Type-ahead lookup: clients whose phone or name starts with prefix (index range scans)."""
+    prefix = sanitize_input(prefix)
+    if not prefix:
+        return []
+    upper = _prefix_upper_bound(prefix)
+    by_phone = _execute_query(
+        "SELECT phone, client_name FROM clients WHERE phone >= ? AND phone < ? ORDER BY phone LIMIT ?",
+        (prefix, upper, limit), fetch='all'
+    ) or []
+    by_name = _execute_query(
+        "SELECT phone, client_name FROM clients WHERE client_name >= ? COLLATE NOCASE AND client_name < ? COLLATE NOCASE ORDER BY client_name COLLATE NOCASE LIMIT ?",
+        (prefix, upper, limit), fetch='all'
+    ) or []
+    seen = set()
+    matches = []
+    for phone, client_name in by_phone + by_name:
+        if phone not in seen:
+            seen.add(phone)
+            matches.append((phone, client_name))
+    return matches[:limit]
+
 def get_parts_by_page(page, page_size=20):
     """Fetch parts for a specific page, ordered by last update."""
     offset = page * page_size
-    query = f"SELECT * FROM parts ORDER BY last_updated DESC LIMIT ? OFFSET ?"
+    query = f"SELECT * FROM parts WHERE deleted_at IS NULL ORDER BY last_updated DESC LIMIT ? OFFSET ?"
     results = _execute_query(query, (page_size, offset), fetch='all')
     return results
 
@@ -413,25 +770,28 @@ def count_table_rows(table_name):
     count = _execute_query(query, fetch='one')
     return count[0] if count else 0
 
+@memoize(lambda phone: [client_key(phone)])
 def get_client_by_phone(phone):
     """Retrieve client details by phone number."""
     return _execute_query("SELECT * FROM clients WHERE phone = ?", (phone,), fetch='one')
 
+@memoize(lambda phone: [client_key(phone)])
 def get_vins_for_client(phone):
     """Retrieve all VINs for a given client phone number."""
-    return _execute_query("SELECT * FROM vins WHERE client_phone = ?", (phone,), fetch='all')
+    return _execute_query("SELECT * FROM vins WHERE client_phone = ? AND deleted_at IS NULL", (phone,), fetch='all')
     
 def get_parts_for_vin(vin_number):
     """Retrieve all parts for a given VIN."""
-    return _execute_query("SELECT * FROM parts WHERE vin_number = ?", (vin_number,), fetch='all')
+    return _execute_query("SELECT * FROM parts WHERE vin_number = ? AND deleted_at IS NULL", (vin_number,), fetch='all')
 
+@memoize(lambda client_phone: [client_key(client_phone)])
 def get_parts_for_client_without_vin(client_phone):
     """Retrieve parts added for a client without a VIN."""
-    return _execute_query("SELECT * FROM parts WHERE vin_number IS NULL AND client_phone = ?", (client_phone,), fetch='all')
+    return _execute_query("SELECT * FROM parts WHERE vin_number IS NULL AND client_phone = ? AND deleted_at IS NULL", (client_phone,), fetch='all')
 
 def get_vin_details(vin_number):
     """Retrieve VIN details."""
-    return _execute_query("SELECT * FROM vins WHERE vin_number = ?", (vin_number,), fetch='one')
+    return _execute_query("SELECT * FROM vins WHERE vin_number = ? AND deleted_at IS NULL", (vin_number,), fetch='one')
 
 def get_suppliers_for_part(part_id):
     """Retrieve suppliers for a given part."""
@@ -458,7 +818,6 @@ def update_supplier(supplier_id: int, supplier_name: str, buying_price: float, s
                 "UPDATE part_suppliers SET supplier_name = ?, buying_price = ?, selling_price = ?, delivery_time = ?, last_updated_by = ? WHERE id = ?",
                 (supplier_name, float(buying_price or 0), float(selling_price or 0), delivery_time or '', username, supplier_id)
             )
-            conn.commit()
             log_activity(
                 username,
                 "update_supplier",
@@ -467,6 +826,14 @@ def update_supplier(supplier_id: int, supplier_name: str, buying_price: float, s
                 str(supplier_id),
                 {"supplier_name": old_row[1], "buying_price": old_row[2], "selling_price": old_row[3], "delivery_time": old_row[4]},
                 {"supplier_name": supplier_name, "buying_price": float(buying_price or 0), "selling_price": float(selling_price or 0), "delivery_time": delivery_time or ''},
+                conn=conn,
+            )
+            owner = cur.execute("SELECT client_phone FROM parts WHERE id = ?", (old_row[0],)).fetchone()
+            conn.commit()
+            _publish(
+                tables=('part_suppliers',),
+                entities=[('part_suppliers', supplier_id), ('parts', old_row[0])],
+                phones=[owner[0] if owner else None],
             )
             return True
     except sqlite3.Error as e:
@@ -482,7 +849,6 @@ def delete_supplier(supplier_id: int, username: str):
             cur = conn.cursor()
             old_row = cur.execute("SELECT part_id, supplier_name, buying_price, selling_price, delivery_time FROM part_suppliers WHERE id = ?", (supplier_id,)).fetchone()
             cur.execute("DELETE FROM part_suppliers WHERE id = ?", (supplier_id,))
-            conn.commit()
             log_activity(
                 username,
                 "delete_supplier",
@@ -491,6 +857,14 @@ def delete_supplier(supplier_id: int, username: str):
                 str(supplier_id),
                 {"supplier_name": old_row[1] if old_row else None},
                 None,
+                conn=conn,
+            )
+            owner = cur.execute("SELECT client_phone FROM parts WHERE id = ?", (old_row[0],)).fetchone() if old_row else None
+            conn.commit()
+            _publish(
+                tables=('part_suppliers',),
+                entities=[('part_suppliers', supplier_id), ('parts', old_row[0] if old_row else None)],
+                phones=[owner[0] if owner else None],
             )
             return True
     except sqlite3.Error as e:
@@ -499,21 +873,150 @@ def delete_supplier(supplier_id: int, username: str):
 
 def get_part_details(part_id):
     """Retrieve a single part details by its ID."""
-    return _execute_query("SELECT * FROM parts WHERE id = ?", (part_id,), fetch='one')
+    return _execute_query("SELECT * FROM parts WHERE id = ? AND deleted_at IS NULL", (part_id,), fetch='one')
+
+@dataclass
+class QuoteLine:
+    """A selected part and all of its supplier rows."""
+    part: dict
+    suppliers: list = field(default_factory=list)
+
+@dataclass
+class QuoteModel:
+    """Everything needed to price and render a quote or invoice."""
+    client: dict
+    vin: dict | None
+    lines: list = field(default_factory=list)
+
+    @property
+    def part_ids(self):
+        return [line.part['id'] for line in self.lines]
+
+def _rows_as_dicts(cursor, query, params=()):
+    cursor.row_factory = sqlite3.Row
+    return [dict(row) for row in cursor.execute(query, params).fetchall()]
+
+def _suppliers_by_part(cursor, query, params=()):
+    """Group part_suppliers rows (as dicts) by part_id."""
+    grouped = {}
+    for row in _rows_as_dicts(cursor, query, params):
+        grouped.setdefault(row['part_id'], []).append(row)
+    return grouped
+
+def load_quote(phone, selected_vin, selected_part_ids):
+    """Load the client, VIN, selected parts and their suppliers in four queries on one connection.
+
+    Parts keep the order of selected_part_ids; ids that no longer exist are skipped.
+    Returns a QuoteModel, or None if the client does not exist.
+    """
+    part_ids = [int(pid) for pid in selected_part_ids or []]
+    ids_json = json.dumps(part_ids)
+    with get_db_connection_ctx() as conn:
+        cur = conn.cursor()
+        clients = _rows_as_dicts(cur, "SELECT * FROM clients WHERE phone = ?", (phone,))
+        if not clients:
+            return None
+        vins = _rows_as_dicts(cur, "SELECT * FROM vins WHERE vin_number = ? AND deleted_at IS NULL", (selected_vin,)) if selected_vin else []
+        parts = _rows_as_dicts(cur, "SELECT * FROM parts WHERE id IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL", (ids_json,))
+        suppliers = _suppliers_by_part(
+            cur, "SELECT * FROM part_suppliers WHERE part_id IN (SELECT value FROM json_each(?)) ORDER BY part_id, id", (ids_json,)
+        )
+
+    parts_by_id = {part['id']: part for part in parts}
+    lines = [
+        QuoteLine(part=parts_by_id[pid], suppliers=suppliers.get(pid, []))
+        for pid in part_ids if pid in parts_by_id
+    ]
+    return QuoteModel(client=clients[0], vin=vins[0] if vins else None, lines=lines)
+
+# Placeholder values stored in parts.vin_number for parts that are not assigned to a VIN
+UNASSIGNED_VIN_VALUES = ('', 'None', 'No VIN provided')
+
+@dataclass
+class ClientAggregate:
+    """A client with its VINs, parts grouped by VIN, unassigned parts and suppliers."""
+    client: dict | None
+    vins: pd.DataFrame
+    parts_by_vin: dict = field(default_factory=dict)
+    unassigned_parts: pd.DataFrame = field(default_factory=pd.DataFrame)
+    suppliers_by_part: dict = field(default_factory=dict)
+    part_columns: list = field(default_factory=list)
+    summary: dict = field(default_factory=dict)
+    vin_part_counts: dict = field(default_factory=dict)
+
+    def parts_for_vin(self, vin_number):
+        return self.parts_by_vin.get(str(vin_number), pd.DataFrame(columns=self.part_columns))
+
+    def suppliers_for_part(self, part_id):
+        return self.suppliers_by_part.get(int(part_id), [])
+
+    @property
+    def vin_numbers(self):
+        return self.vins['vin_number'].dropna().astype(str).tolist() if not self.vins.empty else []
+
+@memoize(lambda phone: [client_key(phone)])
+def load_client_aggregate(phone):
+    """Load everything the client details view shows for one client, on one connection.
+
+    Every query is an indexed lookup by client phone, so the cost depends on the client's
+    size only. The result is memoized per phone and evicted when a mutation publishes the
+    client's key; treat it as read-only.
+    """
+    phone = str(phone)
+    with get_db_connection_ctx() as conn:
+        cur = conn.cursor()
+        clients = _rows_as_dicts(cur, "SELECT * FROM clients WHERE phone = ?", (phone,))
+        vins = pd.read_sql_query("SELECT * FROM vins WHERE client_phone = ? AND deleted_at IS NULL ORDER BY rowid", conn, params=(phone,))
+        parts = pd.read_sql_query("SELECT * FROM parts WHERE client_phone = ? AND deleted_at IS NULL ORDER BY id", conn, params=(phone,))
+        suppliers = _suppliers_by_part(
+            cur,
+            "SELECT s.* FROM part_suppliers s JOIN parts p ON p.id = s.part_id "
+            "WHERE p.client_phone = ? AND p.deleted_at IS NULL ORDER BY s.part_id, s.id",
+            (phone,),
+        )
+        summary = _rows_as_dicts(cur, "SELECT * FROM client_summary WHERE client_phone = ?", (phone,))
+        vin_part_counts = dict(conn.execute(
+            "SELECT vin_number, part_count FROM vin_summary WHERE client_phone = ?", (phone,)
+        ).fetchall())
+
+    vin_key = parts['vin_number'].astype('string').str.strip()
+    unassigned = vin_key.isna() | vin_key.isin(UNASSIGNED_VIN_VALUES)
+    parts_by_vin = {str(vin): group for vin, group in parts[~unassigned].groupby(vin_key[~unassigned], sort=False)}
+    return ClientAggregate(
+        client=clients[0] if clients else None,
+        vins=vins,
+        parts_by_vin=parts_by_vin,
+        unassigned_parts=parts[unassigned],
+        suppliers_by_part=suppliers,
+        part_columns=list(parts.columns),
+        summary=summary[0] if summary else {},
+        vin_part_counts=vin_part_counts,
+    )
 
 def get_client_info_for_export(phone):
     """Retrieve client and associated VINs and parts for a quote or invoice."""
-    client_info = _execute_query("SELECT * FROM clients WHERE phone = ?", (phone,), fetch='one')
-    if not client_info:
-        return None
-    
-    vins = _execute_query("SELECT vin_number, model FROM vins WHERE client_phone = ?", (phone,), fetch='all')
-    parts = _execute_query("SELECT id, vin_number, part_name, part_number, quantity, notes FROM parts WHERE client_phone = ?", (phone,), fetch='all')
-    
+    with get_db_connection_ctx() as conn:
+        cur = conn.cursor()
+        client_info = cur.execute("SELECT * FROM clients WHERE phone = ?", (phone,)).fetchone()
+        if not client_info:
+            return None
+
+        vins = cur.execute("SELECT vin_number, model FROM vins WHERE client_phone = ? AND deleted_at IS NULL", (phone,)).fetchall()
+        parts = cur.execute(
+            "SELECT id, vin_number, part_name, part_number, quantity, notes FROM parts WHERE client_phone = ? AND deleted_at IS NULL",
+            (phone,),
+        ).fetchall()
+        suppliers = {}
+        for row in cur.execute(
+            "SELECT s.* FROM part_suppliers s JOIN parts p ON p.id = s.part_id "
+            "WHERE p.client_phone = ? AND p.deleted_at IS NULL ORDER BY s.part_id, s.id",
+            (phone,),
+        ).fetchall():
+            suppliers.setdefault(row[1], []).append(row)
+
     parts_with_suppliers = []
     for part in parts:
         part_id, vin, name, number, qty, notes = part
-        suppliers = get_suppliers_for_part(part_id)
         parts_with_suppliers.append({
             'id': part_id,
             'vin_number': vin,
@@ -521,7 +1024,7 @@ def get_client_info_for_export(phone):
             'part_number': number,
             'quantity': qty,
             'notes': notes,
-            'suppliers': suppliers
+            'suppliers': suppliers.get(part_id, [])
         })
         
     return {
@@ -531,27 +1034,20 @@ def get_client_info_for_export(phone):
     }
 
 def get_quote_data(phone, selected_vin, selected_part_ids):
-    """Retrieve data for generating a quote."""
-    client_info = get_client_by_phone(phone)
-    if not client_info:
+    """Retrieve data for generating a quote (legacy tuple/dict shape, see load_quote)."""
+    quote = load_quote(phone, selected_vin, selected_part_ids)
+    if quote is None:
         return None
-    
-    vin_info = None
-    if selected_vin:
-        vin_info = get_vin_details(selected_vin)
-        
+
     parts_data = []
-    for part_id in selected_part_ids:
-        part_details = get_part_details(part_id)
-        if part_details:
-            suppliers = get_suppliers_for_part(part_id)
-            part_dict = dict(zip(['id', 'vin_number', 'client_phone', 'part_name', 'part_number', 'quantity', 'notes', 'date_added', 'created_date', 'last_updated'], part_details))
-            part_dict['suppliers'] = suppliers
-            parts_data.append(part_dict)
-            
+    for line in quote.lines:
+        part_dict = dict(line.part)
+        part_dict['suppliers'] = [tuple(s.values()) for s in line.suppliers]
+        parts_data.append(part_dict)
+
     return {
-        'client': client_info,
-        'vin': vin_info,
+        'client': tuple(quote.client.values()),
+        'vin': tuple(quote.vin.values()) if quote.vin else None,
         'parts': parts_data
     }
 
@@ -573,13 +1069,13 @@ def move_part_to_vin(part_id: int, new_vin_number: str, username: str):
         with get_db_connection_ctx() as conn:
             cur = conn.cursor()
             # Get existing part
-            part_row = cur.execute("SELECT id, vin_number, client_phone, part_name, part_number FROM parts WHERE id = ?", (part_id,)).fetchone()
+            part_row = cur.execute("SELECT id, vin_number, client_phone, part_name, part_number FROM parts WHERE id = ? AND deleted_at IS NULL", (part_id,)).fetchone()
             if not part_row:
                 raise ValueError("Part not found")
             old_vin = part_row[1]
 
             # Target VIN must exist
-            vin_row = cur.execute("SELECT vin_number, client_phone FROM vins WHERE vin_number = ?", (clean_vin,)).fetchone()
+            vin_row = cur.execute("SELECT vin_number, client_phone FROM vins WHERE vin_number = ? AND deleted_at IS NULL", (clean_vin,)).fetchone()
             if not vin_row:
                 raise ValueError("Target VIN not found")
             target_phone = vin_row[1]
@@ -589,8 +1085,6 @@ def move_part_to_vin(part_id: int, new_vin_number: str, username: str):
                 "UPDATE parts SET vin_number = ?, client_phone = ?, last_updated_by = ? WHERE id = ?",
                 (clean_vin, target_phone, username, part_id)
             )
-            conn.commit()
-
             log_activity(
                 username,
                 "move_part",
@@ -599,6 +1093,13 @@ def move_part_to_vin(part_id: int, new_vin_number: str, username: str):
                 str(part_id),
                 {"vin_number": old_vin},
                 {"vin_number": clean_vin, "client_phone": target_phone},
+                conn=conn,
+            )
+            conn.commit()
+            _publish(
+                tables=('parts',),
+                entities=[('parts', part_id), ('vins', old_vin), ('vins', clean_vin)],
+                phones=[part_row[2], target_phone],
             )
             return True
     except sqlite3.Error as e:
@@ -606,7 +1107,7 @@ def move_part_to_vin(part_id: int, new_vin_number: str, username: str):
         raise
 
 def update_vin(old_vin_number: str, new_vin_number: str, model: str, prod_yr: str, body: str, engine: str, code: str, transmission: str, username: str):
-    """Update VIN details. If VIN number changes, update dependent parts as well."""
+    """Update VIN details. A VIN number change cascades to the VIN's parts in the database."""
     if not old_vin_number:
         raise ValueError("Old VIN is required")
 
@@ -621,31 +1122,31 @@ def update_vin(old_vin_number: str, new_vin_number: str, model: str, prod_yr: st
         with get_db_connection_ctx() as conn:
             cur = conn.cursor()
             # Check existence of old VIN
-            row = cur.execute("SELECT vin_number, client_phone FROM vins WHERE vin_number = ?", (old_vin_number,)).fetchone()
+            row = cur.execute("SELECT vin_number, client_phone FROM vins WHERE vin_number = ? AND deleted_at IS NULL", (old_vin_number,)).fetchone()
             if not row:
                 raise ValueError("VIN not found")
             client_phone = row[1]
 
             # If VIN is changing, ensure no conflict
             if clean_new_vin != old_vin_number:
-                conflict = cur.execute("SELECT 1 FROM vins WHERE vin_number = ?", (clean_new_vin,)).fetchone()
+                conflict = cur.execute("SELECT deleted_at FROM vins WHERE vin_number = ?", (clean_new_vin,)).fetchone()
+                if conflict and conflict[0] is not None:
+                    raise ValueError(f"VIN {clean_new_vin} is in the trash; restore or purge it first")
                 if conflict:
                     raise ValueError("Another record already uses the new VIN number")
 
-            # Update vins record (including possibly the VIN PK)
+            # Update vins record (including possibly the VIN PK); parts.vin_number follows through ON UPDATE CASCADE
             cur.execute(
                 "UPDATE vins SET vin_number = ?, model = ?, prod_yr = ?, body = ?, engine = ?, code = ?, transmission = ?, last_updated_by = ? WHERE vin_number = ?",
                 (clean_new_vin, model, prod_yr, body, engine, code, transmission, username, old_vin_number)
             )
-
-            # Update dependent parts' vin_number if VIN changed
             if clean_new_vin != old_vin_number:
+                # The cascade does not touch the audit columns of the rows it moves
                 cur.execute(
-                    "UPDATE parts SET vin_number = ?, last_updated_by = ? WHERE vin_number = ?",
-                    (clean_new_vin, username, old_vin_number)
+                    "UPDATE parts SET last_updated_by = ?, last_updated = CURRENT_TIMESTAMP WHERE vin_number = ?",
+                    (username, clean_new_vin),
                 )
 
-            conn.commit()
             log_activity(
                 username,
                 "update_vin",
@@ -654,40 +1155,19 @@ def update_vin(old_vin_number: str, new_vin_number: str, model: str, prod_yr: st
                 clean_new_vin,
                 {"vin_number": old_vin_number},
                 {"vin_number": clean_new_vin, "model": model, "prod_yr": prod_yr, "body": body, "engine": engine, "code": code, "transmission": transmission},
+                conn=conn,
+            )
+            conn.commit()
+            _publish(
+                tables=('vins', 'parts') if clean_new_vin != old_vin_number else ('vins',),
+                entities=[('vins', old_vin_number), ('vins', clean_new_vin)],
+                phones=[client_phone],
             )
             return clean_new_vin
     except sqlite3.Error as e:
         print(f"Database error during VIN update: {e}")
         raise
 
-def search_db(query):
-    """Perform a comprehensive search across all relevant tables safely."""
-    if not query:
-        return {'clients': pd.DataFrame(), 'vins': pd.DataFrame(), 'parts': pd.DataFrame()}
-    
-    # Use parameterized queries to prevent SQL injection
-    search_pattern = f"%{query}%"
-    
-    try:
-        with get_db_connection_ctx() as conn:
-            df_clients = pd.read_sql_query(
-                "SELECT * FROM clients WHERE phone LIKE ? OR client_name LIKE ?", 
-                conn, params=[search_pattern, search_pattern]
-            )
-            df_vins = pd.read_sql_query(
-                "SELECT * FROM vins WHERE vin_number LIKE ? OR model LIKE ?", 
-                conn, params=[search_pattern, search_pattern]
-            )
-            df_parts = pd.read_sql_query(
-                "SELECT * FROM parts WHERE part_name LIKE ? OR part_number LIKE ? OR notes LIKE ?", 
-                conn, params=[search_pattern, search_pattern, search_pattern]
-            )
-    except Exception as e:
-        print(f"Error during search: {e}")
-        return {'clients': pd.DataFrame(), 'vins': pd.DataFrame(), 'parts': pd.DataFrame()}
-    
-    return {
-        'clients': df_clients,
-        'vins': df_vins,
-        'parts': df_parts
-    }
+def search_db(query, limit=50, offset=0):
+    """Perform a ranked full-text search across clients, VINs and parts."""
+    return search(query, limit=limit, offset=offset)
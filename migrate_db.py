@@ -0,0 +1,34 @@
+import sqlite3
+import sys
+
+import db_utils
+
+
+def migrate_database(db_name):
+    """Bring an existing database file up to the current schema in place."""
+    db_utils.DB_NAME = db_name
+    with db_utils.get_db_connection_ctx() as conn:
+        before = conn.execute("PRAGMA user_version").fetchone()[0]
+    db_utils.create_tables()
+    try:
+        db_utils.migrate_schema()
+    except sqlite3.Error as e:
+        with db_utils.get_db_connection_ctx() as conn:
+            after = conn.execute("PRAGMA user_version").fetchone()[0]
+        print(f"FAIL: migration stopped at schema version {after} (from {before}): {e}")
+        return False
+    with db_utils.get_db_connection_ctx() as conn:
+        after = conn.execute("PRAGMA user_version").fetchone()[0]
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    print(f"{db_name}: schema version {before} -> {after}")
+    if violations:
+        print(f"FAIL: {len(violations)} foreign key violations, e.g. {violations[:5]}")
+        return False
+    print("PASS: foreign keys are consistent")
+    return True
+
+
+if __name__ == "__main__":
+    ok = migrate_database(sys.argv[1] if len(sys.argv) > 1 else db_utils.DB_NAME)
+    db_utils.close_pools()
+    sys.exit(0 if ok else 1)
@@ -1,25 +1,34 @@
 # security.py
 import re
+import pandas as pd
+
+# Patterns shared by the scalar validators and their column-wise variants
+PHONE_PATTERN = re.compile(r'^[\d\s\-\+\(\)]{7,15}$')
+VIN_CHARS_PATTERN = re.compile(r'^[A-HJ-NPR-Z0-9]*$')
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+VIN_LENGTHS = (0, 7, 13, 17)
+# Values the UI stores for "no VIN"; they always validate
+EMPTY_VIN_VALUES = ("No VIN provided", "")
 
 def validate_phone(phone):
     """Validate phone number format"""
     if not phone:
         return False
-    pattern = r'^[\d\s\-\+\(\)]{7,15}$'
-    return re.match(pattern, str(phone)) is not None
+    return PHONE_PATTERN.match(str(phone)) is not None
 
 def validate_vin(vin):
     """Validate VIN format"""
-    if not vin or vin in ["No VIN provided", "", None]:
+    if not vin or vin in EMPTY_VIN_VALUES:
         return True  # Empty VIN is allowed
-    
-    clean_vin = ''.join(vin.split()).upper()
-    
-    if len(clean_vin) not in [0, 7, 13, 17]:
+
+    clean_vin = normalize_vin(vin)
+
+    if len(clean_vin) not in VIN_LENGTHS:
         return False
-    
-    pattern = r'^[A-HJ-NPR-Z0-9]*$'
-    return re.match(pattern, clean_vin) is not None
+
+    return VIN_CHARS_PATTERN.match(clean_vin) is not None
 
 def sanitize_input(text):
     """Sanitize input text"""
@@ -43,11 +52,65 @@ def validate_email(email):
     """Validate email format"""
     if not email:
         return False
-    pattern = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
-    return re.match(pattern, str(email)) is not None
+    return EMAIL_PATTERN.match(str(email)) is not None
 
 def normalize_vin(vin):
     """Normalize VIN format"""
     if not vin:
         return ""
-    return re.sub(r"\s+", "", vin).upper()
\ No newline at end of file
+    return WHITESPACE_PATTERN.sub("", vin).upper()
+
+# ===== Column-wise variants (pandas Series or any iterable; results keep the Series index) =====
+
+def _as_series(values):
+    if isinstance(values, pd.Series):
+        return values
+    return pd.Series(list(values), dtype=object)
+
+def _present(series):
+    """Mask of values that are neither missing nor empty strings."""
+    return series.notna() & (series.astype(str) != '')
+
+def _text(series):
+    return series.astype(object).where(series.notna(), '').astype(str)
+
+def validate_phone_series(values):
+    """Boolean mask of valid phone numbers."""
+    series = _as_series(values)
+    return _present(series) & _text(series).str.match(PHONE_PATTERN)
+
+def normalize_vin_series(values):
+    """VINs with whitespace removed and upper-cased; missing values become ''."""
+    return _text(_as_series(values)).str.replace(WHITESPACE_PATTERN, '', regex=True).str.upper()
+
+def validate_vin_series(values):
+    """Boolean mask of valid VINs (empty and 'No VIN provided' are allowed)."""
+    series = _as_series(values)
+    empty = ~_present(series) | _text(series).isin(EMPTY_VIN_VALUES)
+    clean = normalize_vin_series(series)
+    return empty | (clean.str.len().isin(VIN_LENGTHS) & clean.str.match(VIN_CHARS_PATTERN))
+
+def sanitize_series(values):
+    """Stripped text; missing values stay missing."""
+    series = _as_series(values)
+    return _text(series).str.strip().where(series.notna(), None)
+
+def to_numeric_series(values):
+    """Values converted to floats; anything unparseable becomes NaN."""
+    text = _text(_as_series(values)).str.strip()
+    return pd.to_numeric(text.where(text != ''), errors='coerce').astype(float)
+
+def validate_numeric_series(values, min_val=None, max_val=None):
+    """Boolean mask of numeric values within the optional bounds."""
+    numbers = to_numeric_series(values)
+    mask = numbers.notna()
+    if min_val is not None:
+        mask &= numbers >= min_val
+    if max_val is not None:
+        mask &= numbers <= max_val
+    return mask
+
+def validate_email_series(values):
+    """Boolean mask of valid email addresses."""
+    series = _as_series(values)
+    return _present(series) & _text(series).str.match(EMAIL_PATTERN)
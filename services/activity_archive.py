@@ -0,0 +1,223 @@
+import json
+import re
+import zlib
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import db_utils
+
+# Live rows older than this are moved into the monthly archive partitions
+ACTIVITY_LOG_RETAIN_DAYS = 90
+
+# Indexes created on every archive partition (same lookups as the live table)
+PARTITION_INDEXES = {
+    'ts': "(timestamp)",
+    'user_ts': "(username, timestamp)",
+    'action_ts': "(action, timestamp)",
+    'table_ts': "(table_name, timestamp)",
+}
+
+LOG_COLUMNS = ['id', 'timestamp', 'username', 'action', 'details', 'table_name', 'record_id', 'old_values', 'new_values']
+
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def _partition_name(month):
+    if not _MONTH_RE.match(month or ''):
+        raise ValueError(f"Invalid archive month: {month!r}")
+    return f"activity_log_archive_{month.replace('-', '')}"
+
+
+def _next_month(month):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def _pack(details, old_values, new_values):
+    """Compress the free-text columns of an archived row into one blob."""
+    return zlib.compress(json.dumps([details, old_values, new_values]).encode('utf-8'), 9)
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+def _raw_size(details, old_values, new_values):
+    return sum(len(v.encode('utf-8')) for v in (details, old_values, new_values) if v)
+
+
+def _ensure_partition(conn, month):
+    name = _partition_name(month)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            username TEXT,
+            action TEXT,
+            table_name TEXT,
+            record_id TEXT,
+            payload BLOB
+        )
+    ''')
+    for suffix, columns in PARTITION_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{suffix} ON {name}{columns}")
+    return name
+
+
+def archive_activity_log(older_than_days=ACTIVITY_LOG_RETAIN_DAYS) -> dict:
+    """Move live activity_log rows older than older_than_days into compressed monthly partitions.
+
+    Each month is copied and deleted in the same transaction, and its catalog row in
+    activity_log_archives is refreshed.
+
+    Returns:
+        dict of month -> number of rows archived in this run
+    """
+    db_utils.flush_activity_log()
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    archived = {}
+    try:
+        with db_utils.get_db_connection_ctx() as conn:
+            conn.create_function('archive_pack', 3, _pack, deterministic=True)
+            conn.create_function('archive_raw_size', 3, _raw_size, deterministic=True)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                months = [r[0] for r in conn.execute(
+                    "SELECT DISTINCT substr(timestamp, 1, 7) FROM activity_log WHERE timestamp < ? ORDER BY 1",
+                    (cutoff,),
+                ).fetchall() if _MONTH_RE.match(r[0] or '')]
+                for month in months:
+                    name = _ensure_partition(conn, month)
+                    bounds = (month, _next_month(month), cutoff)
+                    where = "timestamp >= ? AND timestamp < ? AND timestamp < ?"
+                    raw_bytes = conn.execute(
+                        f"SELECT COALESCE(SUM(archive_raw_size(details, old_values, new_values)), 0) FROM activity_log WHERE {where}",
+                        bounds,
+                    ).fetchone()[0]
+                    moved = conn.execute(
+                        f"INSERT OR IGNORE INTO {name} (id, timestamp, username, action, table_name, record_id, payload) "
+                        f"SELECT id, timestamp, username, action, table_name, record_id, "
+                        f"archive_pack(details, old_values, new_values) FROM activity_log WHERE {where}",
+                        bounds,
+                    ).rowcount
+                    conn.execute(f"DELETE FROM activity_log WHERE {where}", bounds)
+                    conn.execute(
+                        f'''
+                        INSERT INTO activity_log_archives
+                            (month, table_name, row_count, first_timestamp, last_timestamp, raw_bytes, stored_bytes, archived_at)
+                        SELECT ?, ?, COUNT(*), MIN(timestamp), MAX(timestamp), ?, COALESCE(SUM(LENGTH(payload)), 0), ?
+                        FROM {name} WHERE 1
+                        ON CONFLICT(month) DO UPDATE SET
+                            row_count = excluded.row_count,
+                            first_timestamp = excluded.first_timestamp,
+                            last_timestamp = excluded.last_timestamp,
+                            raw_bytes = activity_log_archives.raw_bytes + excluded.raw_bytes,
+                            stored_bytes = excluded.stored_bytes,
+                            archived_at = excluded.archived_at
+                        ''',
+                        (month, name, raw_bytes, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                    )
+                    archived[month] = moved
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except Exception as e:
+        print(f"Error archiving activity log: {e}")
+        return {}
+    return archived
+
+
+def list_archives() -> pd.DataFrame:
+    """Catalog of archive partitions, newest month first."""
+    try:
+        with db_utils.get_db_connection_ctx() as conn:
+            return pd.read_sql_query("SELECT * FROM activity_log_archives ORDER BY month DESC", conn)
+    except Exception as e:
+        print(f"Error reading archive catalog: {e}")
+        return pd.DataFrame()
+
+
+def _filters(start, end, username, action, table_name, cursor):
+    clauses, params = [], []
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(str(start))
+    if end:
+        # end is inclusive of the whole day
+        clauses.append("timestamp < ?")
+        params.append((pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+    for column, value in (('username', username), ('action', action), ('table_name', table_name)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if cursor:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(cursor)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _partitions_in_range(conn, start, end, cursor):
+    """Archive partitions that can hold rows in [start, end] older than the cursor."""
+    query = "SELECT table_name FROM activity_log_archives WHERE 1 = 1"
+    params = []
+    if start:
+        query += " AND last_timestamp >= ?"
+        params.append(str(start))
+    if end:
+        query += " AND first_timestamp < ?"
+        params.append((pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+    if cursor:
+        query += " AND first_timestamp <= ?"
+        params.append(cursor[0])
+    return [r[0] for r in conn.execute(query + " ORDER BY month DESC", params).fetchall()]
+
+
+def query_activity(start=None, end=None, username=None, action=None, table_name=None, cursor=None, page_size=50):
+    """One page of activity history across the live table and the archive partitions.
+
+    Args:
+        start/end: optional dates (inclusive) bounding the timestamp
+        username/action/table_name: optional exact-match filters
+        cursor: (timestamp, id) of the last row of the previous page, or None for the newest page
+        page_size: rows per page
+
+    Returns:
+        (DataFrame with LOG_COLUMNS plus 'source', next cursor or None when this is the last page)
+    """
+    db_utils.flush_activity_log()
+    where, params = _filters(start, end, username, action, table_name, cursor)
+    limit = int(page_size) + 1
+    try:
+        with db_utils.get_db_connection_ctx() as conn:
+            parts = [
+                f"SELECT * FROM (SELECT id, timestamp, username, action, details, table_name, record_id, "
+                f"old_values, new_values, NULL AS payload, 'live' AS source FROM activity_log{where} "
+                f"ORDER BY timestamp DESC, id DESC LIMIT ?)"
+            ]
+            all_params = params + [limit]
+            for name in _partitions_in_range(conn, start, end, cursor):
+                parts.append(
+                    f"SELECT * FROM (SELECT id, timestamp, username, action, NULL, table_name, record_id, "
+                    f"NULL, NULL, payload, '{name}' FROM {name}{where} ORDER BY timestamp DESC, id DESC LIMIT ?)"
+                )
+                all_params += params + [limit]
+            sql = " UNION ALL ".join(parts) + " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            rows = conn.execute(sql, all_params + [limit]).fetchall()
+    except Exception as e:
+        print(f"Error querying activity history: {e}")
+        return pd.DataFrame(columns=LOG_COLUMNS + ['source']), None
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1][1], rows[-1][0])
+    records = []
+    for row in rows:
+        record = dict(zip(LOG_COLUMNS, row[:9]))
+        if row[9] is not None:
+            record['details'], record['old_values'], record['new_values'] = _unpack(row[9])
+        record['source'] = row[10]
+        records.append(record)
+    return pd.DataFrame(records, columns=LOG_COLUMNS + ['source']), next_cursor
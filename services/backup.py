@@ -0,0 +1,242 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import db_utils
+from services.cache import invalidate_all
+
+# Where compressed backups and their catalog live
+BACKUP_DIR = 'backups'
+CATALOG_NAME = 'catalog.json'
+
+# Pages copied per backup step; the live database stays writable between steps
+BACKUP_PAGES_PER_STEP = 256
+
+# Rotation: always keep the newest KEEP_LAST backups, plus the newest backup of each of the
+# last KEEP_DAILY days and of each of the last KEEP_WEEKLY ISO weeks
+KEEP_LAST = 5
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+
+_catalog_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backup')
+_status_lock = threading.Lock()
+_status = {'state': 'idle', 'progress': 0.0, 'message': '', 'entry': None}
+
+
+def _catalog_path(backup_dir):
+    return os.path.join(backup_dir, CATALOG_NAME)
+
+
+def _read_catalog(backup_dir):
+    try:
+        with open(_catalog_path(backup_dir), 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return []
+
+
+def _write_catalog(backup_dir, entries):
+    tmp_path = _catalog_path(backup_dir) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump(entries, fh, indent=2)
+    os.replace(tmp_path, _catalog_path(backup_dir))
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _set_status(**values):
+    with _status_lock:
+        _status.update(values)
+
+
+def get_backup_status() -> dict:
+    """Snapshot of the running/last background backup: state, progress (0-1), message, entry."""
+    with _status_lock:
+        return dict(_status)
+
+
+def list_backups(backup_dir=BACKUP_DIR) -> list[dict]:
+    """Catalog entries, newest first."""
+    with _catalog_lock:
+        entries = _read_catalog(backup_dir)
+    return sorted(entries, key=lambda e: e['created'], reverse=True)
+
+
+def _copy_database(dest_path, progress=None):
+    """Copy the live database into dest_path with the online backup API, in page-sized steps."""
+    src = db_utils.get_db_connection()
+    if src is None:
+        raise ConnectionError("Failed to connect to the database")
+    dest = sqlite3.connect(dest_path)
+    try:
+        def _on_step(status, remaining, total):
+            if progress and total:
+                progress((total - remaining) / total)
+        src.backup(dest, pages=BACKUP_PAGES_PER_STEP, progress=_on_step)
+    finally:
+        dest.close()
+        src.close()
+
+
+def create_backup(progress=None, backup_dir=BACKUP_DIR) -> dict:
+    """Take a consistent online backup, gzip it into backup_dir, record it and rotate.
+
+    Args:
+        progress: optional callable receiving the copied fraction (0-1)
+
+    Returns:
+        the catalog entry of the new backup
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    created = datetime.now()
+    name = f"backup_{created.strftime('%Y%m%d_%H%M%S_%f')}.db.gz"
+    archive_path = os.path.join(backup_dir, name)
+
+    fd, raw_path = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+    os.close(fd)
+    try:
+        _copy_database(raw_path, progress)
+        raw_size = os.path.getsize(raw_path)
+        with open(raw_path, 'rb') as src, gzip.open(archive_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    finally:
+        os.remove(raw_path)
+
+    entry = {
+        'file': name,
+        'created': created.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        'db_size': raw_size,
+        'archive_size': os.path.getsize(archive_path),
+        'sha256': _sha256_file(archive_path),
+    }
+    with _catalog_lock:
+        entries = _read_catalog(backup_dir)
+        entries.append(entry)
+        _write_catalog(backup_dir, entries)
+    rotate_backups(backup_dir)
+    return entry
+
+
+def _run_backup_job(backup_dir):
+    _set_status(state='running', progress=0.0, message='Copying database', entry=None)
+    try:
+        entry = create_backup(lambda fraction: _set_status(progress=fraction), backup_dir)
+        _set_status(state='done', progress=1.0, message=f"Backup created: {entry['file']}", entry=entry)
+        return entry
+    except Exception as e:
+        _set_status(state='failed', message=f"Backup failed: {e}")
+        raise
+
+
+def start_backup(backup_dir=BACKUP_DIR):
+    """Run create_backup on the background backup thread; returns the Future (None if one is running)."""
+    with _status_lock:
+        if _status['state'] == 'running':
+            return None
+        _status.update(state='running', progress=0.0, message='Queued', entry=None)
+    return _executor.submit(_run_backup_job, backup_dir)
+
+
+def _retained(entries):
+    """Names of the backups kept by the KEEP_LAST / KEEP_DAILY / KEEP_WEEKLY rules."""
+    newest_first = sorted(entries, key=lambda e: e['created'], reverse=True)
+    keep = {e['file'] for e in newest_first[:KEEP_LAST]}
+    days, weeks = {}, {}
+    for e in newest_first:
+        created = datetime.strptime(e['created'], "%Y-%m-%d %H:%M:%S.%f")
+        days.setdefault(created.date(), e['file'])
+        weeks.setdefault(created.isocalendar()[:2], e['file'])
+    keep.update(list(days.values())[:KEEP_DAILY])
+    keep.update(list(weeks.values())[:KEEP_WEEKLY])
+    return keep
+
+
+def rotate_backups(backup_dir=BACKUP_DIR) -> list[str]:
+    """Delete backups not covered by the retention rules; returns the removed file names."""
+    with _catalog_lock:
+        entries = _read_catalog(backup_dir)
+        keep = _retained(entries)
+        removed = [e['file'] for e in entries if e['file'] not in keep]
+        for name in removed:
+            try:
+                os.remove(os.path.join(backup_dir, name))
+            except FileNotFoundError:
+                pass
+        _write_catalog(backup_dir, [e for e in entries if e['file'] in keep])
+    return removed
+
+
+def _find_entry(name, backup_dir):
+    for entry in list_backups(backup_dir):
+        if entry['file'] == name:
+            return entry
+    raise ValueError(f"Backup {name} is not in the catalog")
+
+
+def _extract(entry, backup_dir, dest_path):
+    with gzip.open(os.path.join(backup_dir, entry['file']), 'rb') as src, open(dest_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def verify_backup(name, backup_dir=BACKUP_DIR) -> tuple[bool, str]:
+    """Check a backup's archive checksum and run PRAGMA integrity_check on its contents."""
+    try:
+        entry = _find_entry(name, backup_dir)
+        if _sha256_file(os.path.join(backup_dir, name)) != entry['sha256']:
+            return False, "Checksum mismatch"
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = os.path.join(tmp, 'verify.db')
+            _extract(entry, backup_dir, raw_path)
+            conn = sqlite3.connect(raw_path)
+            try:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                conn.close()
+        if result != 'ok':
+            return False, f"Integrity check failed: {result}"
+        return True, "Backup verified"
+    except (OSError, ValueError, sqlite3.Error) as e:
+        return False, f"Verification failed: {e}"
+
+
+def restore_backup(name, backup_dir=BACKUP_DIR) -> tuple[bool, str]:
+    """Verify a backup, take a safety backup of the live database, then restore in place."""
+    ok, msg = verify_backup(name, backup_dir)
+    if not ok:
+        return False, msg
+    try:
+        entry = _find_entry(name, backup_dir)
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = os.path.join(tmp, 'restore.db')
+            _extract(entry, backup_dir, raw_path)
+            safety = create_backup(backup_dir=backup_dir)
+            src = sqlite3.connect(raw_path)
+            try:
+                with db_utils.get_db_connection_ctx() as conn:
+                    src.backup(conn, pages=BACKUP_PAGES_PER_STEP)
+                    # The restored change log is unrelated to what in-memory caches have seen
+                    conn.executemany(
+                        "INSERT INTO data_changes (table_name, row_id) VALUES (?, NULL)",
+                        [(table,) for table in db_utils.TRACKED_TABLES],
+                    )
+                    conn.commit()
+            finally:
+                src.close()
+        invalidate_all()
+        return True, f"Restored {name} (previous state saved as {safety['file']})"
+    except (OSError, ValueError, ConnectionError, sqlite3.Error) as e:
+        return False, f"Restore failed: {e}"
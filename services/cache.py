@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+# Upper bound on memoized results kept per process (least recently used are dropped first)
+CACHE_MAX_ENTRIES = 1024
+
+
+def table_key(table):
+    """Key for anything derived from a whole table."""
+    return ('table', table)
+
+
+def entity_key(table, row_id):
+    """Key for a single row, e.g. entity_key('parts', 42) or entity_key('vins', 'VIN123')."""
+    return ('entity', table, str(row_id))
+
+
+def client_key(phone):
+    """Key for everything that belongs to one client (VINs, parts, suppliers)."""
+    return ('client', str(phone))
+
+
+class CacheRegistry:
+    """Process-wide memo cache whose entries are evicted by the keys they depend on.
+
+    Every entry records the keys it was computed from; invalidate() bumps those keys'
+    versions and drops only the dependent entries. A result computed while one of its
+    keys was invalidated is returned but not stored.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._versions = {}
+        self._epoch = 0
+        self._entries = OrderedDict()
+        self._dependents = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def version(self, key) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def _drop(self, entry_key):
+        deps, _ = self._entries.pop(entry_key)
+        for dep in deps:
+            dependents = self._dependents.get(dep)
+            if dependents is not None:
+                dependents.discard(entry_key)
+                if not dependents:
+                    del self._dependents[dep]
+
+    def get_or_compute(self, entry_key, deps, compute):
+        deps = tuple(deps)
+        with self._lock:
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                self.stats['hits'] += 1
+                return self._entries[entry_key][1]
+            self.stats['misses'] += 1
+            snapshot = (self._epoch, [self._versions.get(dep, 0) for dep in deps])
+
+        value = compute()
+
+        with self._lock:
+            if (self._epoch, [self._versions.get(dep, 0) for dep in deps]) != snapshot:
+                return value
+            if entry_key in self._entries:
+                self._drop(entry_key)
+            self._entries[entry_key] = (deps, value)
+            for dep in deps:
+                self._dependents.setdefault(dep, set()).add(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return value
+
+    def invalidate(self, *keys) -> int:
+        """Bump the given keys and evict every entry that depends on them; returns the eviction count."""
+        evicted = 0
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                for entry_key in list(self._dependents.get(key, ())):
+                    self._drop(entry_key)
+                    evicted += 1
+            self.stats['evictions'] += evicted
+        return evicted
+
+    def invalidate_all(self):
+        """Drop every entry (after a restore or a bulk import)."""
+        with self._lock:
+            self._epoch += 1
+            self.stats['evictions'] += len(self._entries)
+            self._entries.clear()
+            self._dependents.clear()
+
+
+registry = CacheRegistry()
+
+
+def invalidate(*keys) -> int:
+    return registry.invalidate(*keys)
+
+
+def invalidate_all():
+    registry.invalidate_all()
+
+
+def memoize(depends_on):
+    """Memoize a read function in the shared registry.
+
+    Args:
+        depends_on: callable taking the same arguments and returning the keys the result depends on
+
+    Results are shared between callers and sessions, so they must be treated as read-only.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            entry_key = (fn.__module__, fn.__qualname__, args, tuple(sorted(kwargs.items())))
+            return registry.get_or_compute(entry_key, depends_on(*args, **kwargs), lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
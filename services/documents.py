@@ -0,0 +1,189 @@
+import hashlib
+import json
+import sqlite3
+
+import pandas as pd
+
+import db_utils
+from services.pricing import price_quote, render_quote_pdf
+
+DOCUMENT_PREFIXES = {'quote': 'Q', 'invoice': 'INV'}
+DOCUMENT_STATUSES = ('issued', 'sent', 'paid', 'void')
+
+DOCUMENT_COLUMNS = [
+    'id', 'document_type', 'document_number', 'client_phone', 'client_name', 'vin_number',
+    'status', 'total', 'deposit', 'created_date', 'created_by',
+]
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _input_hash(document_type, priced, vin, deposit, bill_to, ship_to, delivery_time):
+    """Fingerprint of everything printed on a document except its number and date."""
+    payload = {
+        'document_type': document_type,
+        'client': [priced.client['phone'], priced.client['client_name']],
+        'vin': vin,
+        'lines': priced.lines.to_json(orient='values'),
+        'total': priced.total,
+        'deposit': deposit,
+        'bill_to': bill_to,
+        'ship_to': ship_to,
+        'delivery_time': delivery_time or priced.delivery_time,
+    }
+    return _sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'))
+
+
+# Attempts at rendering outside the write lock before giving up when other documents keep
+# taking the number the render was made for
+ISSUE_ATTEMPTS = 5
+
+
+def _format_number(document_type, n):
+    return f"{DOCUMENT_PREFIXES[document_type]}-{n:06d}"
+
+
+def _peek_document_number(conn, document_type):
+    """The number the next document of this type will get, if nobody else issues one first."""
+    row = conn.execute("SELECT last_number FROM document_sequences WHERE document_type = ?", (document_type,)).fetchone()
+    return _format_number(document_type, (row[0] if row else 0) + 1)
+
+
+def _next_document_number(conn, document_type):
+    """Allocate the next number for a document type; call inside the issuing transaction."""
+    last = conn.execute(
+        "INSERT INTO document_sequences (document_type, last_number) VALUES (?, 1) "
+        "ON CONFLICT(document_type) DO UPDATE SET last_number = last_number + 1 RETURNING last_number",
+        (document_type,),
+    ).fetchone()[0]
+    return _format_number(document_type, last)
+
+
+def _fetch_document(cur, where, params):
+    cur.row_factory = sqlite3.Row
+    row = cur.execute(f"SELECT * FROM documents d WHERE {where}", params).fetchone()
+    if row is None:
+        return None, None
+    document = dict(row)
+    return document, document.pop('pdf')
+
+
+_REUSABLE = "d.input_hash = ? AND d.status != 'void' ORDER BY d.id DESC LIMIT 1"
+
+
+def issue_document(document_type, phone, vin, part_ids, supplier_choice=(), deposit=0.0,
+                   bill_to=None, ship_to=None, delivery_time=None, username=None):
+    """Number, render and store a quote or invoice.
+
+    If a document that is not void was already issued from identical inputs, it is returned
+    with its stored bytes instead of allocating a new number or re-rendering.
+
+    The PDF is rendered before the write transaction, for the number the document is expected
+    to get; the transaction only allocates the number and inserts the row. If another document
+    took that number in the meantime, the PDF is rendered again for the next one.
+
+    Returns:
+        (document dict, pdf bytes, reused) where reused is True for a stored document
+    """
+    if document_type not in DOCUMENT_PREFIXES:
+        raise ValueError(f"Unknown document type: {document_type}")
+    priced = price_quote(phone, vin, part_ids, supplier_choice)
+    if priced is None:
+        raise ValueError("Client not found")
+    input_hash = _input_hash(document_type, priced, vin, deposit, bill_to, ship_to, delivery_time)
+
+    with db_utils.get_db_connection_ctx() as conn:
+        cur = conn.cursor()
+        for _ in range(ISSUE_ATTEMPTS):
+            document, data = _fetch_document(cur, _REUSABLE, (input_hash,))
+            if document is not None:
+                return document, data, True
+            number = _peek_document_number(conn, document_type)
+            data = render_quote_pdf(
+                phone, vin, part_ids, supplier_choice,
+                document_type=document_type, document_number=number, deposit=deposit,
+                bill_to=bill_to, ship_to=ship_to, delivery_time=delivery_time,
+            )
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                document, stored = _fetch_document(cur, _REUSABLE, (input_hash,))
+                if document is not None:
+                    conn.rollback()
+                    return document, stored, True
+                if _next_document_number(conn, document_type) != number:
+                    conn.rollback()
+                    continue
+                document_id = conn.execute(
+                    "INSERT INTO documents (document_type, document_number, client_phone, client_name, vin_number, "
+                    "total, deposit, input_hash, pdf, created_by, last_updated_by) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        document_type, number, priced.client['phone'], priced.client['client_name'], vin,
+                        priced.total, deposit, input_hash, data, username, username,
+                    ),
+                ).lastrowid
+                db_utils.log_activity(
+                    username, "issue_document", f"Issued {document_type} {number}", "documents", document_id, conn=conn,
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            document, data = _fetch_document(cur, "d.id = ?", (document_id,))
+            return document, data, False
+    raise ValueError(f"Could not allocate a {document_type} number; other documents are being issued, try again")
+
+
+def get_document_pdf(document_id):
+    """Stored PDF bytes of a document, or None."""
+    with db_utils.get_db_connection_ctx() as conn:
+        return _fetch_document(conn.cursor(), "d.id = ?", (int(document_id),))[1]
+
+
+def find_documents(client_phone=None, status=None, document_type=None, start=None, end=None, limit=100) -> pd.DataFrame:
+    """Documents matching the filters, newest first (without their PDF bytes).
+
+    start and end are inclusive 'YYYY-MM-DD' dates on created_date.
+    """
+    conditions, params = [], []
+    if client_phone:
+        conditions.append("client_phone = ?")
+        params.append(str(client_phone))
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if document_type:
+        conditions.append("document_type = ?")
+        params.append(document_type)
+    if start:
+        conditions.append("created_date >= ?")
+        params.append(str(start))
+    if end:
+        conditions.append("created_date < date(?, '+1 day')")
+        params.append(str(end))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    with db_utils.get_db_connection_ctx() as conn:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents{where} ORDER BY created_date DESC, id DESC LIMIT ?",
+            conn, params=params + [int(limit)],
+        )
+
+
+def set_document_status(document_id, status, username):
+    """Change a document's status; voided documents are no longer reused for identical inputs."""
+    if status not in DOCUMENT_STATUSES:
+        raise ValueError(f"Unknown document status: {status}")
+    with db_utils.get_db_connection_ctx() as conn:
+        updated = conn.execute(
+            "UPDATE documents SET status = ?, last_updated = CURRENT_TIMESTAMP, last_updated_by = ? WHERE id = ?",
+            (status, username, int(document_id)),
+        ).rowcount
+        if updated:
+            db_utils.log_activity(
+                username, "update_document_status", f"Document {document_id} marked {status}", "documents", document_id, conn=conn,
+            )
+        conn.commit()
+    return bool(updated)
@@ -0,0 +1,362 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+import db_utils
+from security import (
+    validate_phone_series, validate_vin_series, validate_numeric_series, normalize_vin_series,
+    to_numeric_series,
+)
+from services.cache import invalidate_all
+from services.vin_decoder import decode_vin
+
+# Rows validated, resolved and written per transaction
+IMPORT_CHUNK_ROWS = 1000
+
+# Columns accepted per import kind; anything else in the file is ignored
+IMPORT_COLUMNS = {
+    'clients': ('phone', 'client_name'),
+    'vins': ('vin_number', 'client_phone', 'model', 'prod_yr', 'body', 'engine', 'code', 'transmission'),
+    'parts': ('id', 'vin_number', 'client_phone', 'part_name', 'part_number', 'quantity', 'notes'),
+    'part_suppliers': (
+        'part_id', 'part_number', 'vin_number', 'client_phone',
+        'supplier_name', 'buying_price', 'selling_price', 'delivery_time',
+    ),
+}
+
+REJECT_COLUMNS = ['row', 'reason']
+
+
+def _normalize_header(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def _prepare(frame, kind, first_row):
+    """Normalize headers, keep the known columns and number rows as they appear in a spreadsheet."""
+    frame = frame.rename(columns=_normalize_header)
+    for column in IMPORT_COLUMNS[kind]:
+        if column not in frame.columns:
+            frame[column] = ''
+    frame = frame[list(IMPORT_COLUMNS[kind])].fillna('').astype(str).apply(lambda col: col.str.strip())
+    # Row 1 is the header
+    frame.insert(0, 'row', range(first_row + 2, first_row + 2 + len(frame)))
+    return frame.reset_index(drop=True)
+
+
+def iter_import_chunks(fileobj, filename, kind, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield (DataFrame chunk, total data rows or None) from a CSV or XLSX upload without loading it whole."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            total = max((sheet.max_row or 1) - 1, 0)
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            batch, first_row = [], 0
+            for values in rows:
+                batch.append(['' if v is None else v for v in values])
+                if len(batch) == chunk_rows:
+                    yield _prepare(pd.DataFrame(batch, columns=header), kind, first_row), total
+                    first_row += len(batch)
+                    batch = []
+            if batch:
+                yield _prepare(pd.DataFrame(batch, columns=header), kind, first_row), total
+        finally:
+            workbook.close()
+    elif extension in ('.csv', '.txt', ''):
+        first_row = 0
+        for chunk in pd.read_csv(fileobj, dtype=str, keep_default_na=False, chunksize=chunk_rows, encoding='utf-8-sig'):
+            yield _prepare(chunk, kind, first_row), None
+            first_row += len(chunk)
+    else:
+        raise ValueError(f"Unsupported import file type: {extension}")
+
+
+def _reject(rejects, frame, mask, reason):
+    """Move the rows selected by mask from frame into the reject list."""
+    mask = mask.reindex(frame.index, fill_value=False).astype(bool)
+    if mask.any():
+        bad = frame[mask]
+        rejects.extend({'row': int(r), 'reason': reason} for r in bad['row'])
+    return frame[~mask]
+
+
+def validate_chunk(kind, frame):
+    """Validate and normalize one chunk column-wise; returns (valid rows, list of reject dicts)."""
+    rejects = []
+    if kind == 'clients':
+        frame = _reject(rejects, frame, ~validate_phone_series(frame['phone']), "Invalid phone number format")
+        frame = _reject(rejects, frame, frame.duplicated('phone', keep='last'), "Duplicate phone in file (last row wins)")
+    elif kind == 'vins':
+        frame = frame.assign(vin_number=normalize_vin_series(frame['vin_number']))
+        frame = _reject(rejects, frame, frame['vin_number'] == '', "VIN number is required")
+        frame = _reject(rejects, frame, ~validate_vin_series(frame['vin_number']), "Invalid VIN format")
+        frame = _reject(rejects, frame, ~validate_phone_series(frame['client_phone']), "Invalid client phone format")
+        frame = _reject(rejects, frame, frame.duplicated('vin_number', keep='last'), "Duplicate VIN in file (last row wins)")
+        # Blank model / production year are filled from the decoded VIN
+        decoded = frame['vin_number'].map(lambda v: decode_vin(v).prefill())
+        frame = frame.assign(
+            model=frame['model'].where(frame['model'] != '', decoded.str.get('model')).fillna(''),
+            prod_yr=frame['prod_yr'].where(frame['prod_yr'] != '', decoded.str.get('prod_yr')).fillna(''),
+        )
+    elif kind == 'parts':
+        frame = frame.assign(
+            vin_number=normalize_vin_series(frame['vin_number']),
+            quantity=frame['quantity'].replace('', '1'),
+        )
+        frame = _reject(rejects, frame, (frame['part_name'] == '') & (frame['part_number'] == ''), "Part name or part number is required")
+        frame = _reject(rejects, frame, ~validate_numeric_series(frame['quantity'], min_val=1), "Quantity must be at least 1")
+        frame = _reject(rejects, frame, ~validate_vin_series(frame['vin_number']), "Invalid VIN format")
+        frame = _reject(rejects, frame, (frame['client_phone'] != '') & ~validate_phone_series(frame['client_phone']), "Invalid client phone format")
+        frame = _reject(rejects, frame, (frame['id'] != '') & ~validate_numeric_series(frame['id'], min_val=1), "Invalid part id")
+    elif kind == 'part_suppliers':
+        frame = frame.assign(
+            vin_number=normalize_vin_series(frame['vin_number']),
+            buying_price=frame['buying_price'].replace('', '0'),
+            selling_price=frame['selling_price'].replace('', '0'),
+        )
+        frame = _reject(rejects, frame, frame['supplier_name'] == '', "Supplier name is required")
+        frame = _reject(rejects, frame, (frame['part_id'] == '') & (frame['part_number'] == ''), "Part id or part number is required")
+        frame = _reject(rejects, frame, ~validate_numeric_series(frame['buying_price'], min_val=0), "Invalid buying price")
+        frame = _reject(rejects, frame, ~validate_numeric_series(frame['selling_price'], min_val=0), "Invalid selling price")
+        frame = _reject(rejects, frame, (frame['part_id'] != '') & ~validate_numeric_series(frame['part_id'], min_val=1), "Invalid part id")
+    else:
+        raise ValueError(f"Unknown import kind: {kind}")
+    return frame, rejects
+
+
+def _existing(conn, query, values):
+    """Run query with the distinct values bound as one JSON array; returns the fetched rows."""
+    values = sorted(set(pd.Series(list(values), dtype=object).map(lambda v: v.item() if hasattr(v, 'item') else v)))
+    return conn.execute(query, (json.dumps(values),)).fetchall()
+
+
+def _import_clients(conn, frame, username):
+    known = {r[0] for r in _existing(conn, "SELECT phone FROM clients WHERE phone IN (SELECT value FROM json_each(?))", frame['phone'])}
+    conn.executemany(
+        "INSERT INTO clients (phone, client_name, created_by, last_updated_by) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(phone) DO UPDATE SET client_name = excluded.client_name, "
+        "last_updated_by = excluded.last_updated_by, last_updated = CURRENT_TIMESTAMP",
+        [(r.phone, r.client_name, username, username) for r in frame.itertuples(index=False)],
+    )
+    updated = int(frame['phone'].isin(known).sum())
+    return len(frame) - updated, updated, []
+
+
+def _import_vins(conn, frame, username):
+    rejects = []
+    clients = {r[0] for r in _existing(conn, "SELECT phone FROM clients WHERE phone IN (SELECT value FROM json_each(?))", frame['client_phone'])}
+    frame = _reject(rejects, frame, ~frame['client_phone'].isin(clients), "Unknown client phone")
+    owners = dict(_existing(conn, "SELECT vin_number, client_phone FROM vins WHERE vin_number IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL", frame['vin_number']))
+    other_owner = frame['vin_number'].map(owners).notna() & (frame['vin_number'].map(owners) != frame['client_phone'])
+    frame = _reject(rejects, frame, other_owner, "VIN belongs to another client")
+    # A trashed VIN is restored for its own client only, as in add_vin_to_client
+    trashed = {
+        vin: (phone, deleted_at) for vin, phone, deleted_at in _existing(
+            conn, "SELECT vin_number, client_phone, deleted_at FROM vins WHERE vin_number IN (SELECT value FROM json_each(?)) AND deleted_at IS NOT NULL", frame['vin_number'])
+    }
+    trash_owner = frame['vin_number'].map({vin: phone for vin, (phone, _) in trashed.items()})
+    frame = _reject(rejects, frame, trash_owner.notna() & (trash_owner != frame['client_phone']), "VIN is in another client's trash")
+    conn.executemany(
+        "INSERT INTO vins (vin_number, client_phone, model, prod_yr, body, engine, code, transmission, created_by, last_updated_by) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(vin_number) DO UPDATE SET model = excluded.model, prod_yr = excluded.prod_yr, body = excluded.body, "
+        "engine = excluded.engine, code = excluded.code, transmission = excluded.transmission, "
+        "deleted_at = NULL, deleted_by = NULL, "
+        "last_updated_by = excluded.last_updated_by, last_updated = CURRENT_TIMESTAMP",
+        [
+            (r.vin_number, r.client_phone, r.model, r.prod_yr, r.body, r.engine, r.code, r.transmission, username, username)
+            for r in frame.itertuples(index=False)
+        ],
+    )
+    # The parts deleted together with a restored VIN share its deleted_at
+    restored = sorted(set(frame['vin_number']) & set(trashed))
+    conn.executemany(
+        "UPDATE parts SET deleted_at = NULL, deleted_by = NULL, last_updated_by = ? WHERE vin_number = ? AND deleted_at = ?",
+        [(username, vin, trashed[vin][1]) for vin in restored],
+    )
+    updated = int((frame['vin_number'].isin(owners) | frame['vin_number'].isin(trashed)).sum())
+    return len(frame) - updated, updated, rejects
+
+
+def _import_parts(conn, frame, username):
+    rejects = []
+    with_vin = frame['vin_number'] != ''
+    owners = dict(_existing(conn, "SELECT vin_number, client_phone FROM vins WHERE vin_number IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL", frame.loc[with_vin, 'vin_number']))
+    frame = _reject(rejects, frame, with_vin & ~frame['vin_number'].isin(owners), "Unknown VIN")
+    with_vin = frame['vin_number'] != ''
+    vin_owner = frame['vin_number'].map(owners).fillna('')
+    frame = _reject(rejects, frame, with_vin & (frame['client_phone'] != '') & (frame['client_phone'] != vin_owner), "VIN belongs to another client")
+    # Parts attached to a VIN always take the VIN owner's phone
+    frame = frame.assign(client_phone=frame['client_phone'].where(frame['vin_number'] == '', frame['vin_number'].map(owners)))
+    phones = frame.loc[frame['client_phone'].fillna('') != '', 'client_phone']
+    clients = {r[0] for r in _existing(conn, "SELECT phone FROM clients WHERE phone IN (SELECT value FROM json_each(?))", phones)}
+    frame = _reject(rejects, frame, (frame['client_phone'].fillna('') != '') & ~frame['client_phone'].isin(clients), "Unknown client phone")
+
+    ids = to_numeric_series(frame['id'])
+    known = {r[0] for r in _existing(conn, "SELECT id FROM parts WHERE id IN (SELECT value FROM json_each(?))", ids.dropna().astype(int))}
+    is_update = ids.isin(known)
+    date_added = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def values(r):
+        return (r.vin_number or None, r.client_phone or None, r.part_name, r.part_number, int(float(r.quantity)), r.notes)
+
+    conn.executemany(
+        "UPDATE parts SET vin_number = ?, client_phone = ?, part_name = ?, part_number = ?, quantity = ?, notes = ?, "
+        "deleted_at = NULL, deleted_by = NULL, last_updated_by = ?, last_updated = CURRENT_TIMESTAMP WHERE id = ?",
+        [values(r) + (username, int(part_id)) for r, part_id in zip(frame[is_update].itertuples(index=False), ids[is_update])],
+    )
+    conn.executemany(
+        "INSERT INTO parts (id, vin_number, client_phone, part_name, part_number, quantity, notes, date_added, created_by, last_updated_by) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (None if pd.isna(part_id) else int(part_id),) + values(r) + (date_added, username, username)
+            for r, part_id in zip(frame[~is_update].itertuples(index=False), ids[~is_update])
+        ],
+    )
+    updated = int(is_update.sum())
+    return len(frame) - updated, updated, rejects
+
+
+def _import_part_suppliers(conn, frame, username):
+    rejects = []
+    by_id = frame['part_id'] != ''
+    part_ids = to_numeric_series(frame['part_id'])
+    known = {r[0] for r in _existing(conn, "SELECT id FROM parts WHERE id IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL", part_ids.dropna().astype(int))}
+    frame = _reject(rejects, frame, by_id & ~part_ids.isin(known), "Unknown part id")
+    part_ids = part_ids[frame.index]
+
+    # Rows without a part id are matched on part_number, narrowed by VIN and client when given
+    by_number = frame['part_id'] == ''
+    if by_number.any():
+        candidates = pd.DataFrame(
+            _existing(conn, "SELECT id, part_number, COALESCE(vin_number, ''), COALESCE(client_phone, '') FROM parts "
+                            "WHERE part_number IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL", frame.loc[by_number, 'part_number']),
+            columns=['id', 'part_number', 'vin_number', 'client_phone'],
+        )
+        resolved = {}
+        for idx, r in frame[by_number].iterrows():
+            match = candidates[candidates['part_number'] == r['part_number']]
+            if r['vin_number']:
+                match = match[match['vin_number'] == r['vin_number']]
+            if r['client_phone']:
+                match = match[match['client_phone'] == r['client_phone']]
+            resolved[idx] = match['id'].tolist()
+        matches = pd.Series(resolved, dtype=object).reindex(frame.index)
+        frame = _reject(rejects, frame, by_number & matches.map(lambda m: isinstance(m, list) and len(m) == 0), "Unknown part number")
+        frame = _reject(rejects, frame, by_number & matches.map(lambda m: isinstance(m, list) and len(m) > 1), "Ambiguous part number (add vin_number or client_phone)")
+        part_ids = part_ids[frame.index].where(frame['part_id'] != '', matches[frame.index].map(lambda m: m[0] if isinstance(m, list) else None))
+
+    frame = frame.assign(part_id=part_ids.astype(int))
+    frame = _reject(rejects, frame, frame.duplicated(['part_id', 'supplier_name'], keep='last'), "Duplicate supplier for part in file (last row wins)")
+    existing = {
+        (r[0], r[1]) for r in conn.execute(
+            "SELECT part_id, supplier_name FROM part_suppliers WHERE part_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(set(frame['part_id'].tolist()))),),
+        ).fetchall()
+    }
+    is_update = pd.Series([(pid, name) in existing for pid, name in zip(frame['part_id'], frame['supplier_name'])], index=frame.index, dtype=bool)
+    conn.executemany(
+        "UPDATE part_suppliers SET buying_price = ?, selling_price = ?, delivery_time = ?, last_updated_by = ?, "
+        "last_updated = CURRENT_TIMESTAMP WHERE part_id = ? AND supplier_name = ?",
+        [
+            (float(r.buying_price), float(r.selling_price), r.delivery_time, username, int(r.part_id), r.supplier_name)
+            for r in frame[is_update].itertuples(index=False)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO part_suppliers (part_id, supplier_name, buying_price, selling_price, delivery_time, created_by, last_updated_by) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (int(r.part_id), r.supplier_name, float(r.buying_price), float(r.selling_price), r.delivery_time, username, username)
+            for r in frame[~is_update].itertuples(index=False)
+        ],
+    )
+    updated = int(is_update.sum())
+    return len(frame) - updated, updated, rejects
+
+
+_IMPORTERS = {
+    'clients': _import_clients,
+    'vins': _import_vins,
+    'parts': _import_parts,
+    'part_suppliers': _import_part_suppliers,
+}
+
+
+def import_file(fileobj, filename, kind, username, dry_run=False, progress=None, chunk_rows=IMPORT_CHUNK_ROWS) -> dict:
+    """Stream a CSV/XLSX file into one table in chunked transactions.
+
+    Each chunk is validated, its foreign keys are resolved with one query per referenced
+    table, and it is upserted with executemany in its own transaction. With dry_run the
+    whole import runs in one transaction that is rolled back, so the counts and reject
+    report are exactly what a real run would produce.
+
+    Args:
+        kind: one of IMPORT_COLUMNS
+        progress: optional callable receiving (rows processed, total rows or None)
+
+    Returns:
+        dict with rows, inserted, updated, rejected (DataFrame with row and reason) and dry_run
+    """
+    if kind not in _IMPORTERS:
+        raise ValueError(f"Unknown import kind: {kind}")
+    result = {'kind': kind, 'rows': 0, 'inserted': 0, 'updated': 0, 'dry_run': dry_run}
+    rejects = []
+    with db_utils.get_db_connection_ctx() as conn:
+        if dry_run:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            for chunk, total in iter_import_chunks(fileobj, filename, kind, chunk_rows):
+                valid, chunk_rejects = validate_chunk(kind, chunk)
+                rejects.extend(chunk_rejects)
+                if not valid.empty:
+                    if not dry_run:
+                        conn.execute("BEGIN IMMEDIATE")
+                    conn.execute("SAVEPOINT import_chunk")
+                    try:
+                        inserted, updated, fk_rejects = _IMPORTERS[kind](conn, valid, username)
+                        conn.execute("RELEASE import_chunk")
+                        if not dry_run:
+                            conn.commit()
+                        result['inserted'] += inserted
+                        result['updated'] += updated
+                        rejects.extend(fk_rejects)
+                    except sqlite3.Error as e:
+                        conn.execute("ROLLBACK TO import_chunk")
+                        conn.execute("RELEASE import_chunk")
+                        if not dry_run:
+                            conn.commit()
+                        rejects.extend({'row': int(r), 'reason': f"Database error: {e}"} for r in valid['row'])
+                result['rows'] += len(chunk)
+                if progress:
+                    progress(result['rows'], total)
+        finally:
+            if dry_run:
+                conn.rollback()
+
+    result['rejected'] = pd.DataFrame(sorted(rejects, key=lambda r: r['row']), columns=REJECT_COLUMNS)
+    if not dry_run:
+        db_utils.log_activity(
+            username, "import", f"Imported {kind} from {filename}: {result['inserted']} inserted, "
+            f"{result['updated']} updated, {len(result['rejected'])} rejected", kind,
+        )
+        if result['inserted'] or result['updated']:
+            invalidate_all()
+    return result
+
+
+def reject_report_csv(result) -> str:
+    """The reject report of an import result as CSV text."""
+    buffer = io.StringIO()
+    result['rejected'].to_csv(buffer, index=False, quoting=csv.QUOTE_MINIMAL)
+    return buffer.getvalue()
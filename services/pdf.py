@@ -1,4 +1,12 @@
+import io
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+
 from fpdf import FPDF
 
 # --- YOUR COMPANY INFO ---
@@ -20,22 +28,72 @@ COMPANY_INFO = {
 }
 
 
-def generate_pdf(
-    client_info,
-    parts_data,
-    total_quote_amount,
-    manual_deposit,
-    bill_to_info=None,
-    ship_to_info=None,
-    delivery_time=None,
-    document_number=None,
-    document_type: str = 'quote'
-):
+# Fonts every document registers first, in this order, so cached template streams
+# refer to the same /F<n> font resources in every document
+DOCUMENT_FONTS = (("Arial", "B"), ("Arial", ""))
+
+TERMS_TEXT = (
+    "No returns accepted after 7 days from invoice date. "
+    "ALL Special Orders must be paid for in advance. "
+    "A 20% Restocking Fee and Credit Card Fee applies to returned items. "
+    "No return/refund on all special order items Electrical, electronic parts and fuel pumps, warranty is against the manufacture. "
+    "Any charges incurred by this company in the recovery of any unpaid invoice balance on account or dishonoured cheque will be at the buyer's expense. "
+    "The seller shall retain absolute title ownership and right to possession of the goods until full payment is received. "
+    "A 2% finance charge for all account balances over 30 days. "
+    "Shipping delays subject to airline, customs or natural disasters are not the responsibility of the seller."
+)
+
+# Batches smaller than this are rendered in-process; starting a process pool costs more
+BATCH_POOL_THRESHOLD = 8
+
+# Rendered-but-unwritten documents allowed per pool worker during a batch
+BATCH_WINDOW_PER_WORKER = 2
+
+
+@dataclass(frozen=True)
+class _Block:
+    """A pre-rendered page content stream and the vertical span it was drawn in."""
+    stream: str
+    top: float
+    bottom: float
+
+    @property
+    def height(self):
+        return self.bottom - self.top
+
+
+def _new_document():
     pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=16)
+    for family, style in DOCUMENT_FONTS:
+        pdf.set_font(family, style=style)
+    return pdf
 
-    # --- COMPANY INFO HEADER ---
+
+def _capture(render):
+    """Render a static block once on a scratch page and keep its content stream."""
+    pdf = _new_document()
+    pdf.add_page()
+    # Force the block's first set_font() to be written into the captured stream
+    pdf.font_family = ''
+    top = pdf.get_y()
+    start = len(pdf.pages[pdf.page])
+    render(pdf)
+    return _Block(stream=pdf.pages[pdf.page][start:].rstrip("\n"), top=top, bottom=pdf.get_y())
+
+
+def _stamp(pdf, block):
+    """Draw a cached block with its top at the current position, starting a new page if it does not fit."""
+    if pdf.get_y() + block.height > pdf.page_break_trigger:
+        pdf.add_page()
+    y = pdf.get_y()
+    # PDF space has y pointing up; q/Q keeps the block's font changes from leaking into the document
+    pdf._out(f"q 1 0 0 1 0 {(block.top - y) * pdf.k:.2f} cm")
+    pdf._out(block.stream)
+    pdf._out("Q")
+    pdf.set_xy(pdf.l_margin, y + block.height)
+
+
+def _render_header(pdf):
     pdf.set_font("Arial", style="B", size=14)
     pdf.cell(200, 8, txt=COMPANY_INFO["name"], ln=True, align="C")
 
@@ -57,6 +115,41 @@ def generate_pdf(
     pdf.cell(200, 4, txt=f"Website: {COMPANY_INFO['website']}", ln=True, align="C")
     pdf.ln(5)  # Add a line break for spacing
 
+
+def _render_terms(pdf):
+    pdf.set_font("Arial", size=10)
+    pdf.cell(200, 5, txt="* An 80% Deposit required upon Order Confirmation", ln=True)
+    pdf.ln(5)
+    pdf.set_font("Arial", style="B", size=10)
+    pdf.cell(200, 5, txt="TERMS OF SALE:", ln=True)
+    pdf.set_font("Arial", size=8)
+    pdf.multi_cell(0, 4, txt=TERMS_TEXT)
+
+
+@lru_cache(maxsize=None)
+def _templates():
+    """Company header and terms block, rendered once per process."""
+    return _capture(_render_header), _capture(_render_terms)
+
+
+def generate_pdf(
+    client_info,
+    parts_data,
+    total_quote_amount,
+    manual_deposit,
+    bill_to_info=None,
+    ship_to_info=None,
+    delivery_time=None,
+    document_number=None,
+    document_type: str = 'quote'
+):
+    pdf = _new_document()
+    pdf.add_page()
+    header, terms = _templates()
+
+    # --- COMPANY INFO HEADER ---
+    _stamp(pdf, header)
+
     # Quote Title, Number, and Date
     pdf.set_font("Arial", size=16)
     title_text = "QUOTATION" if document_type == 'quote' else "INVOICE"
@@ -153,22 +246,72 @@ def generate_pdf(
     else:
         pdf.cell(200, 5, txt=f"* DELIVERY WITHIN {delivery_time} BUSINESS DAYS AFTER ORDER CONFIRMATION", ln=True)
 
-    pdf.cell(200, 5, txt="* An 80% Deposit required upon Order Confirmation", ln=True)
-    pdf.ln(5)
-    pdf.set_font("Arial", style="B", size=10)
-    pdf.cell(200, 5, txt="TERMS OF SALE:", ln=True)
-    pdf.set_font("Arial", size=8)
-    terms_text = (
-        "No returns accepted after 7 days from invoice date. "
-        "ALL Special Orders must be paid for in advance. "
-        "A 20% Restocking Fee and Credit Card Fee applies to returned items. "
-        "No return/refund on all special order items Electrical, electronic parts and fuel pumps, warranty is against the manufacture. "
-        "Any charges incurred by this company in the recovery of any unpaid invoice balance on account or dishonoured cheque will be at the buyer's expense. "
-        "The seller shall retain absolute title ownership and right to possession of the goods until full payment is received. "
-        "A 2% finance charge for all account balances over 30 days. "
-        "Shipping delays subject to airline, customs or natural disasters are not the responsibility of the seller."
-    )
-    pdf.multi_cell(0, 4, txt=terms_text)
+    _stamp(pdf, terms)
 
     return pdf.output(dest='S')
 
+
+
+def pdf_bytes(output):
+    """generate_pdf() output as bytes (fpdf returns a latin-1 str)."""
+    return output.encode('latin-1') if isinstance(output, str) else bytes(output)
+
+
+def _render_document(document):
+    kwargs = {k: v for k, v in document.items() if k != 'filename'}
+    return document['filename'], pdf_bytes(generate_pdf(**kwargs))
+
+
+def _unique_name(name, used):
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{base}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def _bounded_map(pool, fn, items, window):
+    """Like pool.map, but with at most window tasks submitted and not yet consumed; yields in input order."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def generate_pdf_batch(documents, fileobj=None, max_workers=None, progress=None):
+    """Render many quotes/invoices and stream them into one ZIP archive.
+
+    Args:
+        documents: dicts of generate_pdf() keyword arguments, each with a 'filename'
+        fileobj: writable binary file for the archive; the archive bytes are returned when omitted
+        max_workers: process pool size (defaults to the CPU count); 1 renders in-process
+        progress: optional callback(done, total)
+
+    Documents are written in input order. At most BATCH_WINDOW_PER_WORKER documents per worker
+    are submitted ahead of the writer, so memory use stays bounded however large the run is.
+    """
+    documents = list(documents)
+    total = len(documents)
+    target = fileobj if fileobj is not None else io.BytesIO()
+    used = set()
+
+    with zipfile.ZipFile(target, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        def _write(results):
+            for done, (name, data) in enumerate(results, 1):
+                zf.writestr(_unique_name(name, used), data)
+                if progress:
+                    progress(done, total)
+
+        if total < BATCH_POOL_THRESHOLD or max_workers == 1:
+            _write(map(_render_document, documents))
+        else:
+            workers = max_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                _write(_bounded_map(pool, _render_document, documents, workers * BATCH_WINDOW_PER_WORKER))
+
+    return target.getvalue() if fileobj is None else None
@@ -0,0 +1,184 @@
+import json
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from db_utils import get_db_connection_ctx
+from logic import load_quote
+from services.cache import memoize, client_key
+from services.pdf import generate_pdf, pdf_bytes
+
+# Share of the total asked up front; matches the "80% Deposit" line printed on every document
+DEPOSIT_RATE = 0.8
+IN_STOCK = "IN STOCK"
+
+LINE_COLUMNS = [
+    'part_id', 'part_name', 'part_number', 'quantity',
+    'supplier_id', 'supplier_name', 'unit_price', 'line_total', 'delivery_time',
+]
+
+
+@dataclass
+class PricedQuote:
+    """A loaded quote with one priced line per part and its totals."""
+    client: dict
+    vin: dict | None
+    lines: pd.DataFrame
+    total: float = 0.0
+    deposit: float = 0.0
+    balance: float = 0.0
+    delivery_time: str | None = None
+    unpriced_part_ids: list = field(default_factory=list)
+
+    def pdf_parts(self):
+        """Parts in the shape generate_pdf() expects."""
+        return [
+            {'name': row.part_name, 'quantity': int(row.quantity), 'price': float(row.unit_price)}
+            for row in self.lines.itertuples(index=False)
+        ]
+
+
+def _quote_delivery_time(delivery):
+    """'IN STOCK' when every line is in stock, else the longest delivery in days."""
+    text = delivery.fillna('').astype(str).str.strip()
+    if not text.empty and text.str.upper().eq(IN_STOCK).all():
+        return IN_STOCK
+    days = pd.to_numeric(text.str.extract(r'(\d+)', expand=False), errors='coerce')
+    return str(int(days.max())) if days.notna().any() else None
+
+
+@memoize(lambda phone, vin, part_ids, supplier_choice=(): [client_key(phone)])
+def price_quote(phone, vin, part_ids, supplier_choice=()):
+    """Price the selected parts of a client's quote.
+
+    Args:
+        phone, vin: client and (optional) VIN the quote is for
+        part_ids: tuple of part ids, in document order
+        supplier_choice: tuple of (part_id, supplier_id) pairs; parts without a choice use
+            their cheapest priced supplier
+
+    Each line is priced at the chosen supplier's selling price. The result is memoized per
+    arguments and evicted when the client's data changes; treat it as read-only.
+    Returns a PricedQuote, or None if the client does not exist.
+    """
+    quote = load_quote(phone, vin, part_ids)
+    if quote is None:
+        return None
+
+    parts = pd.DataFrame([line.part for line in quote.lines], columns=['id', 'part_name', 'part_number', 'quantity'])
+    suppliers = pd.DataFrame(
+        [s for line in quote.lines for s in line.suppliers],
+        columns=['id', 'part_id', 'supplier_name', 'selling_price', 'delivery_time'],
+    )
+
+    chosen = suppliers['part_id'].map(dict(supplier_choice)).eq(suppliers['id'])
+    suppliers = suppliers.assign(
+        selling_price=pd.to_numeric(suppliers['selling_price'], errors='coerce'),
+        _rank=(~chosen).astype(int),
+    )
+    suppliers = suppliers.assign(_unpriced=suppliers['selling_price'].isna().astype(int))
+    picked = (
+        suppliers.sort_values(['part_id', '_rank', '_unpriced', 'selling_price', 'id'])
+        .drop_duplicates('part_id')
+        .rename(columns={'id': 'supplier_id', 'selling_price': 'unit_price'})
+    )
+
+    lines = parts.rename(columns={'id': 'part_id'}).merge(
+        picked[['part_id', 'supplier_id', 'supplier_name', 'unit_price', 'delivery_time']], on='part_id', how='left'
+    )
+    unpriced = lines.loc[lines['unit_price'].isna(), 'part_id'].tolist()
+    lines['quantity'] = pd.to_numeric(lines['quantity'], errors='coerce').fillna(1).astype(int)
+    lines['unit_price'] = lines['unit_price'].fillna(0.0).round(2)
+    lines['line_total'] = (lines['quantity'] * lines['unit_price']).round(2)
+
+    total = round(float(lines['line_total'].sum()), 2)
+    deposit = round(total * DEPOSIT_RATE, 2)
+    return PricedQuote(
+        client=quote.client,
+        vin=quote.vin,
+        lines=lines[LINE_COLUMNS],
+        total=total,
+        deposit=deposit,
+        balance=round(total - deposit, 2),
+        delivery_time=_quote_delivery_time(lines['delivery_time']),
+        unpriced_part_ids=unpriced,
+    )
+
+
+def _document_kwargs(priced, vin, document_type='quote', document_number=None, deposit=0.0,
+                     bill_to=None, ship_to=None, delivery_time=None):
+    """generate_pdf() keyword arguments for a PricedQuote."""
+    return dict(
+        client_info={'name': priced.client['client_name'], 'phone': priced.client['phone'], 'vin_number': vin},
+        parts_data=priced.pdf_parts(),
+        total_quote_amount=priced.total,
+        manual_deposit=deposit,
+        bill_to_info=dict(zip(('name', 'address'), bill_to)) if bill_to else None,
+        ship_to_info=dict(zip(('name', 'address'), ship_to)) if ship_to else None,
+        delivery_time=delivery_time or priced.delivery_time,
+        document_number=document_number,
+        document_type=document_type,
+    )
+
+
+def render_quote_pdf(phone, vin, part_ids, supplier_choice, document_type='quote', document_number=None,
+                     deposit=0.0, bill_to=None, ship_to=None, delivery_time=None):
+    """Render PDF bytes for a priced quote (not memoized; issued documents are rendered once and stored).
+
+    bill_to and ship_to are optional (name, address) tuples. Returns None if the client does not exist.
+    """
+    priced = price_quote(phone, vin, part_ids, supplier_choice)
+    if priced is None:
+        return None
+    return pdf_bytes(generate_pdf(**_document_kwargs(
+        priced, vin, document_type, document_number, deposit, bill_to, ship_to, delivery_time,
+    )))
+
+
+def batch_documents(document_type='quote'):
+    """generate_pdf_batch() documents: one un-numbered document per client covering all of its live parts.
+
+    Prices go through the un-memoized price_quote so a run over every client does not flood the cache.
+    """
+    with get_db_connection_ctx() as conn:
+        rows = conn.execute(
+            "SELECT client_phone, json_group_array(id) FROM parts "
+            "WHERE deleted_at IS NULL AND client_phone IS NOT NULL GROUP BY client_phone ORDER BY client_phone"
+        ).fetchall()
+    documents = []
+    for phone, part_ids in rows:
+        priced = price_quote.__wrapped__(phone, None, tuple(sorted(json.loads(part_ids))))
+        if priced is None or priced.lines.empty:
+            continue
+        documents.append(dict(_document_kwargs(priced, None, document_type), filename=f"{document_type}_{phone}.pdf"))
+    return documents
+
+
+def format_text_quote(priced, conditions=None):
+    """Plain-text quote for pasting into a message.
+
+    Args:
+        priced: PricedQuote
+        conditions: optional {part_id: condition} shown next to each part (e.g. 'New', 'Used')
+    """
+    conditions = conditions or {}
+    lines = [f"Quote for {priced.client['client_name']}"]
+    if priced.vin:
+        model = f" ({priced.vin['model']})" if priced.vin.get('model') else ""
+        lines.append(f"VIN: {priced.vin['vin_number']}{model}")
+    lines.append("")
+    for n, row in enumerate(priced.lines.itertuples(index=False), 1):
+        condition = f" [{conditions[row.part_id]}]" if conditions.get(row.part_id) else ""
+        number = f" #{row.part_number}" if row.part_number else ""
+        lines.append(f"{n}. {row.part_name}{number}{condition} x{row.quantity} @ ${row.unit_price:.2f} = ${row.line_total:.2f}")
+    lines += [
+        "",
+        f"Total: ${priced.total:.2f}",
+        f"Deposit ({DEPOSIT_RATE:.0%}): ${priced.deposit:.2f}",
+        f"Balance: ${priced.balance:.2f}",
+    ]
+    if priced.delivery_time == IN_STOCK:
+        lines.append("Delivery: in stock, available for immediate pickup")
+    elif priced.delivery_time:
+        lines.append(f"Delivery: within {priced.delivery_time} business days after order confirmation")
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+import re
+import pandas as pd
+
+from db_utils import get_db_connection_ctx
+
+# Result kinds and the FTS5 indexes that serve them (word index first, optional trigram index second)
+SEARCH_KINDS = {
+    'clients': ('clients', 'clients_fts', None),
+    'vins': ('vins', 'vins_fts', 'vins_trgm'),
+    'parts': ('parts', 'parts_fts', 'parts_trgm'),
+}
+
+# Columns used by the LIKE fallback when FTS5 is not available
+_FALLBACK_COLUMNS = {
+    'clients': ('phone', 'client_name'),
+    'vins': ('vin_number', 'model'),
+    'parts': ('part_name', 'part_number', 'notes'),
+}
+
+# Tables whose tombstoned rows (deleted_at set) are hidden from results
+_SOFT_DELETE = {'vins', 'parts'}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(str(query or ''))
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query: every token must match, each as a prefix."""
+    return ' '.join(f'"{tok}"*' for tok in _tokens(query))
+
+
+def build_trigram_query(query):
+    """Substring query for the trigram indexes (tokens shorter than 3 chars cannot be matched)."""
+    tokens = [tok for tok in _tokens(query) if len(tok) >= 3]
+    return ' '.join(f'"{tok}"' for tok in tokens)
+
+
+def _has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'clients_fts'").fetchone() is not None
+
+
+def _match_sql(kind, with_trigram):
+    table, fts, trgm = SEARCH_KINDS[kind]
+    rowid_col = 'id' if table == 'parts' else 'rowid'
+    matches = f"SELECT rowid, rank AS score FROM {fts} WHERE {fts} MATCH :q"
+    if trgm and with_trigram:
+        matches += f" UNION ALL SELECT rowid, rank AS score FROM {trgm} WHERE {trgm} MATCH :tq"
+    return table, rowid_col, matches
+
+
+def _live(table, keyword='WHERE'):
+    """Condition that drops tombstoned rows of the source table (aliased t), if it has them."""
+    return f" {keyword} t.deleted_at IS NULL" if table in _SOFT_DELETE else ""
+
+
+def _search_kind(conn, kind, query, limit, offset):
+    match_q = build_match_query(query)
+    trigram_q = build_trigram_query(query)
+    table, rowid_col, matches = _match_sql(kind, bool(trigram_q))
+    sql = (
+        f"SELECT t.* FROM ({matches}) m JOIN {table} t ON t.{rowid_col} = m.rowid{_live(table)} "
+        f"GROUP BY m.rowid ORDER BY MIN(m.score) LIMIT :limit OFFSET :offset"
+    )
+    return pd.read_sql_query(sql, conn, params={'q': match_q, 'tq': trigram_q, 'limit': limit, 'offset': offset})
+
+
+def _count_kind(conn, kind, query):
+    trigram_q = build_trigram_query(query)
+    table, rowid_col, matches = _match_sql(kind, bool(trigram_q))
+    if table in _SOFT_DELETE:
+        matches = f"SELECT m.rowid FROM ({matches}) m JOIN {table} t ON t.{rowid_col} = m.rowid{_live(table)}"
+    row = conn.execute(
+        f"SELECT COUNT(DISTINCT rowid) FROM ({matches})",
+        {'q': build_match_query(query), 'tq': trigram_q},
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def _fallback_where(kind):
+    columns = _FALLBACK_COLUMNS[kind]
+    return ' OR '.join(f"{col} LIKE :pattern" for col in columns)
+
+
+def search(query, kinds=tuple(SEARCH_KINDS), limit=50, offset=0):
+    """Ranked, prefix-matched search over clients, VINs and parts.
+
+    Args:
+        query: free text typed by the user
+        kinds: subset of 'clients', 'vins', 'parts'
+        limit/offset: page of results returned per kind
+
+    Returns:
+        dict of kind -> DataFrame with the matching source rows, best matches first
+    """
+    results = {kind: pd.DataFrame() for kind in kinds}
+    if not _tokens(query):
+        return results
+    try:
+        with get_db_connection_ctx() as conn:
+            use_fts = _has_fts(conn)
+            for kind in kinds:
+                if use_fts:
+                    results[kind] = _search_kind(conn, kind, query, limit, offset)
+                else:
+                    table = SEARCH_KINDS[kind][0]
+                    results[kind] = pd.read_sql_query(
+                        f"SELECT * FROM {table} t WHERE ({_fallback_where(kind)}){_live(table, 'AND')} "
+                        f"LIMIT :limit OFFSET :offset",
+                        conn, params={'pattern': f"%{query}%", 'limit': limit, 'offset': offset},
+                    )
+    except Exception as e:
+        print(f"Error during search: {e}")
+    return results
+
+
+def count_matches(query, kinds=tuple(SEARCH_KINDS)):
+    """Number of matching rows per kind for the same query semantics as search()."""
+    counts = {kind: 0 for kind in kinds}
+    if not _tokens(query):
+        return counts
+    try:
+        with get_db_connection_ctx() as conn:
+            use_fts = _has_fts(conn)
+            for kind in kinds:
+                if use_fts:
+                    counts[kind] = _count_kind(conn, kind, query)
+                else:
+                    table = SEARCH_KINDS[kind][0]
+                    counts[kind] = conn.execute(
+                        f"SELECT COUNT(*) FROM {table} t WHERE ({_fallback_where(kind)}){_live(table, 'AND')}",
+                        {'pattern': f"%{query}%"},
+                    ).fetchone()[0]
+    except Exception as e:
+        print(f"Error counting search matches: {e}")
+    return counts
@@ -0,0 +1,228 @@
+import json
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+
+import db_utils
+from services.pricing import IN_STOCK
+
+# Part numbers are compared across clients case- and whitespace-insensitively; the expression
+# matches the idx_parts_part_key_live index so incremental refreshes are index lookups
+PART_KEY = "UPPER(TRIM(p.part_number))"
+
+# Supplier rows of live parts that have a part number
+_OFFERS_QUERY = f"""
+    SELECT {PART_KEY} AS part_key, p.part_number, p.part_name, p.id AS part_id, p.client_phone,
+           s.id AS supplier_id, TRIM(COALESCE(s.supplier_name, '')) AS supplier_name,
+           s.buying_price, s.selling_price, s.delivery_time
+    FROM parts p JOIN part_suppliers s ON s.part_id = p.id
+    WHERE p.deleted_at IS NULL AND {PART_KEY} != ''
+"""
+
+UNNAMED_SUPPLIER = "(unnamed)"
+
+PART_COLUMNS = [
+    'part_number', 'part_name', 'clients', 'suppliers', 'offers', 'min_price', 'max_price', 'spread', 'spread_pct',
+    'avg_cost', 'margin_pct', 'cheapest_supplier', 'cheapest_margin_pct', 'fastest_supplier', 'fastest_days',
+]
+SUPPLIER_COLUMNS = [
+    'offers', 'clients', 'best_price', 'avg_price', 'avg_cost', 'margin_pct', 'delivery_days',
+    'price_rank', 'delivery_rank',
+]
+SCORECARD_COLUMNS = ['part_numbers', 'offers', 'cheapest', 'fastest', 'margin_pct', 'median_delivery_days']
+
+
+@dataclass(frozen=True)
+class SupplierAnalytics:
+    """Supplier price comparison across all clients, keyed by normalized part number.
+
+    by_part: one row per part number (index part_key) with the price range, average margin
+        and the cheapest / fastest supplier
+    by_supplier: one row per (part_key, supplier_name) with that supplier's prices, margin,
+        delivery and its price / delivery rank among the suppliers of the part number
+    scorecard: one row per supplier with how often it is the cheapest / fastest option
+    """
+    by_part: pd.DataFrame
+    by_supplier: pd.DataFrame
+    scorecard: pd.DataFrame
+
+
+def part_key(part_number) -> str:
+    """Normalized part number used to group offers across clients."""
+    return str(part_number or '').strip().upper()
+
+
+def _delivery_days(delivery):
+    """Delivery time text as days: 0 for 'IN STOCK', else the first number, else NaN."""
+    text = delivery.fillna('').astype(str).str.strip()
+    days = pd.to_numeric(text.str.extract(r'(\d+)', expand=False), errors='coerce')
+    return days.mask(text.str.upper().eq(IN_STOCK), 0.0)
+
+
+def _summarize(offers):
+    """(by_part, by_supplier) for the part numbers present in offers."""
+    buying = pd.to_numeric(offers['buying_price'], errors='coerce')
+    selling = pd.to_numeric(offers['selling_price'], errors='coerce')
+    offers = offers.assign(
+        supplier_name=offers['supplier_name'].fillna('').replace('', UNNAMED_SUPPLIER),
+        buying_price=buying,
+        selling_price=selling,
+        margin_pct=(selling - buying) / selling.where(selling > 0) * 100,
+        delivery_days=_delivery_days(offers['delivery_time']),
+    )
+
+    by_supplier = offers.groupby(['part_key', 'supplier_name']).agg(
+        offers=('supplier_id', 'size'),
+        clients=('client_phone', 'nunique'),
+        best_price=('selling_price', 'min'),
+        avg_price=('selling_price', 'mean'),
+        avg_cost=('buying_price', 'mean'),
+        margin_pct=('margin_pct', 'mean'),
+        delivery_days=('delivery_days', 'min'),
+    )
+    ranks = by_supplier.groupby(level='part_key')
+    by_supplier['price_rank'] = ranks['best_price'].rank(method='min')
+    by_supplier['delivery_rank'] = ranks['delivery_days'].rank(method='min')
+
+    by_part = offers.groupby('part_key').agg(
+        part_number=('part_number', 'first'),
+        part_name=('part_name', 'first'),
+        clients=('client_phone', 'nunique'),
+        suppliers=('supplier_name', 'nunique'),
+        offers=('supplier_id', 'size'),
+        min_price=('selling_price', 'min'),
+        max_price=('selling_price', 'max'),
+        avg_cost=('buying_price', 'mean'),
+        margin_pct=('margin_pct', 'mean'),
+    )
+    by_part['spread'] = by_part['max_price'] - by_part['min_price']
+    by_part['spread_pct'] = by_part['spread'] / by_part['min_price'].where(by_part['min_price'] > 0) * 100
+
+    # The single cheapest / fastest offer per part number; ties go to the faster / cheaper offer, then by name
+    cheapest = (
+        offers.sort_values(['part_key', 'selling_price', 'delivery_days', 'supplier_name'])
+        .drop_duplicates('part_key').set_index('part_key')
+    )
+    fastest = (
+        offers.sort_values(['part_key', 'delivery_days', 'selling_price', 'supplier_name'])
+        .drop_duplicates('part_key').set_index('part_key')
+    )
+    by_part['cheapest_supplier'] = cheapest['supplier_name']
+    by_part['cheapest_margin_pct'] = cheapest['margin_pct']
+    by_part['fastest_supplier'] = fastest['supplier_name']
+    by_part['fastest_days'] = fastest['delivery_days']
+    return by_part[PART_COLUMNS], by_supplier[SUPPLIER_COLUMNS]
+
+
+def _scorecard(by_supplier):
+    ranked = by_supplier.reset_index().assign(
+        cheapest=lambda df: df['price_rank'].eq(1), fastest=lambda df: df['delivery_rank'].eq(1),
+    )
+    scorecard = ranked.groupby('supplier_name').agg(
+        part_numbers=('part_key', 'nunique'),
+        offers=('offers', 'sum'),
+        cheapest=('cheapest', 'sum'),
+        fastest=('fastest', 'sum'),
+        margin_pct=('margin_pct', 'mean'),
+        median_delivery_days=('delivery_days', 'median'),
+    )
+    return scorecard[SCORECARD_COLUMNS].sort_values(['cheapest', 'part_numbers'], ascending=False)
+
+
+class SupplierAnalyticsCache:
+    """SupplierAnalytics kept current from the data_changes log.
+
+    A refresh reads the parts / part_suppliers changes newer than the last seen sequence
+    number, works out which part numbers they touch (before and after the change) and
+    recomputes only those groups. A NULL row_id (VACUUM, restore, migrations) or a pruned
+    log falls back to a full recompute. Results handed out are never mutated.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.last_seq = 0
+        self.offers = None
+        self.result = None
+        self._lock = threading.Lock()
+
+    def _read_offers(self, conn, keys=None):
+        query, params = _OFFERS_QUERY, []
+        if keys is not None:
+            query += f" AND {PART_KEY} IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(sorted(keys)))
+        return pd.read_sql_query(query, conn, params=params)
+
+    def _full_reload(self, conn):
+        self.offers = self._read_offers(conn)
+        by_part, by_supplier = _summarize(self.offers)
+        self.result = SupplierAnalytics(by_part, by_supplier, _scorecard(by_supplier))
+
+    def _changed_keys(self, conn, part_ids, supplier_ids):
+        """Part numbers the changed rows belonged to before (cached offers) and after (database)."""
+        offers = self.offers
+        keys = set(offers.loc[offers['part_id'].isin(part_ids) | offers['supplier_id'].isin(supplier_ids), 'part_key'])
+        rows = conn.execute(f"""
+            SELECT {PART_KEY} FROM parts p WHERE p.id IN (SELECT value FROM json_each(?))
+            UNION
+            SELECT {PART_KEY} FROM part_suppliers s JOIN parts p ON p.id = s.part_id
+            WHERE s.id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(sorted(part_ids)), json.dumps(sorted(supplier_ids)))).fetchall()
+        keys.update(key for (key,) in rows if key)
+        return keys
+
+    def _patch(self, conn, keys):
+        fresh = self._read_offers(conn, keys)
+        kept = self.offers[~self.offers['part_key'].isin(keys)]
+        self.offers = pd.concat([kept, fresh], ignore_index=True) if not kept.empty else fresh
+        by_part, by_supplier = self.result.by_part, self.result.by_supplier
+        by_part = by_part[~by_part.index.isin(keys)]
+        by_supplier = by_supplier[~by_supplier.index.get_level_values('part_key').isin(keys)]
+        if not fresh.empty:
+            fresh_part, fresh_supplier = _summarize(fresh)
+            by_part = pd.concat([by_part, fresh_part]).sort_index()
+            by_supplier = pd.concat([by_supplier, fresh_supplier]).sort_index()
+        self.result = SupplierAnalytics(by_part, by_supplier, _scorecard(by_supplier))
+
+    def refresh(self) -> SupplierAnalytics:
+        with self._lock, db_utils.get_db_connection_ctx() as conn:
+            min_seq, max_seq = conn.execute("SELECT MIN(seq), MAX(seq) FROM data_changes").fetchone()
+            max_seq = max_seq or 0
+            if self.result is None or (min_seq is not None and self.last_seq < min_seq - 1) or max_seq < self.last_seq:
+                self._full_reload(conn)
+            elif max_seq > self.last_seq:
+                rows = conn.execute(
+                    "SELECT table_name, row_id FROM data_changes WHERE seq > ? AND seq <= ? "
+                    "AND table_name IN ('parts', 'part_suppliers')",
+                    (self.last_seq, max_seq),
+                ).fetchall()
+                if any(row_id is None for _, row_id in rows):
+                    self._full_reload(conn)
+                elif rows:
+                    part_ids = {row_id for table, row_id in rows if table == 'parts'}
+                    supplier_ids = {row_id for table, row_id in rows if table == 'part_suppliers'}
+                    keys = self._changed_keys(conn, part_ids, supplier_ids)
+                    if keys:
+                        self._patch(conn, keys)
+            self.last_seq = max_seq
+            return self.result
+
+
+_caches: dict[str, SupplierAnalyticsCache] = {}
+
+
+def supplier_analytics() -> SupplierAnalytics:
+    """Up-to-date supplier analytics for the current database (shared; treat as read-only)."""
+    cache = _caches.get(db_utils.DB_NAME)
+    if cache is None:
+        cache = _caches.setdefault(db_utils.DB_NAME, SupplierAnalyticsCache(db_utils.DB_NAME))
+    return cache.refresh()
+
+
+def compare_part_prices(part_number) -> pd.DataFrame:
+    """Suppliers of one part number across all clients, cheapest first."""
+    by_supplier = supplier_analytics().by_supplier
+    key = part_key(part_number)
+    if key not in by_supplier.index.get_level_values('part_key'):
+        return pd.DataFrame(columns=['supplier_name'] + SUPPLIER_COLUMNS)
+    return by_supplier.xs(key, level='part_key').reset_index().sort_values(['price_rank', 'delivery_rank', 'supplier_name'])
@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import db_utils
+
+# Deleted VINs and parts stay restorable for this long before the purge removes them for good
+TRASH_RETAIN_DAYS = 30
+
+# Minimum seconds between two background purges started by maybe_purge_trash()
+PURGE_INTERVAL = 6 * 3600
+
+TRASH_COLUMNS = ['kind', 'key', 'label', 'vin_number', 'client_phone', 'deleted_at', 'deleted_by']
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='trash-purge')
+_state_lock = threading.Lock()
+_state = {'running': False, 'last_started': None, 'last_result': None}
+
+
+def list_trash(client_phone=None, limit=100) -> pd.DataFrame:
+    """Deleted VINs and parts, newest deletion first.
+
+    Parts deleted together with their VIN are not listed separately; restoring the VIN
+    restores them. kind is 'vin' or 'part' and key is the VIN number or the part id.
+    """
+    scope, params = "", []
+    if client_phone:
+        scope = " AND client_phone = ?"
+        params = [str(client_phone)]
+    query = f"""
+        SELECT 'vin' AS kind, COALESCE(vin_number, '') AS key,
+               COALESCE(vin_number, 'No VIN provided') || COALESCE(' - ' || NULLIF(model, ''), '') AS label,
+               vin_number, client_phone, deleted_at, deleted_by
+        FROM vins WHERE deleted_at IS NOT NULL{scope}
+        UNION ALL
+        SELECT 'part', CAST(id AS TEXT), COALESCE(part_name, '') || COALESCE(' (' || NULLIF(part_number, '') || ')', ''),
+               vin_number, client_phone, deleted_at, deleted_by
+        FROM parts p WHERE deleted_at IS NOT NULL{scope}
+            AND NOT EXISTS (SELECT 1 FROM vins v WHERE v.vin_number = p.vin_number AND v.deleted_at = p.deleted_at)
+        ORDER BY deleted_at DESC LIMIT ?
+    """
+    with db_utils.get_db_connection_ctx() as conn:
+        return pd.read_sql_query(query, conn, params=params * 2 + [int(limit)])
+
+
+def purge_trash(retain_days=TRASH_RETAIN_DAYS, username='system') -> dict:
+    """Permanently delete VINs and parts that have been in the trash for more than retain_days.
+
+    Suppliers go with their parts through ON DELETE CASCADE. Returns {'vins': n, 'parts': n}.
+    """
+    cutoff = (datetime.now() - timedelta(days=retain_days)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    with db_utils.get_db_connection_ctx() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            parts = conn.execute("DELETE FROM parts WHERE deleted_at < ?", (cutoff,)).rowcount
+            vins = conn.execute("DELETE FROM vins WHERE deleted_at < ?", (cutoff,)).rowcount
+            if parts or vins:
+                db_utils.log_activity(
+                    username, "purge_trash", f"Purged {vins} VINs and {parts} parts deleted before {cutoff[:10]}",
+                    conn=conn,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return {'vins': vins, 'parts': parts}
+
+
+def _run_purge(retain_days):
+    try:
+        result = purge_trash(retain_days)
+        with _state_lock:
+            _state['last_result'] = result
+        return result
+    except Exception as e:
+        print(f"Trash purge failed: {e}")
+        raise
+    finally:
+        with _state_lock:
+            _state['running'] = False
+
+
+def maybe_purge_trash(retain_days=TRASH_RETAIN_DAYS, interval=PURGE_INTERVAL):
+    """Start purge_trash on the background thread unless one ran within interval seconds.
+
+    Cheap enough to call on every page load; returns the Future, or None if nothing was started.
+    """
+    now = time.monotonic()
+    with _state_lock:
+        if _state['running'] or (_state['last_started'] is not None and now - _state['last_started'] < interval):
+            return None
+        _state.update(running=True, last_started=now)
+    return _executor.submit(_run_purge, retain_days)
@@ -0,0 +1,283 @@
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+import db_utils
+from security import normalize_vin, validate_vin
+from services.cache import invalidate, table_key, client_key
+
+# World Manufacturer Identifiers (VIN positions 1-3): "WMI|manufacturer|country", one per line.
+# Parsed into a dict on first use.
+_WMI_DATA = """
+19X|Honda|United States
+1C3|Chrysler|United States
+1C4|Chrysler (Jeep/Dodge MPV)|United States
+1C6|Ram|United States
+1D7|Dodge|United States
+1FA|Ford|United States
+1FD|Ford|United States
+1FM|Ford|United States
+1FT|Ford|United States
+1G1|Chevrolet|United States
+1G6|Cadillac|United States
+1GC|Chevrolet|United States
+1GT|GMC|United States
+1HG|Honda|United States
+1J4|Jeep|United States
+1N4|Nissan|United States
+1N6|Nissan|United States
+1VW|Volkswagen|United States
+1YV|Mazda|United States
+1ZV|Ford|United States
+2FA|Ford|Canada
+2G1|Chevrolet|Canada
+2HG|Honda|Canada
+2HK|Honda|Canada
+2T1|Toyota|Canada
+3FA|Ford|Mexico
+3G1|Chevrolet|Mexico
+3N1|Nissan|Mexico
+3VW|Volkswagen|Mexico
+4JG|Mercedes-Benz|United States
+4S3|Subaru|United States
+4S4|Subaru|United States
+4T1|Toyota|United States
+4T3|Toyota|United States
+5FN|Honda|United States
+5J6|Honda|United States
+5N1|Nissan|United States
+5NP|Hyundai|United States
+5UX|BMW|United States
+5XY|Kia/Hyundai|United States
+5YJ|Tesla|United States
+6G1|Holden|Australia
+9BW|Volkswagen|Brazil
+JA3|Mitsubishi|Japan
+JA4|Mitsubishi|Japan
+JF1|Subaru|Japan
+JF2|Subaru|Japan
+JH4|Acura|Japan
+JHM|Honda|Japan
+JM1|Mazda|Japan
+JN1|Nissan|Japan
+JN8|Nissan|Japan
+JS2|Suzuki|Japan
+JS3|Suzuki|Japan
+JT2|Toyota|Japan
+JTD|Toyota|Japan
+JTE|Toyota|Japan
+JTH|Lexus|Japan
+JTJ|Lexus|Japan
+JTM|Toyota|Japan
+JTN|Toyota|Japan
+KMH|Hyundai|South Korea
+KNA|Kia|South Korea
+KND|Kia|South Korea
+MA3|Maruti Suzuki|India
+MAL|Hyundai|India
+NM0|Ford|Turkey
+SAJ|Jaguar|United Kingdom
+SAL|Land Rover|United Kingdom
+SB1|Toyota|United Kingdom
+SCC|Lotus|United Kingdom
+SCF|Aston Martin|United Kingdom
+SJN|Nissan|United Kingdom
+TMB|Skoda|Czech Republic
+TRU|Audi|Hungary
+VF1|Renault|France
+VF3|Peugeot|France
+VF7|Citroen|France
+VNK|Toyota|France
+VSK|Nissan|Spain
+VSS|SEAT|Spain
+W0L|Opel|Germany
+WA1|Audi|Germany
+WAU|Audi|Germany
+WBA|BMW|Germany
+WBS|BMW M|Germany
+WDB|Mercedes-Benz|Germany
+WDC|Mercedes-Benz|Germany
+WDD|Mercedes-Benz|Germany
+WF0|Ford|Germany
+WMW|MINI|Germany
+WP0|Porsche|Germany
+WP1|Porsche|Germany
+WV1|Volkswagen Commercial|Germany
+WV2|Volkswagen Commercial|Germany
+WVW|Volkswagen|Germany
+YS3|Saab|Sweden
+YV1|Volvo|Sweden
+ZAR|Alfa Romeo|Italy
+ZFA|Fiat|Italy
+ZFF|Ferrari|Italy
+ZHW|Lamborghini|Italy
+"""
+
+# Vehicle descriptor prefixes (positions 1-5) for common lines: "prefix|model"
+_VDS_DATA = """
+1HGCM|Accord
+1HGCP|Accord
+1HGCV|Accord
+2HGFA|Civic
+19XFB|Civic
+5YJ3E|Model 3
+5YJSA|Model S
+5YJXC|Model X
+5YJYG|Model Y
+1FTFW|F-150
+JTDKN|Prius
+"""
+
+# Region by the first VIN character
+_REGIONS = (
+    ('ABCDEFGH', 'Africa'),
+    ('JKLMNPR', 'Asia'),
+    ('STUVWXYZ', 'Europe'),
+    ('12345', 'North America'),
+    ('67', 'Oceania'),
+    ('89', 'South America'),
+)
+
+# Model-year characters (position 10) in order from 1980; the cycle repeats every 30 years
+YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+
+# Check digit (position 9) transliteration and position weights
+_TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'H': 8,
+    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'P': 7, 'R': 9,
+    'S': 2, 'T': 3, 'U': 4, 'V': 5, 'W': 6, 'X': 7, 'Y': 8, 'Z': 9,
+}
+_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Decoded VINs kept in the memo
+DECODE_CACHE_SIZE = 8192
+
+
+@dataclass(frozen=True)
+class VinInfo:
+    """Everything decodable from a VIN without a network lookup."""
+    vin: str
+    valid: bool
+    manufacturer: str | None = None
+    model: str | None = None
+    country: str | None = None
+    region: str | None = None
+    model_year: int | None = None
+    check_digit_valid: bool | None = None
+
+    def prefill(self) -> dict:
+        """Values for the vins form fields that the decoder can supply."""
+        fields = {}
+        if self.manufacturer:
+            fields['model'] = f"{self.manufacturer} {self.model}" if self.model else self.manufacturer
+        if self.model_year:
+            fields['prod_yr'] = str(self.model_year)
+        return fields
+
+
+def _parse_table(data):
+    return {line.split('|')[0]: line.split('|')[1:] for line in data.strip().splitlines()}
+
+
+@lru_cache(maxsize=None)
+def _wmi_index():
+    return _parse_table(_WMI_DATA)
+
+
+@lru_cache(maxsize=None)
+def _vds_index():
+    return {prefix: values[0] for prefix, values in _parse_table(_VDS_DATA).items()}
+
+
+def _region(first_char):
+    for chars, region in _REGIONS:
+        if first_char in chars:
+            return region
+    return None
+
+
+def check_digit(vin):
+    """Expected position-9 check digit of a 17-character VIN ('0'-'9' or 'X')."""
+    total = sum(_TRANSLITERATION.get(ch, 0) * weight for ch, weight in zip(vin, _WEIGHTS))
+    remainder = total % 11
+    return 'X' if remainder == 10 else str(remainder)
+
+
+def model_year(vin, current_year=None):
+    """Model year from position 10, resolving the 30-year cycle.
+
+    North American VINs mark 2010+ vehicles with a letter in position 7; elsewhere the
+    latest year that is not more than one year in the future is used.
+    """
+    index = YEAR_CODES.find(vin[9])
+    if index < 0:
+        return None
+    current_year = current_year or datetime.now().year
+    early, late = 1980 + index, 2010 + index
+    if vin[0] in '12345':
+        return late if vin[6].isalpha() and late <= current_year + 1 else early
+    return late if late <= current_year + 1 else early
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def decode_vin(vin) -> VinInfo:
+    """Decode a VIN offline; short (7/13 character) chassis numbers only get validated."""
+    clean = normalize_vin(vin or '')
+    if not clean or not validate_vin(clean):
+        return VinInfo(vin=clean, valid=False)
+    if len(clean) != 17:
+        return VinInfo(vin=clean, valid=True)
+
+    manufacturer, country = _wmi_index().get(clean[:3], (None, None))
+    return VinInfo(
+        vin=clean,
+        valid=True,
+        manufacturer=manufacturer,
+        model=_vds_index().get(clean[:5]),
+        country=country,
+        region=_region(clean[0]),
+        model_year=model_year(clean),
+        # The check digit is only mandatory for North American VINs
+        check_digit_valid=clean[8] == check_digit(clean) if clean[0] in '12345' else None,
+    )
+
+
+def decode_vins(vins) -> pd.DataFrame:
+    """Decode many VINs; one row per input with the VinInfo fields as columns."""
+    return pd.DataFrame([decode_vin(str(v)).__dict__ for v in vins])
+
+
+def fill_vin_details(username, overwrite=False) -> int:
+    """Fill blank model / prod_yr columns of the vins table from decoded VINs.
+
+    Returns:
+        number of VIN rows updated
+    """
+    with db_utils.get_db_connection_ctx() as conn:
+        rows = conn.execute(
+            "SELECT vin_number, client_phone, model, prod_yr FROM vins WHERE LENGTH(vin_number) = 17 AND deleted_at IS NULL"
+            + ("" if overwrite else " AND (COALESCE(TRIM(model), '') = '' OR COALESCE(TRIM(prod_yr), '') = '')")
+        ).fetchall()
+        updates, phones = [], set()
+        for vin_number, phone, model, prod_yr in rows:
+            fields = decode_vin(vin_number).prefill()
+            keep_model = (model or '').strip() and not overwrite
+            keep_year = (prod_yr or '').strip() and not overwrite
+            new_model = model if keep_model else fields.get('model', model)
+            new_year = prod_yr if keep_year else fields.get('prod_yr', prod_yr)
+            if (new_model, new_year) != (model, prod_yr):
+                updates.append((new_model, new_year, username, vin_number))
+                phones.add(phone)
+        if updates:
+            conn.executemany(
+                "UPDATE vins SET model = ?, prod_yr = ?, last_updated_by = ? WHERE vin_number = ?",
+                updates,
+            )
+            db_utils.log_activity(username, "fill_vin_details", f"Filled details for {len(updates)} VINs from decoding", "vins", conn=conn)
+            conn.commit()
+    if updates:
+        invalidate(table_key('vins'), *(client_key(p) for p in phones if p))
+    return len(updates)
@@ -1,8 +1,40 @@
 import unittest
 import sqlite3
 import os
-from db_utils import get_db_connection_ctx, create_tables
-from logic import add_new_client, add_part_without_vin, delete_client
+import io
+import csv
+import zipfile
+import tempfile
+import re
+import zlib
+from unittest import mock
+from contextlib import redirect_stdout
+import pandas as pd
+import db_utils
+from db_utils import (
+    get_db_connection_ctx, create_tables, migrate_schema, load_data, close_pools, explain_hot_queries,
+    export_filtered_data, log_activity, get_activity_logs,
+    flush_activity_log,
+)
+from logic import (
+    add_new_client, add_part_without_vin, delete_client, get_clients_page_after, get_client_summaries, find_clients_by_prefix,
+    load_quote, get_quote_data, add_vin_to_client, get_vins_for_client,
+    load_client_aggregate, add_part_to_vin, add_parts_bulk, update_supplier,
+    delete_vin, delete_part, undelete_vin, undelete_part, update_client_and_vins, update_vin, UnitOfWork,
+)
+from services.search import search, count_matches
+from services.activity_archive import archive_activity_log, query_activity, list_archives
+from services.cache import registry
+from security import validate_phone, validate_vin, validate_numeric, validate_phone_series, validate_vin_series, validate_numeric_series
+from services.importer import import_file
+from services.vin_decoder import decode_vin, fill_vin_details
+from services.pdf import generate_pdf, generate_pdf_batch, pdf_bytes, BATCH_POOL_THRESHOLD
+from services.pricing import price_quote, render_quote_pdf, batch_documents, format_text_quote
+from services.documents import issue_document, find_documents, get_document_pdf, set_document_status
+from services.backup import create_backup, verify_backup, restore_backup, list_backups
+from services.trash import list_trash, purge_trash
+from services.supplier_analytics import SupplierAnalyticsCache, compare_part_prices, supplier_analytics
+from migrate_db import migrate_database
 
 # Use a test database
 TEST_DB_NAME = 'test_brent_j_marketing.db'
@@ -19,14 +51,19 @@ class TestDBLogic(unittest.TestCase):
         auth.DB_NAME = TEST_DB_NAME
         
         # Create fresh database
-        if os.path.exists(TEST_DB_NAME):
-            os.remove(TEST_DB_NAME)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(TEST_DB_NAME + suffix):
+                os.remove(TEST_DB_NAME + suffix)
         create_tables()
+        migrate_schema()
 
     @classmethod
     def tearDownClass(cls):
-        if os.path.exists(TEST_DB_NAME):
-            os.remove(TEST_DB_NAME)
+        flush_activity_log()
+        close_pools()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(TEST_DB_NAME + suffix):
+                os.remove(TEST_DB_NAME + suffix)
 
     def test_connection_context_manager(self):
         """Test that the context manager yields a connection and closes it."""
@@ -38,6 +75,17 @@ class TestDBLogic(unittest.TestCase):
         # Connection should be closed (though sqlite3 objects don't explicitly show 'closed' property easily, 
         # we can try to use it and expect failure if we had a handle, but here we just ensure it runs without error)
 
+    def test_pooled_connection_reuse(self):
+        """Test that pooled connections are reused, use WAL and drop uncommitted work on release."""
+        with get_db_connection_ctx() as conn:
+            first = conn
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            conn.execute("INSERT INTO clients (phone, client_name) VALUES ('5559990000', 'Uncommitted')")
+        with get_db_connection_ctx() as conn:
+            self.assertIs(conn, first)
+            row = conn.execute("SELECT 1 FROM clients WHERE phone = '5559990000'").fetchone()
+            self.assertIsNone(row)
+
     def test_add_client(self):
         """Test adding a client using the refactored logic."""
         phone = "1234567890"
@@ -78,5 +126,724 @@ class TestDBLogic(unittest.TestCase):
         self.assertIsNotNone(part_id)
         self.assertIsInstance(part_id, int)
 
+    def test_client_keyset_pagination(self):
+        """Test that walking keyset pages visits every client once and prefix lookup matches."""
+        for i in range(5):
+            add_new_client(f"777000{i}", f"Page Client {i}", "tester")
+        seen = []
+        cursor = None
+        while True:
+            rows, cursor = get_clients_page_after(cursor, page_size=2)
+            seen.extend(row[0] for row in rows)
+            if cursor is None:
+                break
+        with get_db_connection_ctx() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+        self.assertEqual(len(seen), total)
+        self.assertEqual(len(set(seen)), total)
+
+        phones = [phone for phone, _ in find_clients_by_prefix("777000")]
+        self.assertEqual(sorted(phones), [f"777000{i}" for i in range(5)])
+        names = [name for _, name in find_clients_by_prefix("page client 3")]
+        self.assertEqual(names, ["Page Client 3"])
+
+    def test_full_text_search(self):
+        """Test prefix and substring matching through the FTS5 indexes, and trigger upkeep."""
+        phone = "5552223333"
+        add_new_client(phone, "Searchable Garage", "tester")
+        part_id = add_part_without_vin("Wishbone Bushing", "31126775960", 2, "rear axle", phone, [], "tester")
+
+        self.assertEqual(count_matches("searcha")['clients'], 1)
+        parts = search("bush", kinds=('parts',))['parts']
+        self.assertEqual(parts['id'].tolist(), [part_id])
+        # Trigram index matches inside part numbers
+        self.assertEqual(search("677596", kinds=('parts',))['parts']['id'].tolist(), [part_id])
+
+        delete_client(phone, "tester")
+        self.assertEqual(count_matches("wishbone")['parts'], 0)
+
+    def test_load_quote_batch(self):
+        """Test that the batch quote loader keeps selection order and groups suppliers per part."""
+        phone = "5554445555"
+        add_new_client(phone, "Quote Client", "tester")
+        sup = [{'name': 'A', 'buying_price': 5, 'selling_price': 9, 'delivery_time': '2'},
+               {'name': 'B', 'buying_price': 6, 'selling_price': 8, 'delivery_time': '4'}]
+        first = add_part_without_vin("Pump", "P1", 1, "", phone, sup, "tester")
+        second = add_part_without_vin("Hose", "H1", 3, "", phone, sup[:1], "tester")
+
+        quote = load_quote(phone, None, [second, first, 999999])
+        self.assertEqual(quote.part_ids, [second, first])
+        self.assertEqual([len(line.suppliers) for line in quote.lines], [1, 2])
+        self.assertEqual(quote.client['client_name'], "Quote Client")
+
+        legacy = get_quote_data(phone, None, [first])
+        self.assertEqual(legacy['client'][0], phone)
+        self.assertEqual(len(legacy['parts'][0]['suppliers']), 2)
+        self.assertIsNone(load_quote("0000000", None, [first]))
+
+    def test_export_filtered_csv(self):
+        """Test that export filters are applied per table, including suppliers of filtered parts."""
+        phone = "5556667777"
+        add_new_client(phone, "Export Client", "tester")
+        sup = [{'name': 'ExportSup', 'buying_price': 1, 'selling_price': 2, 'delivery_time': '1'}]
+        part_id = add_part_without_vin("Export Part", "EP1", 1, "", phone, sup, "tester")
+
+        data, mime = export_filtered_data({'client_phone': phone}, 'csv')
+        self.assertEqual(mime, 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            tables = {
+                name[:-4]: list(csv.DictReader(io.TextIOWrapper(zf.open(name), encoding='utf-8')))
+                for name in zf.namelist()
+            }
+        self.assertEqual([r['phone'] for r in tables['clients']], [phone])
+        self.assertEqual([int(r['id']) for r in tables['parts']], [part_id])
+        self.assertEqual([r['supplier_name'] for r in tables['part_suppliers']], ['ExportSup'])
+
+    def test_export_matches_tables(self):
+        """Test unfiltered and filtered exports have the tables' own columns and their live row counts."""
+        phone = "5556667778"
+        add_new_client(phone, "Export Count Client", "tester")
+        sup = [{'name': 'CountSup', 'buying_price': 1, 'selling_price': 2, 'delivery_time': '1'}]
+        kept = add_part_without_vin("Kept Part", "EC1", 1, "", phone, sup, "tester")
+        trashed = add_part_without_vin("Trashed Part", "EC2", 1, "", phone, sup, "tester")
+        delete_part(trashed, "tester")
+
+        def exported(filters):
+            data, _ = export_filtered_data(filters, 'csv')
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                return {
+                    name[:-4]: list(csv.reader(io.TextIOWrapper(zf.open(name), encoding='utf-8')))
+                    for name in zf.namelist()
+                }
+
+        live = {
+            'clients': ("SELECT COUNT(*) FROM clients", "SELECT COUNT(*) FROM clients WHERE phone = ?"),
+            'vins': ("SELECT COUNT(*) FROM vins WHERE deleted_at IS NULL",
+                     "SELECT COUNT(*) FROM vins WHERE deleted_at IS NULL AND client_phone = ?"),
+            'parts': ("SELECT COUNT(*) FROM parts WHERE deleted_at IS NULL",
+                      "SELECT COUNT(*) FROM parts WHERE deleted_at IS NULL AND client_phone = ?"),
+            'part_suppliers': (
+                "SELECT COUNT(*) FROM part_suppliers s JOIN parts p ON p.id = s.part_id WHERE p.deleted_at IS NULL",
+                "SELECT COUNT(*) FROM part_suppliers s JOIN parts p ON p.id = s.part_id "
+                "WHERE p.deleted_at IS NULL AND p.client_phone = ?",
+            ),
+        }
+        try:
+            unfiltered, filtered = exported({}), exported({'client_phone': phone})
+            with get_db_connection_ctx() as conn:
+                for table, (all_rows, client_rows) in live.items():
+                    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                    self.assertEqual(unfiltered[table][0], columns)
+                    self.assertEqual(filtered[table][0], columns)
+                    self.assertEqual(len(unfiltered[table]) - 1, conn.execute(all_rows).fetchone()[0])
+                    self.assertEqual(len(filtered[table]) - 1, conn.execute(client_rows, (phone,)).fetchone()[0])
+            part_ids = {row[1] for row in filtered['part_suppliers'][1:]}
+            self.assertEqual(part_ids, {str(kept)})
+            self.assertNotIn(str(trashed), {row[1] for row in unfiltered['part_suppliers'][1:]})
+        finally:
+            undelete_part(trashed, "tester")
+
+    def test_backup_verify_restore(self):
+        """Test an online backup round trip: catalog entry, checksum verification and restore."""
+        with tempfile.TemporaryDirectory() as backup_dir:
+            entry = create_backup(backup_dir=backup_dir)
+            self.assertEqual(list_backups(backup_dir)[0]['file'], entry['file'])
+            self.assertEqual(verify_backup(entry['file'], backup_dir), (True, "Backup verified"))
+
+            add_new_client("5558889999", "Added After Backup", "tester")
+            ok, _ = restore_backup(entry['file'], backup_dir)
+            self.assertTrue(ok)
+            df_clients = load_data()[0]
+            self.assertNotIn("5558889999", df_clients['phone'].astype(str).tolist())
+
+    def test_hot_queries_use_indexes(self):
+        """Test that the index migration covers every hot query."""
+        plans = explain_hot_queries()
+        self.assertFalse(plans.empty)
+        self.assertTrue(plans['uses_index'].all(), plans[~plans['uses_index']].to_string())
+
+    def test_load_data_incremental(self):
+        """Test that load_data picks up inserts and cascaded deletes from the change log."""
+        phone = "5550001111"
+        user = "tester"
+        load_data()
+
+        add_new_client(phone, "Cache Client", user)
+        part_id = add_part_without_vin("Cache Part", "CP1", 1, "", phone, [], user)
+        df_clients, _, df_parts, _ = load_data()
+        self.assertIn(phone, df_clients['phone'].astype(str).tolist())
+        self.assertIn(part_id, df_parts['id'].tolist())
+
+        delete_client(phone, user)
+        df_clients, _, df_parts, _ = load_data()
+        self.assertNotIn(phone, df_clients['phone'].astype(str).tolist())
+        self.assertNotIn(part_id, df_parts['id'].tolist())
+
+    def test_activity_log_batching(self):
+        """Test queued log rows are visible after a flush and in-transaction rows roll back."""
+        for i in range(3):
+            log_activity("batcher", "batch_test", f"queued {i}")
+        logs = get_activity_logs("batcher")
+        self.assertEqual(len(logs[logs['action'] == 'batch_test']), 3)
+
+        with get_db_connection_ctx() as conn:
+            log_activity("batcher", "rolled_back", "never committed", conn=conn)
+            conn.rollback()
+        logs = get_activity_logs("batcher")
+        self.assertEqual(len(logs[logs['action'] == 'rolled_back']), 0)
+
+    def test_activity_log_archive(self):
+        """Test old log rows move into monthly partitions and stay queryable with cursors."""
+        with get_db_connection_ctx() as conn:
+            conn.executemany(
+                "INSERT INTO activity_log (timestamp, username, action, details, table_name) VALUES (?, ?, ?, ?, ?)",
+                [(f"2020-0{m}-15 10:00:0{i}", "archivist", "archive_test", f"old {m}-{i}", "parts")
+                 for m in (1, 2) for i in range(3)],
+            )
+            conn.commit()
+
+        archived = archive_activity_log(older_than_days=30)
+        self.assertEqual(archived, {'2020-01': 3, '2020-02': 3})
+        self.assertEqual(len(list_archives()), 2)
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = query_activity(username="archivist", action="archive_test", cursor=cursor, page_size=4)
+            seen.extend(page['details'].tolist())
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(seen[0], "old 2-2")
+        self.assertEqual(seen[-1], "old 1-0")
+
+        page, _ = query_activity(start="2020-02-01", end="2020-02-28", username="archivist")
+        self.assertEqual(len(page), 3)
+
+    def test_scoped_cache_invalidation(self):
+        """Test a mutation evicts only the cached reads of the client it touched."""
+        add_new_client("5552220001", "Scoped A", "tester")
+        add_new_client("5552220002", "Scoped B", "tester")
+        self.assertEqual(get_vins_for_client("5552220001"), [])
+        self.assertEqual(get_vins_for_client("5552220002"), [])
+
+        hits = registry.stats['hits']
+        add_vin_to_client("5552220001", "1HGCM82633A004352", "Accord", "2003", "", "", "", "", "tester")
+        self.assertEqual(len(get_vins_for_client("5552220001")), 1)
+        self.assertEqual(get_vins_for_client("5552220002"), [])
+        self.assertEqual(registry.stats['hits'], hits + 1)
+
+    def test_client_aggregate(self):
+        """Test the client aggregate groups parts by VIN and refreshes after a mutation."""
+        phone = "5553330001"
+        vin = "2HGCM82633A004352"
+        add_new_client(phone, "Aggregate Client", "tester")
+        add_vin_to_client(phone, vin, "Civic", "2010", "", "", "", "", "tester")
+        part_id = add_part_to_vin(vin, phone, "Filter", "F1", 1, "", [
+            {'name': 'S1', 'buying_price': 1, 'selling_price': 2, 'delivery_time': '1d'},
+        ], "tester")
+        add_part_without_vin("Loose", "L1", 1, "", phone, [], "tester")
+
+        aggregate = load_client_aggregate(phone)
+        self.assertEqual(aggregate.vin_numbers, [vin])
+        self.assertEqual(aggregate.parts_for_vin(vin)['id'].tolist(), [part_id])
+        self.assertEqual(aggregate.unassigned_parts['part_name'].tolist(), ["Loose"])
+        self.assertEqual([s['supplier_name'] for s in aggregate.suppliers_for_part(part_id)], ['S1'])
+        self.assertIs(load_client_aggregate(phone), aggregate)
+
+        add_part_without_vin("Loose 2", "L2", 1, "", phone, [], "tester")
+        self.assertEqual(len(load_client_aggregate(phone).unassigned_parts), 2)
+
+    def test_add_parts_bulk(self):
+        """Test a bulk insert resolves the VIN owner, inserts valid rows and reports rejects."""
+        phone = "5554440001"
+        vin = "3HGCM82633A004352"
+        add_new_client(phone, "Bulk Client", "tester")
+        add_vin_to_client(phone, vin, "Fit", "2012", "", "", "", "", "tester")
+        parts = [
+            {'name': 'Pad', 'number': 'P1', 'quantity': 2, 'notes': '',
+             'suppliers': [{'name': 'S1', 'buying_price': 5, 'selling_price': 8, 'delivery_time': '2d'}]},
+            {'name': '', 'number': '', 'quantity': 1, 'notes': ''},
+            {'name': 'Disc', 'number': 'D1', 'quantity': "3.0", 'notes': ' front '},
+            {'name': 'Hub', 'number': 'H1', 'quantity': "2.5", 'notes': ''},
+        ]
+        ids, errors = add_parts_bulk(parts, "tester", vin_number=vin)
+        self.assertEqual(len(ids), 2)
+        self.assertEqual([idx for idx, _ in errors], [1, 3])
+        disc = load_client_aggregate(phone).parts_for_vin(vin).iloc[1]
+        self.assertEqual((disc['quantity'], disc['notes']), (3, "front"))
+
+        aggregate = load_client_aggregate(phone)
+        self.assertEqual(aggregate.parts_for_vin(vin)['id'].tolist(), ids)
+        self.assertEqual(len(aggregate.suppliers_for_part(ids[0])), 1)
+
+        with self.assertRaises(ValueError):
+            add_parts_bulk(parts[:1], "tester", vin_number="NOSUCHVIN")
+
+    def test_import_pipeline(self):
+        """Test CSV imports upsert in chunks, resolve foreign keys and report rejects; dry runs save nothing."""
+        clients_csv = b"Phone,Client Name\n5556660001,Import One\nbad,Broken\n5556660002,Import Two\n"
+        vins_csv = b"vin_number,client_phone,model\n4HGCM82633A004352,5556660001,Jazz\n5HGCM82633A004352,5559999999,Ghost\n"
+        parts_csv = b"vin_number,part_name,part_number,quantity\n4HGCM82633A004352,Hose,IMP-H1,2\n,Orphan,,0\n"
+        suppliers_csv = b"part_number,supplier_name,buying_price,selling_price\nIMP-H1,ImportSup,3,5\nIMP-NONE,ImportSup,3,5\n"
+
+        dry = import_file(io.BytesIO(clients_csv), "clients.csv", "clients", "tester", dry_run=True)
+        self.assertEqual((dry['inserted'], len(dry['rejected'])), (2, 1))
+        self.assertIsNone(load_client_aggregate("5556660001").client)
+
+        result = import_file(io.BytesIO(clients_csv), "clients.csv", "clients", "tester", chunk_rows=2)
+        self.assertEqual(result['inserted'], 2)
+        self.assertEqual(result['rejected']['row'].tolist(), [3])
+
+        result = import_file(io.BytesIO(vins_csv), "vins.csv", "vins", "tester")
+        self.assertEqual(result['inserted'], 1)
+        self.assertEqual(result['rejected']['reason'].tolist(), ["Unknown client phone"])
+
+        result = import_file(io.BytesIO(parts_csv), "parts.csv", "parts", "tester")
+        self.assertEqual((result['inserted'], len(result['rejected'])), (1, 1))
+
+        result = import_file(io.BytesIO(suppliers_csv), "suppliers.csv", "part_suppliers", "tester")
+        self.assertEqual((result['inserted'], result['rejected']['row'].tolist()), (1, [3]))
+        result = import_file(io.BytesIO(suppliers_csv), "suppliers.csv", "part_suppliers", "tester")
+        self.assertEqual(result['updated'], 1)
+
+        aggregate = load_client_aggregate("5556660001")
+        part_id = aggregate.parts_for_vin("4HGCM82633A004352")['id'].iloc[0]
+        self.assertEqual(len(aggregate.suppliers_for_part(part_id)), 1)
+
+        # A trashed VIN is re-imported only for its own client, together with its parts
+        delete_vin("4HGCM82633A004352", "tester", "5556660001")
+        result = import_file(io.BytesIO(b"vin_number,client_phone\n4HGCM82633A004352,5556660002\n"), "vins.csv", "vins", "tester")
+        self.assertEqual(result['rejected']['reason'].tolist(), ["VIN is in another client's trash"])
+        result = import_file(io.BytesIO(vins_csv), "vins.csv", "vins", "tester")
+        self.assertEqual((result['inserted'], result['updated']), (0, 1))
+        self.assertEqual(load_client_aggregate("5556660001").parts_for_vin("4HGCM82633A004352")['id'].tolist(), [part_id])
+        self.assertNotIn("4HGCM82633A004352", list_trash("5556660001")['vin_number'].tolist())
+
+    def test_vectorized_validators_match_scalar(self):
+        """Test the column-wise validators agree with the scalar ones."""
+        phones = ['8681112222', 'abc', None, '', 8681112222, '+1 (555) 123-4567']
+        vins = ['1HGCM82633A004352', '1hg cm82633a004352', 'No VIN provided', '', None, 'IOQ1234', 'ABCD']
+        numbers = ['1', '0', 'x', '', None, 2.5, '1e3']
+        self.assertEqual(validate_phone_series(phones).tolist(), [validate_phone(v) for v in phones])
+        self.assertEqual(validate_vin_series(vins).tolist(), [validate_vin(v) for v in vins])
+        self.assertEqual(
+            validate_numeric_series(numbers, min_val=1).tolist(),
+            [validate_numeric(v, min_val=1) for v in numbers],
+        )
+
+    def test_vin_decoder(self):
+        """Test offline VIN decoding and filling blank VIN details from it."""
+        info = decode_vin("1hgcm82633a004352")
+        self.assertEqual((info.manufacturer, info.model, info.model_year), ("Honda", "Accord", 2003))
+        self.assertTrue(info.check_digit_valid)
+        self.assertFalse(decode_vin("1HGCM82643A004352").check_digit_valid)
+        self.assertEqual(decode_vin("5YJ3E1EA7KF000001").model_year, 2019)
+        self.assertFalse(decode_vin("IOQ1234").valid)
+
+        add_new_client("5557770001", "Decoder Client", "tester")
+        add_vin_to_client("5557770001", "1HGCP2F33CA000001", "", "", "", "", "", "", "tester")
+        # The memoized aggregate is loaded first so the fill has a cached model to evict
+        before = load_client_aggregate("5557770001")
+        self.assertIs(load_client_aggregate("5557770001"), before)
+        self.assertEqual(before.vins[['model', 'prod_yr']].iloc[0].tolist(), ["", ""])
+        self.assertEqual(fill_vin_details("tester"), 1)
+        after = load_client_aggregate("5557770001")
+        self.assertIsNot(after, before)
+        self.assertEqual(after.vins[['model', 'prod_yr']].iloc[0].tolist(), ["Honda Accord", "2012"])
+        self.assertEqual(fill_vin_details("tester"), 0)
+
+    def test_pdf_batch(self):
+        """Test batch PDF generation streams every document into the ZIP, in-process and across a pool."""
+        document = dict(
+            client_info={'name': 'Batch Client', 'phone': '5551110000'},
+            parts_data=[{'name': 'Filter', 'quantity': 2, 'price': 4.5}],
+            total_quote_amount=9.0, manual_deposit=0, delivery_time="IN STOCK",
+            document_number="INV-1", document_type='invoice',
+        )
+        self.assertTrue(generate_pdf(**document).startswith("%PDF"))
+        for count, workers in ((2, None), (BATCH_POOL_THRESHOLD, 2)):
+            archive = zipfile.ZipFile(io.BytesIO(generate_pdf_batch(
+                [dict(document, filename="invoice.pdf") for _ in range(count)], max_workers=workers,
+            )))
+            names = archive.namelist()
+            self.assertEqual(len(names), count)
+            self.assertEqual(names[:2], ["invoice.pdf", "invoice_2.pdf"])
+            self.assertTrue(archive.read(names[-1]).startswith(b"%PDF"))
+
+        phone = "5551110002"
+        add_new_client(phone, "Batch Run Client", "tester")
+        add_part_without_vin("Belt", "B7", 3, "", phone, [
+            {'name': 'S', 'buying_price': 1, 'selling_price': 4, 'delivery_time': '2'},
+        ], "tester")
+        entries = len(registry._entries)
+        run = {d['filename']: d for d in batch_documents('invoice')}
+        self.assertEqual(len(registry._entries), entries)
+        self.assertEqual(run[f"invoice_{phone}.pdf"]['total_quote_amount'], 12.0)
+
+    def test_pdf_template_stamping(self):
+        """Test the cached header and terms are stamped into the page stream around the variable parts."""
+        data = pdf_bytes(generate_pdf(
+            {'name': 'Stamp Client', 'phone': '5551110001'}, [{'name': 'Gasket', 'quantity': 1, 'price': 3.0}],
+            3.0, 0, delivery_time="2", document_number="Q-77",
+        ))
+        streams = [zlib.decompress(s) for s in re.findall(rb'stream\r?\n(.*?)\r?\nendstream', data, re.S)]
+        page = next(s for s in streams if b'(QUOTATION) Tj' in s).decode('latin-1')
+        blocks = re.findall(r'q 1 0 0 1 0 -?[\d.]+ cm\n(.*?)\nQ', page, re.S)
+        self.assertEqual(len(blocks), 2)
+        self.assertIn('(Brent J. Marketing) Tj', blocks[0])
+        self.assertIn('(TERMS OF SALE:) Tj', blocks[1])
+        order = [page.index(text) for text in
+                 ('(Brent J. Marketing)', '(QUOTATION)', '(Quotation Number: Q-77)', '(Gasket)', '(TERMS OF SALE:)')]
+        self.assertEqual(order, sorted(order))
+        self.assertIn(b'/F1 ', data)
+        self.assertRegex(data, rb'/BaseFont /Helvetica-Bold')
+
+    def test_price_quote(self):
+        """Test quote pricing uses the chosen (or cheapest) supplier and is refreshed after supplier edits."""
+        phone = "5558880001"
+        add_new_client(phone, "Pricing Client", "tester")
+        cheap = add_part_without_vin("Pump", "P1", 2, "", phone, [
+            {'name': 'Dear', 'buying_price': 5, 'selling_price': 20, 'delivery_time': '10'},
+            {'name': 'Cheap', 'buying_price': 5, 'selling_price': 12.5, 'delivery_time': 'IN STOCK'},
+        ], "tester")
+        bare = add_part_without_vin("Clip", "C1", 3, "", phone, [], "tester")
+
+        priced = price_quote(phone, None, (cheap, bare))
+        self.assertEqual(priced.lines['supplier_name'].tolist()[0], 'Cheap')
+        self.assertEqual((priced.total, priced.deposit, priced.balance), (25.0, 20.0, 5.0))
+        self.assertEqual(priced.unpriced_part_ids, [bare])
+        self.assertIs(price_quote(phone, None, (cheap, bare)), priced)
+
+        dear_id = load_client_aggregate(phone).suppliers_for_part(cheap)[0]['id']
+        chosen = price_quote(phone, None, (cheap,), ((cheap, dear_id),))
+        self.assertEqual((chosen.total, chosen.delivery_time), (40.0, "10"))
+        update_supplier(dear_id, 'Dear', 5, 15, '10', "tester")
+        self.assertEqual(price_quote(phone, None, (cheap,), ((cheap, dear_id),)).total, 30.0)
+
+        self.assertIn("Pump #P1 [Used] x2 @ $12.50", format_text_quote(priced, {cheap: 'Used'}))
+        # Rendering reuses the memoized price but caches no PDF of its own
+        price_quote(phone, None, (cheap,), ())
+        entries = len(registry._entries)
+        self.assertTrue(render_quote_pdf(phone, None, (cheap,), (), document_number="Q-1").startswith(b"%PDF"))
+        self.assertEqual(len(registry._entries), entries)
+
+    def test_document_store(self):
+        """Test documents get sequential numbers, identical inputs reuse the stored PDF and void frees them."""
+        phone = "5558880002"
+        add_new_client(phone, "Document Client", "tester")
+        part_id = add_part_without_vin("Mirror", "M1", 1, "", phone, [
+            {'name': 'S', 'buying_price': 10, 'selling_price': 25, 'delivery_time': 'IN STOCK'},
+        ], "tester")
+
+        first, data, reused = issue_document('invoice', phone, None, (part_id,), deposit=20.0, username="tester")
+        self.assertFalse(reused)
+        self.assertTrue(first['document_number'].startswith("INV-"))
+        again, again_data, reused = issue_document('invoice', phone, None, (part_id,), deposit=20.0, username="tester")
+        self.assertTrue(reused)
+        self.assertEqual((again['id'], again_data), (first['id'], data))
+
+        second, _, _ = issue_document('invoice', phone, None, (part_id,), deposit=10.0, username="tester")
+        self.assertEqual(int(second['document_number'][4:]), int(first['document_number'][4:]) + 1)
+        self.assertEqual(find_documents(client_phone=phone)['id'].tolist(), [second['id'], first['id']])
+        self.assertEqual(get_document_pdf(first['id']), data)
+
+        self.assertTrue(set_document_status(first['id'], 'void', "tester"))
+        third, _, reused = issue_document('invoice', phone, None, (part_id,), deposit=20.0, username="tester")
+        self.assertFalse(reused)
+        self.assertEqual(find_documents(client_phone=phone, status='void')['id'].tolist(), [first['id']])
+
+        # The render runs outside the write lock; a number taken meanwhile is re-rendered for the next one
+        from services import documents
+        real_render = documents.render_quote_pdf
+        locked = []
+
+        def racing_render(*args, **kwargs):
+            other = sqlite3.connect(TEST_DB_NAME, timeout=0)
+            try:
+                other.execute("BEGIN IMMEDIATE")
+                if not locked:
+                    other.execute("UPDATE document_sequences SET last_number = last_number + 1 WHERE document_type = 'invoice'")
+                other.commit()
+                locked.append(False)
+            except sqlite3.OperationalError:
+                locked.append(True)
+            finally:
+                other.close()
+            return real_render(*args, **kwargs)
+
+        with mock.patch.object(documents, 'render_quote_pdf', racing_render):
+            fourth, fourth_data, _ = issue_document('invoice', phone, None, (part_id,), deposit=5.0, username="tester")
+        self.assertEqual(locked, [False, False])
+        self.assertEqual(int(fourth['document_number'][4:]), int(third['document_number'][4:]) + 2)
+        self.assertEqual(get_document_pdf(fourth['id']), fourth_data)
+
+    def test_unit_of_work_and_undelete_vin(self):
+        """Test a unit of work is all-or-nothing and undo restores a VIN with its parts and ids."""
+        phone = "5559990001"
+        vin = "6HGCM82633A004352"
+        add_new_client(phone, "Undo Client", "tester")
+        with self.assertRaises(ValueError):
+            with UnitOfWork("tester") as uow:
+                uow.execute("UPDATE clients SET client_name = 'Changed' WHERE phone = ?", (phone,))
+                raise ValueError("abort")
+        self.assertEqual(load_client_aggregate(phone).client['client_name'], "Undo Client")
+
+        add_vin_to_client(phone, vin, "Jazz", "2008", "", "", "", "", "tester")
+        part_id = add_part_to_vin(vin, phone, "Hose", "H1", 2, "", [
+            {'name': 'S1', 'buying_price': 1, 'selling_price': 3, 'delivery_time': '2'},
+        ], "tester")
+        delete_vin(vin, "tester", phone)
+        self.assertEqual(load_client_aggregate(phone).vin_numbers, [])
+
+        self.assertEqual(undelete_vin(vin, "tester"), [part_id])
+        restored = load_client_aggregate(phone)
+        self.assertEqual(restored.vin_numbers, [vin])
+        self.assertEqual([s['supplier_name'] for s in restored.suppliers_for_part(part_id)], ['S1'])
+        with self.assertRaises(ValueError):
+            undelete_vin(vin, "tester")
+        self.assertEqual(len(load_client_aggregate(phone).parts_for_vin(vin)), 1)
+
+        update_client_and_vins(phone, "5559990002", "Renamed", "tester")
+        moved = load_client_aggregate("5559990002")
+        self.assertEqual((moved.client['client_name'], moved.vin_numbers), ("Renamed", [vin]))
+
+    def test_soft_delete_trash(self):
+        """Test deletes tombstone rows that reads skip, the trash lists them and the purge removes them."""
+        phone = "5559990101"
+        vin = "7HGCM82633A004352"
+        add_new_client(phone, "Trash Client", "tester")
+        add_vin_to_client(phone, vin, "Fit", "2010", "", "", "", "", "tester")
+        kept_id = add_part_to_vin(vin, phone, "Filter", "F1", 1, "", [], "tester")
+        loose_id = add_part_without_vin("Wiper", "W1", 1, "", phone, [
+            {'name': 'S1', 'buying_price': 1, 'selling_price': 2, 'delivery_time': '1'},
+        ], "tester")
+
+        delete_part(loose_id, "tester")
+        delete_vin(vin, "tester", phone)
+        aggregate = load_client_aggregate(phone)
+        self.assertEqual((aggregate.vin_numbers, len(aggregate.unassigned_parts)), ([], 0))
+        _, df_vins, df_parts, df_suppliers = load_data()
+        self.assertNotIn(vin, df_vins['vin_number'].tolist())
+        self.assertFalse(df_parts['id'].isin([kept_id, loose_id]).any())
+        self.assertFalse(df_suppliers['part_id'].isin([loose_id]).any())
+        self.assertTrue(search("Wiper")['parts'].empty)
+        trash = list_trash(phone)
+        self.assertEqual(sorted(trash['kind']), ['part', 'vin'])  # the VIN's part is restored with it
+
+        with self.assertRaises(ValueError):
+            undelete_part(kept_id, "tester")
+        undelete_part(loose_id, "tester")
+        self.assertEqual(load_client_aggregate(phone).unassigned_parts['id'].tolist(), [loose_id])
+        self.assertEqual(load_client_aggregate(phone).suppliers_for_part(loose_id)[0]['supplier_name'], 'S1')
+
+        self.assertEqual(purge_trash(retain_days=1), {'vins': 0, 'parts': 0})
+        self.assertEqual(purge_trash(retain_days=-1), {'vins': 1, 'parts': 1})
+        self.assertTrue(list_trash(phone).empty)
+        with get_db_connection_ctx() as conn:
+            self.assertIsNone(conn.execute("SELECT 1 FROM parts WHERE id = ?", (kept_id,)).fetchone())
+
+    def test_register_trashed_vin(self):
+        """Test registering a trashed VIN restores it for its owner and conflicts for anyone else."""
+        phone, other, vin = "5559990111", "5559990112", "7HGCM82633A004353"
+        add_new_client(phone, "Owner", "tester")
+        add_new_client(other, "Other", "tester")
+        add_vin_to_client(phone, vin, "Fit", "2010", "", "", "", "", "tester")
+        part_id = add_part_to_vin(vin, phone, "Filter", "F1", 1, "", [], "tester")
+        with self.assertRaises(ValueError):
+            add_vin_to_client(phone, vin, "Fit", "2010", "", "", "", "", "tester")
+
+        delete_vin(vin, "tester", phone)
+        with self.assertRaises(ValueError):
+            add_vin_to_client(other, vin, "Jazz", "2011", "", "", "", "", "tester")
+        self.assertEqual(list_trash(phone)['key'].tolist(), [vin])
+
+        add_vin_to_client(phone, vin, "Fit RS", "2010", "", "", "", "", "tester")
+        aggregate = load_client_aggregate(phone)
+        self.assertEqual(aggregate.vins['model'].tolist(), ["Fit RS"])
+        self.assertEqual(aggregate.parts_for_vin(vin)['id'].tolist(), [part_id])
+        self.assertTrue(list_trash(phone).empty)
+
+        renamed = "7HGCM82633A004354"
+        add_vin_to_client(phone, renamed, "Civic", "2012", "", "", "", "", "tester")
+        delete_vin(renamed, "tester", phone)
+        with self.assertRaises(ValueError):
+            update_vin(vin, renamed, "Fit RS", "2010", "", "", "", "", "tester")
+        self.assertEqual(list_trash(phone)['key'].tolist(), [renamed])
+        undelete_vin(renamed, "tester")
+
+    def test_restore_vin_without_number(self):
+        """Test a deleted VIN-less record can be listed and restored through its placeholder label."""
+        phone = "5559990121"
+        add_new_client(phone, "No VIN Client", "tester")
+        add_vin_to_client(phone, None, "Unknown", "", "", "", "", "", "tester")
+        self.assertEqual(delete_vin("None", "tester", phone), 1)
+        self.assertEqual(list_trash(phone)['label'].tolist(), ["No VIN provided - Unknown"])
+        with self.assertRaises(ValueError):
+            undelete_vin("None", "tester")
+
+        self.assertEqual(undelete_vin("None", "tester", phone), [])
+        self.assertEqual(load_client_aggregate(phone).vins['model'].tolist(), ["Unknown"])
+        self.assertTrue(list_trash(phone).empty)
+
+    def test_failed_migration_is_reported(self):
+        """Test a failing migration propagates and migrate_database reports it instead of passing."""
+        def broken(cursor):
+            cursor.execute("CREATE TABLE migration_probe (id INTEGER)")
+            cursor.execute("INSERT INTO no_such_table VALUES (1)")
+
+        test_db = db_utils.DB_NAME
+        path = os.path.join(tempfile.mkdtemp(), "migrate.db")
+        try:
+            with mock.patch.object(db_utils, 'SCHEMA_MIGRATIONS', db_utils.SCHEMA_MIGRATIONS + [(99, broken)]):
+                with redirect_stdout(io.StringIO()) as out:
+                    self.assertFalse(migrate_database(path))
+            self.assertIn("FAIL: migration stopped at schema version", out.getvalue())
+            with db_utils.get_db_connection_ctx() as conn:
+                # The failed batch is rolled back as a whole, including the half-run migration
+                self.assertLess(conn.execute("PRAGMA user_version").fetchone()[0], 99)
+                self.assertIsNone(conn.execute(
+                    "SELECT name FROM sqlite_master WHERE name = 'migration_probe'").fetchone())
+            with redirect_stdout(io.StringIO()):
+                self.assertTrue(migrate_database(path))
+            with db_utils.get_db_connection_ctx() as conn:
+                self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], db_utils.SCHEMA_MIGRATIONS[-1][0])
+        finally:
+            db_utils.DB_NAME = test_db
+
+    def test_cascading_key_updates(self):
+        """Test phone and VIN renames cascade in the database and old schemas are converted in place."""
+        phone, vin = "5559990201", "8HGCM82633A004352"
+        add_new_client(phone, "Cascade Client", "tester")
+        add_vin_to_client(phone, vin, "Civic", "2003", "", "", "", "", "tester")
+        part_id = add_part_to_vin(vin, phone, "Mirror", "M1", 1, "", [], "tester")
+
+        def backdate():
+            with get_db_connection_ctx() as conn:
+                conn.execute("UPDATE vins SET last_updated = '2000-01-01' WHERE client_phone = ?", (phone,))
+                conn.execute("UPDATE parts SET last_updated = '2000-01-01' WHERE client_phone = ?", (phone,))
+                conn.commit()
+
+        # Rows moved by a key rename get the audit stamp; a name-only edit leaves them alone
+        backdate()
+        update_vin(vin, "8HGCM82633A004353", "Civic", "2003", "", "", "", "", "renamer")
+        with get_db_connection_ctx() as conn:
+            self.assertEqual(conn.execute("SELECT last_updated_by FROM parts WHERE id = ?", (part_id,)).fetchone()[0], "renamer")
+        backdate()
+        with get_db_connection_ctx() as conn:
+            seq = conn.execute("SELECT MAX(seq) FROM data_changes").fetchone()[0]
+        update_client_and_vins(phone, phone, "Cascade Client Renamed", "namer")
+        with get_db_connection_ctx() as conn:
+            self.assertEqual(
+                conn.execute("SELECT last_updated_by, last_updated FROM parts WHERE id = ?", (part_id,)).fetchone(),
+                ("renamer", "2000-01-01"),
+            )
+            self.assertEqual(conn.execute(
+                "SELECT table_name FROM data_changes WHERE seq > ?", (seq,)).fetchall(), [('clients',)])
+        update_client_and_vins(phone, "5559990202", "Cascade Client", "editor")
+        with get_db_connection_ctx() as conn:
+            self.assertEqual(
+                conn.execute("SELECT vin_number, client_phone FROM parts WHERE id = ?", (part_id,)).fetchone(),
+                ("8HGCM82633A004353", "5559990202"),
+            )
+            for table in ('vins', 'parts'):
+                by, updated = conn.execute(
+                    f"SELECT last_updated_by, last_updated FROM {table} WHERE client_phone = '5559990202'").fetchone()
+                self.assertEqual(by, "editor")
+                self.assertGreater(updated, '2000-01-01')
+
+        conn = sqlite3.connect(":memory:")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("CREATE TABLE clients (phone TEXT PRIMARY KEY)")
+        conn.execute("CREATE TABLE data_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT, row_id INTEGER)")
+        conn.execute("CREATE TABLE vins (vin_number TEXT PRIMARY KEY, client_phone TEXT, "
+                     "FOREIGN KEY(client_phone) REFERENCES clients(phone) ON DELETE CASCADE)")
+        conn.execute("CREATE TABLE parts (id INTEGER PRIMARY KEY, vin_number TEXT, client_phone TEXT, "
+                     "FOREIGN KEY(vin_number) REFERENCES vins(vin_number) ON DELETE CASCADE, "
+                     "FOREIGN KEY(client_phone) REFERENCES clients(phone) ON DELETE CASCADE)")
+        conn.execute("CREATE INDEX idx_parts_vin_number ON parts(vin_number)")
+        conn.execute("INSERT INTO clients VALUES ('1')")
+        conn.executemany("INSERT INTO vins (rowid, vin_number, client_phone) VALUES (?, ?, '1')", [(7, 'A'), (9, 'B')])
+        conn.execute("INSERT INTO parts VALUES (5, 'B', '1')")
+        conn.commit()
+        db_utils._migration_007_cascading_keys(conn.cursor())
+        self.assertEqual(conn.execute("SELECT rowid, vin_number FROM vins ORDER BY rowid").fetchall(), [(7, 'A'), (9, 'B')])
+        self.assertIsNotNone(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_parts_vin_number'").fetchone())
+        conn.execute("UPDATE vins SET vin_number = 'C' WHERE vin_number = 'B'")
+        conn.execute("UPDATE clients SET phone = '2'")
+        self.assertEqual(conn.execute("SELECT vin_number, client_phone FROM parts").fetchall(), [('C', '2')])
+        conn.close()
+
+    def test_summary_counters(self):
+        """Test trigger-maintained summaries match a full recount and back the client sort orders."""
+        phone, vin = "5559990301", "9HGCM82633A004352"
+        add_new_client(phone, "Summary Client", "tester")
+        add_vin_to_client(phone, vin, "Accord", "2003", "", "", "", "", "tester")
+        part_id = add_part_to_vin(vin, phone, "Pump", "P1", 2, "", [
+            {'name': 'S1', 'buying_price': 1, 'selling_price': 10, 'delivery_time': '2'},
+            {'name': 'S2', 'buying_price': 1, 'selling_price': 7, 'delivery_time': '5'},
+        ], "tester")
+        loose_id = add_part_without_vin("Cap", "C1", 1, "", phone, [
+            {'name': 'S1', 'buying_price': 1, 'selling_price': 4, 'delivery_time': '1'},
+        ], "tester")
+        delete_part(loose_id, "tester")
+        update_vin(vin, "9HGCM82633A004353", "Accord", "2003", "", "", "", "", "tester")
+        update_client_and_vins(phone, "5559990302", "Summary Client", "tester")
+
+        aggregate = load_client_aggregate("5559990302")
+        self.assertEqual(
+            (aggregate.summary['vin_count'], aggregate.summary['part_count'], aggregate.summary['quoted_total']), (1, 1, 14.0)
+        )
+        self.assertEqual(aggregate.vin_part_counts, {"9HGCM82633A004353": 1})
+        rows, _ = get_clients_page_after(None, page_size=100, sort='value')
+        values = get_client_summaries([row[0] for row in rows])
+        totals = [values.get(row[0], {}).get('quoted_total', 0) for row in rows]
+        self.assertIn("5559990302", [row[0] for row in rows])
+        self.assertEqual(totals, sorted(totals, reverse=True))
+
+        with get_db_connection_ctx() as conn:
+            def snapshot():
+                return [conn.execute(f"SELECT * FROM {t} ORDER BY 1").fetchall()
+                        for t in ('part_summary', 'vin_summary')] + [
+                    conn.execute("SELECT client_phone, vin_count, part_count, ROUND(quoted_total, 2) FROM client_summary ORDER BY 1").fetchall()
+                ]
+            maintained = snapshot()
+            db_utils.rebuild_summaries(conn)
+            self.assertEqual(maintained, snapshot())
+            conn.rollback()
+
+    def test_supplier_analytics(self):
+        """Test supplier price comparison across clients and that incremental refreshes match a full recompute."""
+        first, second = "5559990401", "5559990402"
+        add_new_client(first, "Analytics One", "tester")
+        add_new_client(second, "Analytics Two", "tester")
+        add_part_without_vin("Alternator", "alt-77", 1, "", first, [
+            {'name': 'Fast Parts', 'buying_price': 60, 'selling_price': 100, 'delivery_time': 'IN STOCK'},
+            {'name': 'Cheap Parts', 'buying_price': 50, 'selling_price': 80, 'delivery_time': '7 days'},
+        ], "tester")
+        supplier_analytics()
+        second_id = add_part_without_vin("Alternator", " ALT-77", 1, "", second, [
+            {'name': 'Cheap Parts', 'buying_price': 50, 'selling_price': 90, 'delivery_time': '5'},
+        ], "tester")
+
+        row = supplier_analytics().by_part.loc["ALT-77"]
+        self.assertEqual((row['clients'], row['suppliers'], row['offers']), (2, 2, 3))
+        self.assertEqual((row['min_price'], row['max_price'], row['spread']), (80, 100, 20))
+        self.assertEqual((row['cheapest_supplier'], row['cheapest_margin_pct']), ("Cheap Parts", 37.5))
+        self.assertEqual((row['fastest_supplier'], row['fastest_days']), ("Fast Parts", 0))
+        comparison = compare_part_prices("alt-77")
+        self.assertEqual(comparison['supplier_name'].tolist(), ["Cheap Parts", "Fast Parts"])
+        self.assertEqual(comparison['delivery_rank'].tolist(), [2, 1])
+
+        delete_part(second_id, "tester")
+        with get_db_connection_ctx() as conn:
+            conn.execute("UPDATE part_suppliers SET selling_price = 120 WHERE supplier_name = 'Cheap Parts'")
+            conn.commit()
+        incremental = supplier_analytics()
+        self.assertEqual(incremental.by_part.loc["ALT-77", 'cheapest_supplier'], "Fast Parts")
+        full = SupplierAnalyticsCache(db_utils.DB_NAME).refresh()
+        pd.testing.assert_frame_equal(incremental.by_part.sort_index(), full.by_part.sort_index(), check_dtype=False)
+        pd.testing.assert_frame_equal(incremental.by_supplier.sort_index(), full.by_supplier.sort_index(), check_dtype=False)
+
 if __name__ == '__main__':
     unittest.main()
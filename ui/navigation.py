@@ -3,8 +3,13 @@ import sqlite3
 import streamlit as st
 from datetime import datetime
 
-from db_utils import DB_NAME, database_maintenance, export_filtered_data
+from db_utils import DB_NAME, database_maintenance, export_filtered_data, get_db_connection_ctx, explain_hot_queries
 from auth import logout
+from services.search import search, count_matches
+from services.backup import start_backup, get_backup_status, list_backups, verify_backup, restore_backup
+from services.activity_archive import archive_activity_log
+from services.trash import purge_trash
+from services.vin_decoder import fill_vin_details
 
 
 def main_navigation():
@@ -30,6 +35,9 @@ def main_navigation():
     if st.sidebar.button("Text Quote"):
         st.session_state.view = 'generate_text_quote_flow'
         st.session_state.need_rerun = True
+    if st.sidebar.button("Documents"):
+        st.session_state.view = 'documents'
+        st.session_state.need_rerun = True
 
     # Admin-only tools
     if st.session_state.get('user_role') == 'admin':
@@ -40,6 +48,12 @@ def main_navigation():
         if st.sidebar.button("User Management"):
             st.session_state.view = 'user_management'
             st.session_state.need_rerun = True
+        if st.sidebar.button("Data Import"):
+            st.session_state.view = 'data_import'
+            st.session_state.need_rerun = True
+        if st.sidebar.button("Supplier Analytics"):
+            st.session_state.view = 'supplier_analytics'
+            st.session_state.need_rerun = True
 
     st.sidebar.markdown("---")
     user = st.session_state.get('username') or 'User'
@@ -48,39 +62,21 @@ def main_navigation():
     st.sidebar.button("Logout", on_click=logout)
 
 
-def global_search(df_clients, df_vins, df_parts):
+def global_search():
     st.sidebar.markdown("---")
     st.sidebar.subheader("Global Search")
     search_term = st.sidebar.text_input("Search across all data")
 
     if search_term:
-        client_results = df_clients[
-            df_clients['client_name'].str.contains(search_term, case=False)
-            | df_clients['phone'].str.contains(search_term, case=False)
-        ]
-
-        vin_results = df_vins[
-            df_vins['vin_number'].str.contains(search_term, case=False)
-            | df_vins['model'].str.contains(search_term, case=False)
-        ]
-
-        part_results = df_parts[
-            df_parts['part_name'].str.contains(search_term, case=False)
-            | df_parts['part_number'].str.contains(search_term, case=False)
-        ]
-
-        if not client_results.empty or not vin_results.empty or not part_results.empty:
+        counts = count_matches(search_term)
+        if any(counts.values()):
             st.sidebar.success(
-                f"Found {len(client_results)} clients, {len(vin_results)} VINs, {len(part_results)} parts"
+                f"Found {counts['clients']} clients, {counts['vins']} VINs, {counts['parts']} parts"
             )
 
             if st.sidebar.button("View Search Results"):
                 st.session_state.view = 'search_results'
-                st.session_state.search_results = {
-                    'clients': client_results,
-                    'vins': vin_results,
-                    'parts': part_results,
-                }
+                st.session_state.search_results = search(search_term)
                 st.session_state.need_rerun = True
 
 
@@ -132,25 +128,49 @@ def export_data():
 
 
 def backup_database():
-    import shutil
-    import datetime as _dt
-
     st.sidebar.markdown("---")
     st.sidebar.subheader("Backup Management")
 
     if st.sidebar.button("Backup Database Now"):
-        backup_name = f"backup_{_dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-        shutil.copy2('brent_j_marketing.db', backup_name)
-        st.sidebar.success(f"Backup created: {backup_name}")
-        from auth import log_activity
+        if start_backup() is None:
+            st.sidebar.info("A backup is already running")
+        else:
+            from auth import log_activity
+
+            log_activity(st.session_state.get('username') or "User", "backup", "Started online backup")
 
-        log_activity("User", "backup", f"Created backup: {backup_name}")
+    status = get_backup_status()
+    if status['state'] == 'running':
+        st.sidebar.progress(status['progress'], text=status['message'] or "Backing up...")
+        st.sidebar.button("Refresh Backup Status")
+    elif status['state'] == 'done':
+        st.sidebar.success(status['message'])
+    elif status['state'] == 'failed':
+        st.sidebar.error(status['message'])
 
-    backups = [f for f in os.listdir('.') if f.startswith('backup_') and f.endswith('.db')]
+    backups = list_backups()
     if backups:
         st.sidebar.write("**Existing Backups:**")
-        for backup in sorted(backups, reverse=True)[:5]:
-            st.sidebar.write(f"- {backup}")
+        for entry in backups[:5]:
+            st.sidebar.write(f"- {entry['file']} ({entry['archive_size'] // 1024} KB)")
+
+        if st.session_state.get('user_role') == 'admin':
+            with st.sidebar.expander("Verify / Restore"):
+                selected = st.selectbox("Backup", [e['file'] for e in backups], key="backup_selected")
+                if st.button("Verify Backup"):
+                    ok, msg = verify_backup(selected)
+                    (st.success if ok else st.error)(msg)
+                confirm_restore = st.checkbox("I understand the current data will be replaced", key="confirm_restore")
+                if st.button("Restore Backup", disabled=not confirm_restore):
+                    ok, msg = restore_backup(selected)
+                    if ok:
+                        st.success(msg)
+                        from auth import log_activity
+
+                        log_activity(st.session_state.username, "restore_backup", msg)
+                        st.session_state.need_rerun = True
+                    else:
+                        st.error(msg)
 
 
 def confirm_action_interface():
@@ -175,14 +195,24 @@ def database_maintenance_interface():
     if st.sidebar.button("Optimize Database"):
         if database_maintenance():
             st.sidebar.success("Database optimized!")
+            archived = archive_activity_log()
+            if archived:
+                st.sidebar.info(f"Archived {sum(archived.values())} old activity log rows")
+            purged = purge_trash(username=st.session_state.get('username', 'User'))
+            if purged['vins'] or purged['parts']:
+                st.sidebar.info(f"Purged {purged['vins']} VINs and {purged['parts']} parts from the trash")
             from auth import log_activity
 
             log_activity("User", "maintenance", "Database optimization")
         else:
             st.sidebar.error("Database optimization failed")
 
+    if st.sidebar.button("Fill VIN Details"):
+        filled = fill_vin_details(st.session_state.get('username', 'User'))
+        st.sidebar.success(f"Filled model / year for {filled} VINs from their VIN numbers")
+
     if st.sidebar.button("Check Database Integrity"):
-        with sqlite3.connect(DB_NAME) as conn:
+        with get_db_connection_ctx() as conn:
             result = conn.execute("PRAGMA integrity_check").fetchone()
         if result[0] == "ok":
             st.sidebar.success("Database integrity: OK")
@@ -191,3 +221,13 @@ def database_maintenance_interface():
         from auth import log_activity
 
         log_activity("User", "maintenance", "Database integrity check")
+
+    if st.sidebar.button("Check Query Plans"):
+        plans = explain_hot_queries()
+        if plans.empty:
+            st.sidebar.error("Could not read query plans")
+        elif plans['uses_index'].all():
+            st.sidebar.success("All hot queries use an index")
+        else:
+            st.sidebar.warning(f"{int((~plans['uses_index']).sum())} hot queries fall back to a full scan")
+        st.dataframe(plans, width='stretch', hide_index=True)
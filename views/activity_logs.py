@@ -2,7 +2,9 @@ from datetime import datetime
 import streamlit as st
 
 from auth import require_admin
-from db_utils import get_activity_logs
+from services.activity_archive import (
+    ACTIVITY_LOG_RETAIN_DAYS, archive_activity_log, list_archives, query_activity,
+)
 
 
 def render_activity_logs_view():
@@ -12,20 +14,53 @@ def render_activity_logs_view():
     if st.button("Back to Main"):
         st.session_state.view = 'main'
         st.session_state.need_rerun = True
+        st.session_state.activity_log_cursors = [None]
 
     st.divider()
 
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         filter_username = st.text_input("Filter by username", "")
+        start_date = st.date_input("From", value=None)
     with col2:
-        log_limit = st.number_input("Number of logs", min_value=10, max_value=1000, value=100)
+        filter_action = st.text_input("Filter by action", "")
+        end_date = st.date_input("To", value=None)
+    with col3:
+        filter_table = st.text_input("Filter by table", "")
+        page_size = st.number_input("Logs per page", min_value=10, max_value=1000, value=100)
 
-    logs_df = get_activity_logs(filter_username if filter_username else None, log_limit)
+    # Keyset cursors for the pages visited so far; reset whenever the filters change
+    filters = (filter_username, filter_action, filter_table, start_date, end_date, page_size)
+    if st.session_state.get("activity_log_filters") != filters or "activity_log_cursors" not in st.session_state:
+        st.session_state.activity_log_filters = filters
+        st.session_state.activity_log_cursors = [None]
+    cursors = st.session_state.activity_log_cursors
+
+    logs_df, next_cursor = query_activity(
+        start=start_date,
+        end=end_date,
+        username=filter_username or None,
+        action=filter_action or None,
+        table_name=filter_table or None,
+        cursor=cursors[-1],
+        page_size=page_size,
+    )
 
     if not logs_df.empty:
         st.dataframe(logs_df, width='stretch')
 
+        nav_prev, nav_label, nav_next = st.columns([0.2, 0.6, 0.2])
+        with nav_prev:
+            if st.button("Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with nav_label:
+            st.caption(f"Page {len(cursors)}")
+        with nav_next:
+            if st.button("Older", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+
         if st.button("Export Logs to CSV"):
             csv = logs_df.to_csv(index=False)
             st.download_button(
@@ -36,3 +71,18 @@ def render_activity_logs_view():
             )
     else:
         st.info("No activity logs found.")
+
+    with st.expander("Archive"):
+        archives = list_archives()
+        if archives.empty:
+            st.caption("No archived months yet.")
+        else:
+            st.dataframe(archives, width='stretch', hide_index=True)
+        retain_days = st.number_input("Archive logs older than (days)", min_value=1, value=ACTIVITY_LOG_RETAIN_DAYS)
+        if st.button("Archive Old Logs"):
+            archived = archive_activity_log(retain_days)
+            if archived:
+                st.success(f"Archived {sum(archived.values())} rows across {len(archived)} months")
+            else:
+                st.info("Nothing to archive")
+            st.session_state.activity_log_cursors = [None]
@@ -0,0 +1,57 @@
+import streamlit as st
+
+from auth import require_admin
+from services.importer import IMPORT_COLUMNS, import_file, reject_report_csv
+
+
+def render_data_import_view():
+    require_admin()
+    st.header("Data Import")
+
+    if st.button("Back to Main"):
+        st.session_state.view = 'main'
+        st.session_state.need_rerun = True
+        return
+
+    st.info(
+        "Import one table per file. Import clients before VINs, VINs before parts and parts before suppliers. "
+        "Existing rows are updated; the reject report lists every row that was skipped and why."
+    )
+
+    kind = st.selectbox("Import into", options=list(IMPORT_COLUMNS), key="import_kind")
+    st.caption("Columns: " + ", ".join(IMPORT_COLUMNS[kind]))
+    upload = st.file_uploader("CSV or Excel file", type=["csv", "xlsx"], key="import_file")
+    dry_run = st.checkbox("Dry run (validate only, nothing is saved)", value=True, key="import_dry_run")
+
+    if upload is not None and st.button("Run Import"):
+        progress_bar = st.progress(0.0, text="Importing...")
+
+        def _progress(done, total):
+            if total:
+                progress_bar.progress(min(done / total, 1.0), text=f"{done} of {total} rows")
+            else:
+                progress_bar.progress(0.0, text=f"{done} rows processed")
+
+        try:
+            result = import_file(upload, upload.name, kind, st.session_state.username, dry_run=dry_run, progress=_progress)
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+            return
+        progress_bar.progress(1.0, text=f"{result['rows']} rows processed")
+
+        if result['dry_run']:
+            st.success(f"Dry run: would insert {result['inserted']} and update {result['updated']} rows")
+        else:
+            st.success(f"Inserted {result['inserted']} and updated {result['updated']} rows")
+        rejected = result['rejected']
+        if rejected.empty:
+            st.caption("No rows rejected.")
+        else:
+            st.warning(f"{len(rejected)} rows rejected")
+            st.dataframe(rejected, width='stretch', hide_index=True)
+            st.download_button(
+                label="Download Reject Report",
+                data=reject_report_csv(result),
+                file_name=f"import_rejects_{kind}.csv",
+                mime="text/csv",
+            )
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import streamlit as st
+
+from services.documents import DOCUMENT_STATUSES, find_documents, get_document_pdf, set_document_status
+from services.pdf import generate_pdf_batch
+from services.pricing import batch_documents
+
+
+def _render_batch_run():
+    """Month-end run: one un-numbered PDF per client with live parts, rendered into a ZIP."""
+    with st.expander("Batch Run (ZIP)"):
+        document_type = st.selectbox("Document type", options=['quote', 'invoice'], key="batch_document_type")
+        if st.button("Render All Clients"):
+            documents = batch_documents(document_type)
+            if not documents:
+                st.info("No clients with parts to render.")
+                return
+            bar = st.progress(0.0, text=f"Rendering {len(documents)} documents...")
+            st.session_state.batch_zip = generate_pdf_batch(
+                documents, progress=lambda done, total: bar.progress(done / total, text=f"Rendered {done} of {total}"),
+            )
+            st.session_state.batch_zip_name = f"{document_type}s_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        if st.session_state.get('batch_zip'):
+            st.download_button(
+                label=f"Download {st.session_state.batch_zip_name}",
+                data=st.session_state.batch_zip,
+                file_name=st.session_state.batch_zip_name,
+                mime="application/zip",
+            )
+
+
+def render_documents_view():
+    st.header("Documents")
+
+    if st.button("Back to Main"):
+        st.session_state.view = 'main'
+        st.session_state.need_rerun = True
+        return
+
+    _render_batch_run()
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        client_phone = st.text_input("Client phone", value=st.session_state.current_client_phone or "")
+        start_date = st.date_input("From", value=None)
+    with col2:
+        status = st.selectbox("Status", options=[''] + list(DOCUMENT_STATUSES))
+        end_date = st.date_input("To", value=None)
+    with col3:
+        document_type = st.selectbox("Type", options=['', 'quote', 'invoice'])
+        limit = st.number_input("Show", min_value=10, max_value=1000, value=100)
+
+    documents = find_documents(
+        client_phone=client_phone or None,
+        status=status or None,
+        document_type=document_type or None,
+        start=start_date,
+        end=end_date,
+        limit=limit,
+    )
+    if documents.empty:
+        st.info("No documents found.")
+        return
+    st.dataframe(documents, width='stretch', hide_index=True)
+
+    labels = {
+        int(row.id): f"{row.document_number} - {row.client_name} ({row.created_date}, {row.status})"
+        for row in documents.itertuples(index=False)
+    }
+    document_id = st.selectbox("Document", options=list(labels), format_func=labels.get)
+    current = documents.loc[documents['id'] == document_id].iloc[0]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="Download PDF",
+            data=get_document_pdf(document_id) or b"",
+            file_name=f"{current['document_number']}.pdf",
+            mime="application/pdf",
+        )
+    with col2:
+        new_status = st.selectbox(
+            "Set status", options=list(DOCUMENT_STATUSES), index=DOCUMENT_STATUSES.index(current['status']),
+            key=f"document_status_{document_id}",
+        )
+        if new_status != current['status'] and st.button("Update Status"):
+            set_document_status(document_id, new_status, st.session_state.username)
+            st.success(f"{current['document_number']} marked {new_status}")
+            st.rerun()
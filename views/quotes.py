@@ -0,0 +1,191 @@
+import streamlit as st
+
+from logic import find_clients_by_prefix, load_client_aggregate
+from services.pricing import price_quote, format_text_quote
+from services.documents import issue_document
+
+PART_CONDITIONS = ["New", "Used", "Refurbished", "OEM", "Aftermarket"]
+ALL_PARTS = 'Show All Parts'
+
+
+def _back_to_main():
+    if st.button("Back to Main"):
+        st.session_state.view = 'main'
+        st.session_state.need_rerun = True
+        return True
+    return False
+
+
+def _select_client():
+    """Pick the quote's client (defaults to the client currently open)."""
+    phone = st.session_state.quote_selected_phone or st.session_state.current_client_phone
+    lookup = st.text_input("Find client by phone or name", value="", key="quote_client_lookup")
+    if lookup:
+        matches = find_clients_by_prefix(lookup)
+        if not matches:
+            st.warning("No matching clients.")
+        labels = {f"{name} ({p})": p for p, name in matches}
+        label = st.selectbox("Client", options=[''] + list(labels), key="quote_client_choice")
+        if label and labels[label] != phone:
+            phone = labels[label]
+            st.session_state.quote_selected_vin = None
+            st.session_state.quote_selected_part_ids = []
+    st.session_state.quote_selected_phone = phone
+    return phone
+
+
+def _select_parts(aggregate):
+    """VIN and part pickers; returns (vin or None, tuple of part ids)."""
+    vin_options = [ALL_PARTS] + aggregate.vin_numbers
+    current_vin = st.session_state.quote_selected_vin or ALL_PARTS
+    vin = st.selectbox(
+        "VIN", options=vin_options,
+        index=vin_options.index(current_vin) if current_vin in vin_options else 0,
+        key="quote_vin_choice",
+    )
+    st.session_state.quote_selected_vin = vin
+
+    if vin == ALL_PARTS:
+        frames = [aggregate.parts_for_vin(v) for v in aggregate.vin_numbers] + [aggregate.unassigned_parts]
+        parts = [row for frame in frames for row in frame.to_dict('records')]
+    else:
+        parts = aggregate.parts_for_vin(vin).to_dict('records')
+    labels = {
+        int(p['id']): f"{p['part_name'] or ''} {('#' + p['part_number']) if p['part_number'] else ''} (qty {p['quantity']})".strip()
+        for p in parts
+    }
+    selected = [pid for pid in st.session_state.quote_selected_part_ids if pid in labels]
+    part_ids = st.multiselect(
+        "Parts", options=list(labels), default=selected, format_func=labels.get, key="quote_part_choice",
+    )
+    st.session_state.quote_selected_part_ids = part_ids
+    return (None if vin == ALL_PARTS else vin), tuple(part_ids)
+
+
+def _select_suppliers(aggregate, part_ids, with_conditions=False):
+    """Per-part supplier (and optionally condition) choices; returns a (part_id, supplier_id) tuple."""
+    choices = st.session_state.selected_parts_suppliers
+    for pid in part_ids:
+        suppliers = aggregate.suppliers_for_part(pid)
+        cols = st.columns([3, 2]) if with_conditions else [st.container()]
+        with cols[0]:
+            if suppliers:
+                by_id = {s['id']: s for s in suppliers}
+                current = choices.get(pid)
+                options = [None] + list(by_id)
+                choices[pid] = st.selectbox(
+                    f"Supplier for part {pid}",
+                    options=options,
+                    index=options.index(current) if current in options else 0,
+                    format_func=lambda sid, by_id=by_id: "Cheapest" if sid is None else (
+                        f"{by_id[sid]['supplier_name']} - ${by_id[sid]['selling_price'] or 0:.2f} ({by_id[sid]['delivery_time'] or 'n/a'})"
+                    ),
+                    key=f"quote_supplier_{pid}",
+                )
+            else:
+                st.caption(f"Part {pid} has no suppliers; it is priced at 0.00")
+        if with_conditions:
+            with cols[1]:
+                current = st.session_state.part_conditions.get(pid, PART_CONDITIONS[0])
+                st.session_state.part_conditions[pid] = st.selectbox(
+                    "Condition", options=PART_CONDITIONS,
+                    index=PART_CONDITIONS.index(current) if current in PART_CONDITIONS else 0,
+                    key=f"quote_condition_{pid}",
+                )
+    return tuple(sorted((pid, sid) for pid, sid in choices.items() if pid in part_ids and sid is not None))
+
+
+def _quote_inputs(with_conditions=False):
+    """Shared client / VIN / parts / supplier selection; returns (phone, vin, part_ids, choice, priced) or None."""
+    phone = _select_client()
+    if not phone:
+        st.info("Select a client to start.")
+        return None
+    aggregate = load_client_aggregate(str(phone))
+    if aggregate.client is None:
+        st.error("Client not found.")
+        return None
+    st.subheader(f"{aggregate.client['client_name']} ({phone})")
+
+    vin, part_ids = _select_parts(aggregate)
+    if not part_ids:
+        st.info("Select at least one part.")
+        return None
+    choice = _select_suppliers(aggregate, part_ids, with_conditions)
+    priced = price_quote(str(phone), vin, part_ids, choice)
+    if priced.unpriced_part_ids:
+        st.warning(f"Parts without a selling price: {', '.join(map(str, priced.unpriced_part_ids))}")
+    st.dataframe(
+        priced.lines[['part_name', 'part_number', 'quantity', 'supplier_name', 'unit_price', 'line_total', 'delivery_time']],
+        width='stretch', hide_index=True,
+    )
+    st.write(f"**Total:** ${priced.total:.2f}  |  **Deposit:** ${priced.deposit:.2f}  |  **Balance:** ${priced.balance:.2f}")
+    return str(phone), vin, part_ids, choice, priced
+
+
+def render_generate_pdf_view():
+    document_type = st.session_state.document_type
+    st.header("Generate Quote" if document_type == 'quote' else "Generate Invoice")
+    if _back_to_main():
+        return
+
+    inputs = _quote_inputs()
+    if inputs is None:
+        return
+    phone, vin, part_ids, choice, priced = inputs
+
+    with st.form("quote_document_form"):
+        st.caption("The document number is assigned when the PDF is generated.")
+        deposit = st.number_input("Deposit", min_value=0.0, value=float(priced.deposit), step=1.0, format="%.2f")
+        delivery_time = st.text_input("Delivery time (business days or IN STOCK)", value=priced.delivery_time or "")
+        col1, col2 = st.columns(2)
+        with col1:
+            bill_name = st.text_input("Bill to name", value="")
+            bill_address = st.text_area("Bill to address", value="")
+        with col2:
+            ship_name = st.text_input("Ship to name", value="")
+            ship_address = st.text_area("Ship to address", value="")
+        submitted = st.form_submit_button("Generate PDF")
+
+    if submitted:
+        try:
+            document, data, reused = issue_document(
+                document_type, phone, vin, part_ids, choice,
+                deposit=round(deposit, 2),
+                bill_to=(bill_name, bill_address) if bill_name or bill_address else None,
+                ship_to=(ship_name, ship_address) if ship_name or ship_address else None,
+                delivery_time=delivery_time or None,
+                username=st.session_state.username,
+            )
+            if reused:
+                st.info(f"Identical to {document['document_number']} issued {document['created_date']}; reusing it.")
+            st.session_state.generated_pdf_data = data
+            st.session_state.generated_pdf_filename = f"{document['document_number']}.pdf"
+            st.session_state.generated_pdf_source = (phone, vin, part_ids, choice)
+        except Exception as e:
+            st.error(f"Error generating PDF: {e}")
+
+    # Only offer the download while it matches the current selection
+    if st.session_state.generated_pdf_data and st.session_state.get('generated_pdf_source') == (phone, vin, part_ids, choice):
+        st.download_button(
+            label=f"Download {st.session_state.generated_pdf_filename}",
+            data=st.session_state.generated_pdf_data,
+            file_name=st.session_state.generated_pdf_filename,
+            mime="application/pdf",
+        )
+
+
+def render_text_quote_view():
+    st.header("Text Quote")
+    if _back_to_main():
+        return
+
+    inputs = _quote_inputs(with_conditions=True)
+    if inputs is None:
+        return
+    priced = inputs[-1]
+
+    if st.button("Generate Text Quote"):
+        st.session_state.generated_text_quote = format_text_quote(priced, st.session_state.part_conditions)
+    if st.session_state.generated_text_quote:
+        st.text_area("Quote text (copy and send)", value=st.session_state.generated_text_quote, height=300)
@@ -0,0 +1,71 @@
+import streamlit as st
+
+from auth import require_admin
+from services.supplier_analytics import compare_part_prices, supplier_analytics
+
+
+def render_supplier_analytics_view():
+    require_admin()
+    st.header("Supplier Analytics")
+
+    if st.button("Back to Main"):
+        st.session_state.view = 'main'
+        st.session_state.need_rerun = True
+        return
+
+    analytics = supplier_analytics()
+    by_part = analytics.by_part
+    if by_part.empty:
+        st.info("No supplier prices recorded for parts with a part number yet.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Part numbers", len(by_part))
+    col2.metric("Suppliers", len(analytics.scorecard))
+    col3.metric("Average margin", f"{by_part['margin_pct'].mean():.1f}%")
+
+    st.subheader("Price Comparison by Part Number")
+    col1, col2 = st.columns(2)
+    with col1:
+        search = st.text_input("Filter part number or name", key="supplier_analytics_filter")
+    with col2:
+        sort = st.selectbox(
+            "Sort by",
+            options=['spread_pct', 'offers', 'margin_pct', 'min_price'],
+            format_func={
+                'spread_pct': "Price spread", 'offers': "Most quoted",
+                'margin_pct': "Average margin", 'min_price': "Cheapest price",
+            }.get,
+            key="supplier_analytics_sort",
+        )
+    shown = by_part
+    if search:
+        term = search.strip()
+        shown = shown[
+            shown.index.str.contains(term.upper(), regex=False)
+            | shown['part_name'].fillna('').str.contains(term, case=False, regex=False)
+        ]
+    shown = shown.sort_values(sort, ascending=sort == 'min_price')
+    st.dataframe(
+        shown.reset_index(drop=True),
+        width='stretch',
+        hide_index=True,
+        column_config={
+            'min_price': st.column_config.NumberColumn("Min price", format="$%.2f"),
+            'max_price': st.column_config.NumberColumn("Max price", format="$%.2f"),
+            'spread': st.column_config.NumberColumn("Spread", format="$%.2f"),
+            'spread_pct': st.column_config.NumberColumn("Spread %", format="%.1f%%"),
+            'avg_cost': st.column_config.NumberColumn("Avg cost", format="$%.2f"),
+            'margin_pct': st.column_config.NumberColumn("Avg margin", format="%.1f%%"),
+            'cheapest_margin_pct': st.column_config.NumberColumn("Cheapest margin", format="%.1f%%"),
+        },
+    )
+
+    if not shown.empty:
+        labels = {key: f"{row.part_number} - {row.part_name or ''}" for key, row in shown.iterrows()}
+        selected = st.selectbox("Compare suppliers for", options=list(labels), format_func=labels.get)
+        st.dataframe(compare_part_prices(selected), width='stretch', hide_index=True)
+
+    st.subheader("Supplier Scorecard")
+    st.caption("How many part numbers each supplier is the cheapest or fastest option for.")
+    st.dataframe(analytics.scorecard.reset_index(), width='stretch', hide_index=True)